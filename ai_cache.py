@@ -0,0 +1,108 @@
+"""
+AI response cache for Leitner App
+Improved notes are stored under a hash of everything that shapes the model's
+answer, so a double-click or a retry doesn't pay for a second completion.
+
+Two tiers:
+- an in-process LRU dict, checked first and free to read;
+- the ai_cache table, shared by every worker process and kept across restarts.
+
+Both expire entries after `ttl` seconds and evict the least recently used
+ones past their size cap.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+def normalize_note(note):
+    """Collapse whitespace so reflowed copies of the same note share a key"""
+    return "\n".join(
+        re.sub(r"[ \t]+", " ", line).strip() for line in note.strip().splitlines() if line.strip()
+    )
+
+def cache_key(prompt_version, model, title, note):
+    payload = json.dumps([prompt_version, model, (title or "").strip(), normalize_note(note)])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class NoteCache:
+    def __init__(self, max_entries, max_rows, ttl):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, created_at), oldest use first
+        self._lock = threading.Lock()
+        self.hits = {"memory": 0, "database": 0}
+        self.misses = 0
+
+    def get(self, db, key):
+        """Cached value for key or None; db is only queried on an in-process miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits["memory"] += 1
+                return entry[0]
+            self._entries.pop(key, None)
+
+        row = db.execute(
+            "SELECT value, created_at FROM ai_cache WHERE key=? AND created_at > ?",
+            (key, now - self.ttl),
+        ).fetchone()
+        if not row:
+            with self._lock:
+                self.misses += 1
+            return None
+        db.execute("UPDATE ai_cache SET last_used_at=? WHERE key=?", (now, key))
+        db.commit()
+        with self._lock:
+            self.hits["database"] += 1
+            self._remember(key, row["value"], row["created_at"])
+        return row["value"]
+
+    def put(self, db, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+        db.execute(
+            """INSERT INTO ai_cache (key, value, created_at, last_used_at) VALUES (?, ?, ?, ?)
+               ON CONFLICT (key) DO UPDATE SET value=excluded.value,
+                   created_at=excluded.created_at, last_used_at=excluded.last_used_at""",
+            (key, value, now, now),
+        )
+        # Writes only happen after a model call, so trimming here is cheap
+        db.execute("DELETE FROM ai_cache WHERE created_at <= ?", (now - self.ttl,))
+        db.execute(
+            """DELETE FROM ai_cache WHERE last_used_at < (
+                   SELECT last_used_at FROM ai_cache ORDER BY last_used_at DESC LIMIT 1 OFFSET ?)""",
+            (self.max_rows - 1,),
+        )
+        db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = sum(self.hits.values()) + self.misses
+            return {
+                "memory_hits": self.hits["memory"],
+                "database_hits": self.hits["database"],
+                "misses": self.misses,
+                "hit_rate": (lookups - self.misses) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+    def clear(self):
+        """Empty the in-process tier and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = {"memory": 0, "database": 0}
+            self.misses = 0
+
+    def _remember(self, key, value, created_at):
+        self._entries[key] = (value, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
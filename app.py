@@ -1,34 +1,78 @@
-
 import os
-import sqlite3
 import re
+import csv
+import json
+import base64
+import hashlib
+import threading
 from datetime import datetime, timedelta, date
-from flask import Flask, g, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, g, render_template, request, redirect, url_for, session, flash, jsonify, Response
+from markupsafe import Markup, escape
 from werkzeug.security import generate_password_hash, check_password_hash
-from flask_wtf.csrf import CSRFProtect
+from flask_wtf.csrf import CSRFProtect, generate_csrf
 from dotenv import load_dotenv
-import requests
-from bs4 import BeautifulSoup
-from openai import OpenAI
+import migrate
+import database
+import jobs
+import ai_cache
+import leetcode
+import scheduler
+import review_stats
+import forecast
+import data_versions
 
 # Load environment variables
 load_dotenv()
 
 # --- Config ---
-DATABASE = os.path.join(os.path.dirname(__file__), "db.sqlite3")
+# Use PostgreSQL if DATABASE_URL is set, otherwise SQLite
+DATABASE_URL = os.environ.get("DATABASE_URL")
+if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
+    # Heroku uses postgres://, but psycopg2 needs postgresql://
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+DATABASE = os.environ.get("DATABASE", os.path.join(os.path.dirname(__file__), "db.sqlite3"))
 SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key-change-in-production")
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-LEITNER_SCHEDULE = {1:1, 2:3, 3:7, 4:14, 5:30}
+# Trust the email stored in the signed session cookie instead of re-reading users
+SESSION_USER_CACHE = os.environ.get("SESSION_USER_CACHE", "True").lower() == "true"
+PAGE_SIZE = 50          # cards per page on the dashboard and review queue
+MAX_PAGE_SIZE = 200     # upper bound for ?limit= on the JSON endpoints
+MAX_REVIEW_BATCH = 500  # grades accepted per /api/review/batch call
+MAX_ID = 2**63 - 1      # largest row id SQLite (and a PostgreSQL BIGINT) can hold
+MAX_IMPORT_ROWS = 10_000  # rows accepted per import upload
+STATS_DAYS = 30           # days of review history on the dashboard
+MAX_STATS_DAYS = 366      # upper bound for ?days= on /api/stats/reviews
+MAX_DAILY_CAP = 1_000     # largest daily review limit a user can set
+FORECAST_DAYS = 30        # default window of /api/forecast
+MAX_FORECAST_DAYS = 366   # upper bound for ?days= on /api/forecast
+FORECAST_CACHE_TTL = int(os.environ.get("FORECAST_CACHE_TTL", 60))                # seconds
+FORECAST_CACHE_MAX_ENTRIES = int(os.environ.get("FORECAST_CACHE_MAX_ENTRIES", 1024))  # users per process
+IMPORT_BATCH = 1_000      # cards inserted per transaction during an import
+AI_TIMEOUT = float(os.environ.get("AI_TIMEOUT", 30))                  # seconds per OpenAI call
+AI_MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", 4))     # AI calls running per process
+AI_MAX_QUEUED = int(os.environ.get("AI_MAX_QUEUED", 32))              # AI jobs waiting per process
+AI_MAX_STREAMS = int(os.environ.get("AI_MAX_STREAMS", 4))             # AI streams open per process
+AI_JOB_RETENTION = 24 * 60 * 60  # seconds before finished jobs are purged
+PAGE_CACHE_VERSION = 1  # bump when templates or JSON formats change so old ETags stop matching
+AI_MODEL = "gpt-3.5-turbo"
+AI_PROMPT_VERSION = 1  # bump when the prompt changes so cached answers are not reused
+AI_CACHE_TTL = int(os.environ.get("AI_CACHE_TTL", 7 * 24 * 60 * 60))        # seconds
+AI_CACHE_MAX_ENTRIES = int(os.environ.get("AI_CACHE_MAX_ENTRIES", 256))      # in-process tier
+AI_CACHE_MAX_ROWS = int(os.environ.get("AI_CACHE_MAX_ROWS", 10_000))         # ai_cache table
 
-# Initialize OpenAI client (only if API key exists)
+# The OpenAI client is created on first use by get_openai_client(); importing
+# the openai package takes longer than the rest of the app put together.
 openai_client = None
-if OPENAI_API_KEY:
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
+_openai_client_lock = threading.Lock()
 
 app = Flask(__name__)
 app.config.from_mapping(
     SECRET_KEY=SECRET_KEY, 
     DATABASE=DATABASE,
+    DATABASE_URL=DATABASE_URL,
+    SESSION_USER_CACHE=SESSION_USER_CACHE,
+    OPENAI_API_KEY=OPENAI_API_KEY,
+    AI_TIMEOUT=AI_TIMEOUT,
     WTF_CSRF_ENABLED=True,
     WTF_CSRF_TIME_LIMIT=None  # CSRF tokens don't expire
 )
@@ -36,103 +80,78 @@ app.config.from_mapping(
 # Enable CSRF protection
 csrf = CSRFProtect(app)
 
+# AI requests run in the background so a slow completion never pins a web worker
+ai_jobs = jobs.JobRunner(AI_MAX_CONCURRENCY, AI_MAX_QUEUED)
+# A stream holds its web worker until generation ends, so cap them below the
+# worker's thread count; streams past the cap get a 429 instead of a thread
+ai_streams = threading.BoundedSemaphore(AI_MAX_STREAMS)
+note_cache = ai_cache.NoteCache(AI_CACHE_MAX_ENTRIES, AI_CACHE_MAX_ROWS, AI_CACHE_TTL)
+forecast_cache = forecast.ForecastCache(FORECAST_CACHE_TTL, FORECAST_CACHE_MAX_ENTRIES)
+
 # --- DB helpers ---
+# Queries are written once with "?" placeholders; database.py adapts them for
+# PostgreSQL. Only search (FTS5 vs tsvector) has per-dialect SQL.
+def is_postgres():
+    return bool(app.config["DATABASE_URL"])
+
 def get_db():
     db = getattr(g, "_database", None)
     if db is None:
-        db = g._database = sqlite3.connect(app.config["DATABASE"], detect_types=sqlite3.PARSE_DECLTYPES)
-        db.row_factory = sqlite3.Row
+        g._database_pool = database.get_pool(app.config["DATABASE"], app.config["DATABASE_URL"])
+        db = g._database = g._database_pool.acquire()
     return db
 
 @app.teardown_appcontext
 def close_connection(exception):
     db = getattr(g, "_database", None)
     if db is not None:
-        db.close()
-
-def init_db():
-    db = get_db()
-    db.executescript(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS cards (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            title TEXT NOT NULL,
-            link TEXT,
-            idea TEXT,
-            solved_date DATE NOT NULL,
-            leitner_box INTEGER NOT NULL DEFAULT 1,
-            next_review DATE NOT NULL,
-            last_reviewed DATE,
-            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
-        );
-
-        CREATE INDEX IF NOT EXISTS idx_cards_user ON cards(user_id);
-        CREATE INDEX IF NOT EXISTS idx_cards_nextreview ON cards(next_review);
-        """
-    )
-    db.commit()
+        g._database_pool.release(db)
 
-@app.before_request
-def before_request():
-    init_db()
+# Schema changes live in migrations/ and are applied at deploy time with
+# `python migrate.py`. At startup this reads the schema version once and
+# applies any pending migrations if the database is behind.
+migrate.ensure_schema(app.config["DATABASE"], app.config["DATABASE_URL"])
 
 @app.context_processor
 def inject_user():
-    """Make current_user available in all templates"""
-    return dict(current_user=current_user())
+    """Make current_user (and whether AI is configured) available in all templates"""
+    return dict(current_user=current_user(), ai_enabled=ai_enabled())
 
 # --- LeetCode utils ---
 def fetch_leetcode_title(url):
-    """Fetch LeetCode problem title from URL using slug extraction"""
-    try:
-        # Clean and validate URL
-        url = url.strip()
-        if not url:
-            return None
-            
-        # Support different LeetCode URL formats
-        if 'leetcode.com/problems/' not in url:
-            return None
-        
-        # Extract problem slug from URL (e.g., "two-sum" from the URL)
-        # Since LeetCode often blocks web scraping, we'll use the slug method
-        try:
-            slug = url.split('/problems/')[1].rstrip('/').split('/')[0]
-            # Convert slug to title (e.g., "two-sum" -> "Two Sum")
-            title = ' '.join(word.capitalize() for word in slug.split('-'))
-            if title:
-                return title
-        except Exception as e:
-            print(f"Error parsing LeetCode URL slug: {e}")
-            return None
-            
-        return None
-        
-    except Exception as e:
-        print(f"Error processing LeetCode URL: {e}")
+    """LeetCode problem title for a URL, without a network call: the catalog's
+    title, or for problems it doesn't list one built from the slug"""
+    slug = leetcode.problem_slug(url)
+    if not slug:
         return None
+    problem = leetcode.catalog().get(slug)
+    return problem.title if problem else leetcode.slug_title(slug)
+
+def problem_metadata(link):
+    """(difficulty, tags) to store on a card, from the catalog; (None, None) if it isn't listed"""
+    problem = leetcode.lookup(link)
+    if not problem:
+        return None, None
+    return problem.difficulty, ",".join(problem.tags)
 
 # --- AI utils ---
-def improve_note_with_ai(note_text, problem_title=None):
-    """Use AI to improve and structure the note"""
-    if not openai_client:
-        return None, "AI features require OpenAI API key to be configured."
-    
-    if not note_text or not note_text.strip():
-        return None, "Note is empty. Please add some content first."
+def ai_enabled():
+    return bool(app.config["OPENAI_API_KEY"])
+
+def get_openai_client():
+    """The shared OpenAI client, created (and openai imported) on first call; None without a key"""
+    global openai_client
+    if openai_client is None and ai_enabled():
+        with _openai_client_lock:
+            if openai_client is None:
+                from openai import OpenAI
+                openai_client = OpenAI(api_key=app.config["OPENAI_API_KEY"])
+    return openai_client
+
+def note_messages(note_text, problem_title=None):
+    """Chat messages asking the model to rewrite a note"""
+    prompt = f"""You are helping a software engineer organize their LeetCode problem notes.
     
-    try:
-        prompt = f"""You are helping a software engineer organize their LeetCode problem notes.
-        
 Problem: {problem_title if problem_title else "A coding problem"}
 
 Current note (may be messy or informal):
@@ -148,15 +167,27 @@ Please rewrite this note to be:
 7. Remove any unnecessary words while keeping all important information
 
 Return ONLY the improved note, no additional commentary."""
+    return [
+        {"role": "system", "content": "You are a helpful assistant that improves technical notes for software engineers studying algorithms."},
+        {"role": "user", "content": prompt}
+    ]
 
-        response = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that improves technical notes for software engineers studying algorithms."},
-                {"role": "user", "content": prompt}
-            ],
+def improve_note_with_ai(note_text, problem_title=None):
+    """Use AI to improve and structure the note"""
+    client = get_openai_client()
+    if not client:
+        return None, "AI features require OpenAI API key to be configured."
+    
+    if not note_text or not note_text.strip():
+        return None, "Note is empty. Please add some content first."
+    
+    try:
+        response = client.chat.completions.create(
+            model=AI_MODEL,
+            messages=note_messages(note_text, problem_title),
             max_tokens=300,
-            temperature=0.7
+            temperature=0.7,
+            timeout=app.config["AI_TIMEOUT"]
         )
         
         improved_note = response.choices[0].message.content.strip()
@@ -168,6 +199,35 @@ Return ONLY the improved note, no additional commentary."""
             return None, "Invalid API key. Please configure OPENAI_API_KEY."
         return None, f"AI service error: {error_msg}"
 
+def stream_note_with_ai(note_text, problem_title=None):
+    """Yield the improved note in pieces as the model produces them.
+    Closing the generator closes the OpenAI stream, which stops the generation."""
+    stream = get_openai_client().chat.completions.create(
+        model=AI_MODEL,
+        messages=note_messages(note_text, problem_title),
+        max_tokens=300,
+        temperature=0.7,
+        stream=True,
+        timeout=app.config["AI_TIMEOUT"]
+    )
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+
+def improve_note_cached(pool, key, note_text, problem_title=None):
+    """improve_note_with_ai, storing a successful answer in note_cache under key"""
+    improved_note, error = improve_note_with_ai(note_text, problem_title)
+    if improved_note:
+        conn = pool.acquire()
+        try:
+            note_cache.put(conn, key, improved_note)
+        finally:
+            pool.release(conn)
+    return improved_note, error
+
 # --- Validation utils ---
 def is_valid_email(email):
     """Basic email validation"""
@@ -187,12 +247,40 @@ def is_strong_password(password):
     return True, ""
 
 # --- Auth utils ---
-def current_user():
+# Review settings can be changed from any of the user's sessions, so they are
+# never cached in the signed session: user_settings() reads them from users
+USER_SETTINGS = ("scheduler", "intervals", "smooth_load", "daily_cap")
+USER_SETTINGS_SQL = database.prepare("user_settings", f"SELECT {', '.join(USER_SETTINGS)} FROM users WHERE id=?")
+
+def load_user():
+    """Resolve the session's user: from the signed session if cached there, else one DB read"""
     uid = session.get("user_id")
     if not uid:
         return None
+    email = session.get("user_email")
+    if app.config["SESSION_USER_CACHE"] and email:
+        return {"id": uid, "email": email}
     db = get_db()
-    return db.execute("SELECT id, email FROM users WHERE id=?", (uid,)).fetchone()
+    return db.execute(
+        f"SELECT id, email, {', '.join(USER_SETTINGS)} FROM users WHERE id=?", (uid,)
+    ).fetchone()
+
+def current_user():
+    """Current user, looked up at most once per request and kept on g"""
+    if "user" not in g:
+        g.user = load_user()
+    return g.user
+
+def user_settings():
+    """Current user's review settings: one primary-key read per request that
+    needs them (none if load_user() already read the users row)"""
+    if "settings" not in g:
+        user = current_user()
+        if "scheduler" in user.keys():
+            g.settings = user
+        else:
+            g.settings = get_db().execute(USER_SETTINGS_SQL, (user["id"],)).fetchone()
+    return g.settings
 
 def login_required(view):
     def wrapped(*args, **kwargs):
@@ -202,6 +290,44 @@ def login_required(view):
     wrapped.__name__ = view.__name__
     return wrapped
 
+# --- HTTP caching ---
+# Pages and JSON reads carry a strong ETag derived from the user's data
+# version (data_versions.py), which triggers bump on every change to their
+# cards, reviews or review settings. A request whose If-None-Match still
+# matches gets a 304 after one primary-key read, before any card query.
+
+def page_etag(user):
+    """ETag for this request's response given the user's current data. Due
+    lists depend on the date, and the page's forms embed the session's CSRF
+    token (which never expires, WTF_CSRF_TIME_LIMIT=None), so both count."""
+    generate_csrf()
+    version, started_at = data_versions.current(get_db(), user["id"])
+    parts = [
+        PAGE_CACHE_VERSION, user["id"], version, started_at, date.today().isoformat(),
+        request.full_path, session.get(app.config["WTF_CSRF_FIELD_NAME"]), ai_enabled(),
+    ]
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()[:32]
+
+def conditional(view):
+    """Answer 304 Not Modified when If-None-Match has the current ETag;
+    otherwise run view and tag its response. Use under @login_required."""
+    def wrapped(*args, **kwargs):
+        if session.get("_flashes"):
+            # Flashed messages are shown once, by the render that pops them
+            return view(*args, **kwargs)
+        etag = page_etag(current_user())
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    wrapped.__name__ = view.__name__
+    return wrapped
+
 # --- Routes ---
 @app.route("/")
 def home():
@@ -236,7 +362,7 @@ def register():
                 (email, generate_password_hash(password)),
             )
             db.commit()
-        except sqlite3.IntegrityError:
+        except database.IntegrityError:
             flash("Email already registered.", "error")
             return render_template("register.html")
         flash("Registration successful. Please log in.", "success")
@@ -252,6 +378,7 @@ def login():
         user = db.execute("SELECT * FROM users WHERE email=?", (email,)).fetchone()
         if user and check_password_hash(user["password_hash"], password):
             session["user_id"] = user["id"]
+            session["user_email"] = user["email"]
             return redirect(url_for("dashboard"))
         flash("Invalid credentials.", "error")
     return render_template("login.html")
@@ -261,56 +388,323 @@ def logout():
     session.clear()
     return redirect(url_for("login"))
 
-def compute_next_review(solved_date: date, box: int) -> date:
-    days = LEITNER_SCHEDULE.get(box, 1)
-    return solved_date + timedelta(days=days)
+def change_stamp():
+    """updated_at value for a write (UTC, same format the change-tracking triggers use)"""
+    return datetime.utcnow().isoformat(sep=" ", timespec="milliseconds")
+
+def user_policy(settings):
+    """The user's review scheduling policy (see scheduler.py), from user_settings()"""
+    return scheduler.get_policy(settings["scheduler"], settings["intervals"])
+
+# --- Card queries ---
+# Both lists use keyset pagination: the cursor is the (sort value, id) of the
+# last row shown, so every page is one index range read however deep it is.
+# Due queries compare the raw next_review column (no date() wrapper) so
+# idx_cards_user_due serves both the filter and the ORDER BY.
+# The hottest statements are registered with database.prepare() so PostgreSQL
+# plans them once per connection.
+CARD_COLUMNS = """id, user_id, title, link, idea, solved_date, leitner_box,
+                  next_review, last_reviewed, created_at, difficulty, tags, interval_days, ease"""
+DUE_CARDS_SQL = database.prepare("due_cards", f"""
+    SELECT {CARD_COLUMNS} FROM cards WHERE user_id=? AND next_review <= ?
+    ORDER BY next_review ASC, id ASC LIMIT ?""")
+DUE_CARDS_AFTER_SQL = database.prepare("due_cards_after", f"""
+    SELECT {CARD_COLUMNS} FROM cards WHERE user_id=? AND next_review <= ?
+    AND (next_review, id) > (?, ?)
+    ORDER BY next_review ASC, id ASC LIMIT ?""")
+CARD_SQL = database.prepare("card", f"SELECT {CARD_COLUMNS} FROM cards WHERE id=? AND user_id=?")
+CARD_BY_SLUG_SQL = database.prepare("card_by_slug", f"SELECT {CARD_COLUMNS} FROM cards WHERE user_id=? AND slug=?")
+ADD_CARD_SQL = database.prepare("add_card", """
+    INSERT INTO cards (user_id, title, link, slug, difficulty, tags, idea, solved_date, leitner_box,
+                       interval_days, next_review, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""")
+MARK_CARD_SQL = database.prepare("mark_card", """
+    UPDATE cards SET leitner_box=?, ease=?, interval_days=?, last_reviewed=?, next_review=?, updated_at=?
+    WHERE id=? AND user_id=?""")
+REVIEW_EVENT_SQL = database.prepare("review_event", """
+    INSERT INTO review_events (user_id, card_id, reviewed_at, result, box_before, box_after, interval_days)
+    VALUES (?, ?, ?, ?, ?, ?, ?)""")
+DUE_COUNT_SQL = "SELECT COUNT(*) c FROM cards WHERE user_id=? AND next_review <= ?"
+# With a daily cap the queue is the first `allowance` due cards; LIMIT stops
+# these counts at the cap instead of counting the whole backlog
+CAPPED_DUE_COUNT_SQL = """SELECT COUNT(*) c FROM (
+    SELECT 1 FROM cards WHERE user_id=? AND next_review <= ? LIMIT ?) AS due"""
+DUE_THROUGH_COUNT_SQL = """SELECT COUNT(*) c FROM (
+    SELECT 1 FROM cards WHERE user_id=? AND next_review <= ? AND (next_review, id) <= (?, ?) LIMIT ?) AS shown"""
+
+def encode_cursor(value, card_id):
+    raw = json.dumps([str(value), card_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Return (sort value, id) from a cursor, or None if missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, card_id = json.loads(raw)
+        card_id = int(card_id)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    return (str(value), card_id) if 1 <= card_id <= MAX_ID else None
+
+def page_size():
+    limit = request.args.get("limit", PAGE_SIZE, type=int)
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def paginate(rows, limit, key):
+    """Trim the extra look-ahead row and build the cursor for the next page"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1][key], rows[-1]["id"])
+
+def fetch_due_cards(db, user_id, cursor=None, limit=PAGE_SIZE, today=None, allowance=None):
+    """One page of cards due on or before today, oldest first. allowance
+    (see review_allowance) ends the queue after that many cards."""
+    today = today or date.today()
+    after = decode_cursor(cursor)
+    if allowance is not None:
+        if after:
+            allowance -= db.execute(DUE_THROUGH_COUNT_SQL, (user_id, today, *after, allowance)).fetchone()["c"]
+        if allowance <= 0:
+            return [], None
+    # No look-ahead row when the allowance ends the queue on this page
+    fetch = limit + 1 if allowance is None or allowance > limit else allowance
+    limit = min(limit, fetch)
+    if after:
+        rows = db.execute(DUE_CARDS_AFTER_SQL, (user_id, today, *after, fetch)).fetchall()
+    else:
+        rows = db.execute(DUE_CARDS_SQL, (user_id, today, fetch)).fetchall()
+    return paginate(rows, limit, "next_review")
+
+def count_due_cards(db, user_id, today=None, allowance=None):
+    today = today or date.today()
+    if allowance is not None:
+        return db.execute(CAPPED_DUE_COUNT_SQL, (user_id, today, allowance)).fetchone()["c"]
+    return db.execute(DUE_COUNT_SQL, (user_id, today)).fetchone()["c"]
+
+def review_allowance(db, user_id, daily_cap, today=None):
+    """How many more cards daily_cap lets into today's queue, or None without
+    a cap. Reviews already done today come from review_daily."""
+    if not daily_cap:
+        return None
+    done = db.execute(
+        "SELECT reviews FROM review_daily WHERE user_id=? AND day=?", (user_id, today or date.today())
+    ).fetchone()
+    return max(daily_cap - (done["reviews"] if done else 0), 0)
+
+def card_filters(tag=None, difficulty=None):
+    """Extra WHERE conditions (and params) for the dashboard's tag/difficulty filters"""
+    sql, params = "", []
+    if difficulty:
+        sql += " AND cards.difficulty = ?"
+        params.append(difficulty)
+    if tag:
+        sql += " AND (',' || cards.tags || ',') LIKE ?"
+        params.append(f"%,{tag},%")
+    return sql, params
+
+def fetch_cards(db, user_id, cursor=None, limit=PAGE_SIZE, tag=None, difficulty=None):
+    """One page of the user's cards, newest first, optionally only one tag/difficulty"""
+    filters, params = card_filters(tag, difficulty)
+    sql = f"SELECT {CARD_COLUMNS} FROM cards WHERE user_id=?" + filters
+    params = [user_id, *params]
+    after = decode_cursor(cursor)
+    if after:
+        sql += " AND (created_at, id) < (?, ?)"
+        params += after
+    sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+    return paginate(db.execute(sql, params).fetchall(), limit, "created_at")
+
+# --- Search ---
+# SQLite: cards_fts (migration 0004) indexes user_id, title and idea.
+# PostgreSQL: the weighted search_vector column with its GIN index.
+# Every word of the query becomes a prefix term, so "two su" finds "Two Sum"
+# while typing. Matches are wrapped in \x02/\x03 and turned into <mark> later.
+SEARCH_SQL = """SELECT cards.*,
+                       highlight(cards_fts, 1, char(2), char(3)) AS title_match,
+                       snippet(cards_fts, 2, char(2), char(3), '…', 12) AS idea_match
+                FROM cards_fts JOIN cards ON cards.id = cards_fts.rowid
+                WHERE cards_fts MATCH ?{filters}
+                ORDER BY bm25(cards_fts, 0.0, 10.0, 1.0), cards.id DESC
+                LIMIT ?"""
+PG_SEARCH_SQL = f"""SELECT {CARD_COLUMNS},
+                          ts_headline('english', title, query, ?) AS title_match,
+                          ts_headline('english', coalesce(idea, ''), query, ?) AS idea_match
+                   FROM cards, to_tsquery('english', ?) AS query
+                   WHERE user_id = ? AND search_vector @@ query{{filters}}
+                   ORDER BY ts_rank(search_vector, query) DESC, id DESC
+                   LIMIT ?"""
+PG_TITLE_HEADLINE = "StartSel=\x02, StopSel=\x03, HighlightAll=true"
+PG_IDEA_HEADLINE = "StartSel=\x02, StopSel=\x03, MaxWords=20, MinWords=8"
+
+def search_words(q):
+    return re.findall(r"[^\W_]+", q.lower())
+
+def build_match_query(user_id, q):
+    """FTS5 MATCH expression for a user's search box input, or None if no words"""
+    words = search_words(q)
+    if not words:
+        return None
+    terms = " ".join(f'"{word}"*' for word in words)
+    # Column filter: the words must not match the (indexed) user_id column
+    return f'user_id:"{user_id}" AND {{title idea}}:({terms})'
+
+def build_tsquery(q):
+    """to_tsquery() input for a user's search box input, or None if no words"""
+    words = search_words(q)
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+def mark_matches(text):
+    """Escape FTS output and turn its match markers into <mark> tags"""
+    if not text:
+        return Markup("")
+    return Markup(str(escape(text)).replace("\x02", "<mark>").replace("\x03", "</mark>"))
+
+def search_cards(db, user_id, q, limit=PAGE_SIZE, tag=None, difficulty=None):
+    """Best-ranked matches for q among the user's cards, with highlighted excerpts"""
+    filters, params = card_filters(tag, difficulty)
+    if is_postgres():
+        tsquery = build_tsquery(q)
+        if not tsquery:
+            return []
+        rows = db.execute(PG_SEARCH_SQL.format(filters=filters),
+                          (PG_TITLE_HEADLINE, PG_IDEA_HEADLINE, tsquery, user_id, *params, limit))
+    else:
+        match = build_match_query(user_id, q)
+        if not match:
+            return []
+        rows = db.execute(SEARCH_SQL.format(filters=filters), (match, *params, limit))
+    cards = []
+    for row in rows:
+        card = dict(row)
+        card["title_match"] = mark_matches(card["title_match"])
+        card["idea_match"] = mark_matches(card["idea_match"])
+        cards.append(card)
+    return cards
+
+def fetch_user_stats(db, user_id):
+    """(total cards, {box: count}) from the trigger-maintained user_stats row"""
+    stats = db.execute("SELECT * FROM user_stats WHERE user_id=?", (user_id,)).fetchone()
+    if not stats:
+        return 0, {}
+    return stats["total_cards"], {box: stats[f"box_{box}"] for box in range(1, 6)}
+
+def review_activity(db, user_id, days=STATS_DAYS, today=None):
+    """Daily review totals, their sum and the current streak, all from the
+    review_daily rollups (never the raw review_events)"""
+    today = today or date.today()
+    rows = review_stats.daily_totals(db, user_id, today - timedelta(days=days - 1))
+    return {
+        "days": [card_to_dict(row) for row in rows],
+        "totals": review_stats.summarize(rows),
+        "streak": review_stats.streak(db, user_id, today),
+    }
+
+def card_to_dict(card):
+    return {
+        key: value.isoformat() if isinstance(value, (date, datetime)) else value
+        for key, value in dict(card).items()
+    }
 
 @app.route("/dashboard")
 @login_required
+@conditional
 def dashboard():
     db = get_db()
     user = current_user()
+    settings = user_settings()
     
     # Get cards due for review
-    review_cards = db.execute(
-        """SELECT * FROM cards WHERE user_id=? AND date(next_review) <= date('now')
-           ORDER BY next_review ASC, id ASC""",
-        (user["id"],),
-    ).fetchall()
+    allowance = review_allowance(db, user["id"], settings["daily_cap"])
+    review_cards, review_cursor = fetch_due_cards(db, user["id"], allowance=allowance)
     
     q = request.args.get("q","").strip()
+    tag = request.args.get("tag") or None
+    difficulty = request.args.get("difficulty") or None
     highlight_id = request.args.get("highlight", type=int)
     
     if q:
-        cards = db.execute(
-            """SELECT * FROM cards WHERE user_id=? AND (title LIKE ? OR idea LIKE ?) 
-               ORDER BY created_at DESC""",
-            (user["id"], f"%{q}%", f"%{q}%"),
-        ).fetchall()
+        cards, cards_cursor = search_cards(db, user["id"], q, tag=tag, difficulty=difficulty), None
     else:
-        cards = db.execute(
-            "SELECT * FROM cards WHERE user_id=? ORDER BY created_at DESC",
-            (user["id"],),
-        ).fetchall()
+        cards, cards_cursor = fetch_cards(db, user["id"], tag=tag, difficulty=difficulty)
 
     # Get highlighted card details if exists
     highlighted_card = None
-    if highlight_id:
-        highlighted_card = db.execute(
-            "SELECT * FROM cards WHERE id=? AND user_id=?",
-            (highlight_id, user["id"])
-        ).fetchone()
+    if highlight_id and 1 <= highlight_id <= MAX_ID:
+        highlighted_card = db.execute(CARD_SQL, (highlight_id, user["id"])).fetchone()
 
     # stats
-    total = db.execute("SELECT COUNT(*) c FROM cards WHERE user_id=?", (user["id"],)).fetchone()["c"]
-    due_today = len(review_cards)
-    by_box = db.execute(
-        "SELECT leitner_box, COUNT(*) c FROM cards WHERE user_id=? GROUP BY leitner_box",
-        (user["id"],),
-    ).fetchall()
-    box_counts = {row["leitner_box"]: row["c"] for row in by_box}
+    total, box_counts = fetch_user_stats(db, user["id"])
+    activity = review_activity(db, user["id"])
+    due_today = count_due_cards(db, user["id"], allowance=allowance) if review_cursor else len(review_cards)
+
+    return render_template("dashboard.html", cards=cards, cards_cursor=cards_cursor, review_cards=review_cards, review_cursor=review_cursor, total=total, due_today=due_today, box_counts=box_counts, q=q, tag=tag, difficulty=difficulty, tags=leetcode.catalog().tags, difficulties=leetcode.DIFFICULTIES, policy=user_policy(settings), settings=settings, activity=activity, stats_days=STATS_DAYS, highlight_id=highlight_id, highlighted_card=highlighted_card)
+
+@app.route("/api/cards")
+@login_required
+@conditional
+def cards_api():
+    """Next page of the dashboard card list ("load more")"""
+    user = current_user()
+    q = request.args.get("q","").strip()
+    tag = request.args.get("tag") or None
+    difficulty = request.args.get("difficulty") or None
+    if q:
+        # Search results are ranked by relevance, not paged
+        cards, next_cursor = search_cards(get_db(), user["id"], q, page_size(), tag, difficulty), None
+    else:
+        cards, next_cursor = fetch_cards(get_db(), user["id"], request.args.get("cursor"), page_size(), tag, difficulty)
+    return jsonify({
+        "success": True,
+        "cards": [card_to_dict(c) for c in cards],
+        "next_cursor": next_cursor,
+        "html": render_template("_card_rows.html", cards=cards),
+    })
+
+@app.route("/api/stats/reviews")
+@login_required
+@conditional
+def review_stats_api():
+    """Per-day review counts, pass rate and streak for charts"""
+    days = min(max(request.args.get("days", STATS_DAYS, type=int), 1), MAX_STATS_DAYS)
+    return jsonify({"success": True, **review_activity(get_db(), current_user()["id"], days)})
 
-    return render_template("dashboard.html", cards=cards, review_cards=review_cards, total=total, due_today=due_today, box_counts=box_counts, q=q, highlight_id=highlight_id, highlighted_card=highlighted_card)
+@app.route("/api/forecast")
+@login_required
+@conditional
+def forecast_api():
+    """Cards due on each of the next ?days= days (overdue ones count as due today)"""
+    days = min(max(request.args.get("days", FORECAST_DAYS, type=int), 1), MAX_FORECAST_DAYS)
+    today = date.today()
+    counts = forecast_cache.get(get_db(), current_user()["id"], today, days)
+    return jsonify({
+        "success": True,
+        "days": [{"date": (today + timedelta(days=n)).isoformat(), "due": due} for n, due in enumerate(counts)],
+        "total": sum(counts),
+    })
+
+@app.route("/api/review-queue")
+@login_required
+@conditional
+def review_queue_api():
+    """Next page of the due queue ("load more")"""
+    user = current_user()
+    db = get_db()
+    cards, next_cursor = fetch_due_cards(
+        db, user["id"], request.args.get("cursor"), page_size(), allowance=review_allowance(db, user["id"], user_settings()["daily_cap"]),
+    )
+    compact = request.args.get("compact", type=int) == 1
+    return jsonify({
+        "success": True,
+        "cards": [card_to_dict(c) for c in cards],
+        "next_cursor": next_cursor,
+        "html": render_template("_review_rows.html", cards=cards, compact=compact),
+    })
 
 @app.route("/add", methods=["POST"])
 @login_required
@@ -324,18 +718,6 @@ def add():
         flash("LeetCode problem URL is required.", "error")
         return redirect(url_for("dashboard"))
     
-    # Check for duplicate URL
-    db = get_db()
-    existing_card = db.execute(
-        "SELECT * FROM cards WHERE user_id=? AND link=?",
-        (user["id"], link)
-    ).fetchone()
-    
-    if existing_card:
-        # Problem already exists - show the existing card
-        flash(f"⚠️ This problem already exists in your collection!", "error")
-        return redirect(url_for("dashboard", highlight=existing_card["id"]))
-    
     # Auto-fetch title from LeetCode URL, fallback to manual title
     title = fetch_leetcode_title(link)
     
@@ -353,23 +735,223 @@ def add():
     box = int(request.form.get("leitner_box","1"))
     if box < 1: box = 1
     if box > 5: box = 5
-    next_review = compute_next_review(solved_date, box)
+    db = get_db()
+    settings = user_settings()
+    interval_days = user_policy(settings).interval(box)
+    if settings["smooth_load"]:
+        load = forecast_cache.get(db, user["id"], solved_date, scheduler.horizon(interval_days))
+        interval_days = scheduler.place(interval_days, load)
+    next_review = scheduler.due_date(solved_date, interval_days)
 
-    db.execute(
-        """INSERT INTO cards (user_id, title, link, idea, solved_date, leitner_box, next_review)
-           VALUES (?, ?, ?, ?, ?, ?, ?)""",
-        (user["id"], title, link, note, solved_date, box, next_review),
-    )
-    db.commit()
+    # The unique (user_id, slug) index is the duplicate check, so two
+    # concurrent adds of one problem can't both succeed
+    slug = leetcode.card_slug(link)
+    try:
+        db.execute(ADD_CARD_SQL, (
+            user["id"], title, link, slug, *problem_metadata(link), note, solved_date, box, interval_days, next_review,
+            change_stamp(),
+        ))
+        db.commit()
+    except database.IntegrityError:
+        db.rollback()
+        # Problem already exists - show the existing card
+        existing_card = db.execute(CARD_BY_SLUG_SQL, (user["id"], slug)).fetchone()
+        flash(f"⚠️ This problem already exists in your collection!", "error")
+        return redirect(url_for("dashboard", highlight=existing_card["id"]))
+    forecast_cache.invalidate(user["id"])
     flash("Card added successfully!", "success")
     return redirect(url_for("dashboard"))
 
-@app.route("/edit/<int:card_id>", methods=["GET", "POST"])
+# --- Bulk import ---
+# Column names accepted in an import file, mapped to the card field they fill
+IMPORT_FIELDS = {
+    "link": "link", "url": "link",
+    "title": "title",
+    "note": "note", "idea": "note",
+    "leitner_box": "leitner_box", "box": "leitner_box",
+    "solved_date": "solved_date",
+}
+
+def parse_import_file(filename, text):
+    """Rows of an uploaded problem list as dicts; raises ValueError if unreadable.
+
+    JSON: a list of links or of objects ({"link", "title", "note", "leitner_box",
+    "solved_date"}), optionally wrapped in {"cards": [...]}.
+    CSV: a header row with those columns, or just one link per line.
+    """
+    if (filename or "").lower().endswith(".json") or text.lstrip().startswith(("[", "{")):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            raise ValueError("The file is not valid JSON")
+        if isinstance(data, dict):
+            data = data.get("cards")
+        if not isinstance(data, list):
+            raise ValueError("Expected a JSON list of cards")
+        return [{"link": item} if isinstance(item, str) else item for item in data]
+
+    lines = text.splitlines()
+    reader = csv.reader(lines)
+    header = [column.strip().lower() for column in next(reader, [])]
+    if not any(IMPORT_FIELDS.get(column) == "link" for column in header):
+        # No header: the first column of every line is a link
+        return [{"link": row[0]} for row in csv.reader(lines) if row and row[0].strip()]
+    return [
+        {IMPORT_FIELDS[c]: v for c, v in zip(header, row) if c in IMPORT_FIELDS}
+        for row in reader if any(field.strip() for field in row)
+    ]
+
+def parse_import_row(row, today):
+    """Card values (link, title, note, box, solved_date) for one import row; raises ValueError"""
+    if not isinstance(row, dict):
+        raise ValueError("Each card must be a link or an object")
+    row = {IMPORT_FIELDS.get(k, k): v for k, v in row.items()}
+    link = str(row.get("link") or "").strip()
+    if not link:
+        raise ValueError("LeetCode problem URL is required")
+    # Same rule as add(): the title comes from the link, the given one is a fallback
+    title = fetch_leetcode_title(link) or str(row.get("title") or "").strip()
+    if not title:
+        raise ValueError("Could not work out the problem title; add a title column")
+    try:
+        box = min(5, max(1, int(row.get("leitner_box") or 1)))
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("leitner_box must be a number from 1 to 5")
+    solved_date = today
+    if row.get("solved_date"):
+        try:
+            solved_date = min(date.fromisoformat(str(row["solved_date"])[:10]), today)
+        except ValueError:
+            raise ValueError("solved_date must be an ISO date")
+    return link, title, str(row.get("note") or "").strip(), box, solved_date
+
+def import_cards(db, user_id, rows, first_row=1, today=None, policy=None, smooth=False):
+    """Add a list of problems in batched transactions, skipping problems the
+    user already has (or that appear earlier in the list).
+
+    Returns one report entry per row, in order: {"row", "link", "status"} with
+    status "imported", "duplicate" or "error" (plus "title" or "error").
+    """
+    today = today or date.today()
+    policy = policy or scheduler.get_policy("leitner")
+    report, parsed = [], []
+    for number, row in enumerate(rows, first_row):
+        try:
+            card = parse_import_row(row, today)
+        except ValueError as e:
+            link = row.get("link") if isinstance(row, dict) else row
+            report.append({"row": number, "link": link, "status": "error", "error": str(e)})
+            continue
+        entry = {"row": number, "link": card[0], "status": "imported", "title": card[1]}
+        report.append(entry)
+        parsed.append((entry, card))
+
+    # One probe of the (user_id, slug) index finds every problem the user already has
+    slugs = sorted({leetcode.card_slug(card[0]) for _, card in parsed})
+    existing = set()
+    if slugs:
+        placeholders = ",".join("?" * len(slugs))
+        existing = {
+            row["slug"] for row in db.execute(
+                f"SELECT slug FROM cards WHERE user_id=? AND slug IN ({placeholders})", (user_id, *slugs)
+            )
+        }
+
+    pending = []
+    stamp = change_stamp()
+    # With load smoothing a whole list imported at once is spread out instead
+    # of coming due together
+    load = forecast_cache.get(db, user_id, today, MAX_FORECAST_DAYS) if smooth else None
+    for entry, (link, title, note, box, solved_date) in parsed:
+        slug = leetcode.card_slug(link)
+        if slug in existing:
+            entry["status"] = "duplicate"
+            continue
+        existing.add(slug)
+        interval_days = policy.interval(box)
+        if load is not None:
+            interval_days = scheduler.place(interval_days, load, (solved_date - today).days)
+        values = (user_id, title, link, slug, *problem_metadata(link), note, solved_date, box,
+                  interval_days, scheduler.due_date(solved_date, interval_days), stamp)
+        pending.append((entry, values))
+
+    for start in range(0, len(pending), IMPORT_BATCH):
+        batch = pending[start:start + IMPORT_BATCH]
+        try:
+            data_versions.begin_bulk(db, user_id)
+            db.executemany(ADD_CARD_SQL, [values for _, values in batch])
+            data_versions.end_bulk(db, user_id)
+            db.commit()
+        except database.IntegrityError:
+            # A card was added while the import ran; redo this batch row by row
+            db.rollback()
+            for entry, values in batch:
+                try:
+                    db.execute(ADD_CARD_SQL, values)
+                    db.commit()
+                except database.IntegrityError:
+                    db.rollback()
+                    entry["status"] = "duplicate"
+    forecast_cache.invalidate(user_id)
+    return report
+
+def import_summary(report):
+    return {status: sum(1 for r in report if r["status"] == status) for status in ("imported", "duplicate", "error")}
+
+def read_import_upload():
+    """Rows from the request: an uploaded "file", or a JSON body; raises ValueError"""
+    upload = request.files.get("file")
+    if upload:
+        try:
+            text = upload.read().decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ValueError("The file must be UTF-8 text")
+        rows = parse_import_file(upload.filename, text)
+    else:
+        rows = parse_import_file("", request.get_data(as_text=True))
+    if not rows:
+        raise ValueError("The file has no cards")
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise ValueError(f"At most {MAX_IMPORT_ROWS} cards per import")
+    return rows
+
+@app.route("/api/cards/import", methods=["POST"])
+@login_required
+def import_cards_api():
+    """Import a CSV or JSON problem list; answers with a per-row report"""
+    try:
+        rows = read_import_upload()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    settings = user_settings()
+    report = import_cards(get_db(), current_user()["id"], rows, policy=user_policy(settings), smooth=settings["smooth_load"])
+    return jsonify({"success": True, **import_summary(report), "rows": report})
+
+@app.route("/import", methods=["POST"])
+@login_required
+def import_upload():
+    """Dashboard form version of /api/cards/import"""
+    try:
+        rows = read_import_upload()
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for("dashboard"))
+    settings = user_settings()
+    report = import_cards(get_db(), current_user()["id"], rows, policy=user_policy(settings), smooth=settings["smooth_load"])
+    summary = import_summary(report)
+    flash(f"Imported {summary['imported']} card(s); {summary['duplicate']} already in your collection.", "success")
+    for entry in [r for r in report if r["status"] == "error"][:5]:
+        flash(f"Row {entry['row']}: {entry['error']}", "error")
+    if summary["error"] > 5:
+        flash(f"...and {summary['error'] - 5} more rows could not be imported.", "error")
+    return redirect(url_for("dashboard"))
+
+@app.route(f"/edit/<int(max={MAX_ID}):card_id>", methods=["GET", "POST"])
 @login_required
 def edit(card_id):
     user = current_user()
     db = get_db()
-    card = db.execute("SELECT * FROM cards WHERE id=? AND user_id=?", (card_id, user["id"])).fetchone()
+    card = db.execute(CARD_SQL, (card_id, user["id"])).fetchone()
     
     if not card:
         flash("Card not found.", "error")
@@ -397,11 +979,26 @@ def edit(card_id):
             flash("Could not fetch problem title. Please check the URL.", "error")
             return render_template("edit.html", card=card)
         
-        db.execute(
-            "UPDATE cards SET title=?, link=?, idea=? WHERE id=? AND user_id=?",
-            (title, link, note, card_id, user["id"]),
-        )
-        db.commit()
+        try:
+            if link != card["link"]:
+                db.execute(
+                    """UPDATE cards SET title=?, link=?, slug=?, difficulty=?, tags=?, idea=?, updated_at=?
+                       WHERE id=? AND user_id=?""",
+                    (title, link, leetcode.card_slug(link), *problem_metadata(link), note, change_stamp(),
+                     card_id, user["id"]),
+                )
+            else:
+                # Leaves the slug alone: later copies of a problem kept from
+                # before migration 0009 have none, and setting it would collide
+                db.execute(
+                    "UPDATE cards SET title=?, idea=?, updated_at=? WHERE id=? AND user_id=?",
+                    (title, note, change_stamp(), card_id, user["id"]),
+                )
+            db.commit()
+        except database.IntegrityError:
+            db.rollback()
+            flash("⚠️ This problem already exists in your collection!", "error")
+            return render_template("edit.html", card=card)
         flash("Card updated successfully!", "success")
         return redirect(url_for("dashboard"))
     
@@ -409,49 +1006,185 @@ def edit(card_id):
 
 @app.route("/review")
 @login_required
+@conditional
 def review():
     user = current_user()
     db = get_db()
-    cards = db.execute(
-        """SELECT * FROM cards WHERE user_id=? AND date(next_review) <= date('now')
-           ORDER BY next_review ASC, id ASC""",
-        (user["id"],),
-    ).fetchall()
-    return render_template("review.html", cards=cards)
-
-@app.route("/mark/<int:card_id>/<string:result>", methods=["POST"])
+    allowance = review_allowance(db, user["id"], user_settings()["daily_cap"])
+    cards, next_cursor = fetch_due_cards(db, user["id"], allowance=allowance)
+    due_count = count_due_cards(db, user["id"], allowance=allowance) if next_cursor else len(cards)
+    return render_template("review.html", cards=cards, next_cursor=next_cursor, due_count=due_count)
+
+@app.route(f"/mark/<int(max={MAX_ID}):card_id>/<any(pass, fail):result>", methods=["POST"])
 @login_required
 def mark(card_id, result):
     user = current_user()
     db = get_db()
-    card = db.execute("SELECT * FROM cards WHERE id=? AND user_id=?", (card_id, user["id"])).fetchone()
+    card = db.execute(CARD_SQL, (card_id, user["id"])).fetchone()
     if not card:
         flash("Card not found.", "error")
         return redirect(url_for("dashboard"))
-    box = card["leitner_box"]
+    settings = user_settings()
+    box, ease, interval_days = user_policy(settings).review(card["leitner_box"], card["ease"], card["interval_days"], result)
+    today = date.today()
+    if settings["smooth_load"]:
+        load = forecast_cache.get(db, user["id"], today, scheduler.horizon(interval_days))
+        interval_days = scheduler.place(interval_days, load)
+    next_review = scheduler.due_date(today, interval_days)
+    db.execute(MARK_CARD_SQL, (box, ease, interval_days, today, next_review, change_stamp(), card_id, user["id"]))
+    db.execute(REVIEW_EVENT_SQL, (user["id"], card_id, today, result, card["leitner_box"], box, interval_days))
+    db.commit()
+    forecast_cache.invalidate(user["id"])
+    # After load smoothing, so the message gives the date that was stored
     if result == "pass":
-        box = min(5, box + 1)
         if box == 5:
-            flash(f"🎉 Mastered! '{card['title']}' is now in Box 5 - you'll review it in 30 days.", "success")
+            flash(f"🎉 Mastered! '{card['title']}' is now in Box 5 - you'll review it in {(next_review - today).days} days.", "success")
         else:
             flash(f"✓ Good job! '{card['title']}' moved to Box {box}.", "success")
     else:
-        box = 1
         flash(f"Keep practicing! '{card['title']}' moved back to Box 1.", "error")
+    return redirect(url_for("dashboard"))
+
+def parse_review(item, today):
+    """(card_id, result, reviewed_on) from one batch entry; raises ValueError if invalid"""
+    if not isinstance(item, dict):
+        raise ValueError("Each review must be an object")
+    try:
+        card_id = int(item["card_id"])
+    except (KeyError, TypeError, ValueError, OverflowError):
+        raise ValueError("Each review needs a numeric card_id")
+    if not 1 <= card_id <= MAX_ID:
+        raise ValueError("card_id is out of range")
+    result = item.get("result")
+    if result not in ("pass", "fail"):
+        raise ValueError("result must be 'pass' or 'fail'")
+    reviewed_on = today
+    if item.get("reviewed_at"):
+        try:
+            reviewed_on = date.fromisoformat(str(item["reviewed_at"])[:10])
+        except ValueError:
+            raise ValueError("reviewed_at must be an ISO date")
+    # Never schedule from a future date, whatever the client clock says
+    return card_id, result, min(reviewed_on, today)
+
+@app.route("/api/review/batch", methods=["POST"])
+@login_required
+def review_batch_api():
+    """Apply a queued review session: all grades in one transaction"""
+    data = request.get_json(silent=True)
+    items = data.get("reviews") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"success": False, "error": "No reviews provided"}), 400
+    if len(items) > MAX_REVIEW_BATCH:
+        return jsonify({"success": False, "error": f"At most {MAX_REVIEW_BATCH} reviews per batch"}), 400
+
     today = date.today()
-    next_review = compute_next_review(today, box)
+    try:
+        reviews = [parse_review(item, today) for item in items]
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    user = current_user()
+    db = get_db()
+    card_ids = sorted({card_id for card_id, _, _ in reviews})
+    placeholders = ",".join("?" * len(card_ids))
+    states = {
+        row["id"]: (row["leitner_box"], row["ease"], row["interval_days"])
+        for row in db.execute(
+            f"SELECT id, leitner_box, ease, interval_days FROM cards WHERE user_id=? AND id IN ({placeholders})",
+            (user["id"], *card_ids),
+        )
+    }
+
+    # Replay grades in review order so repeated grades of one card chain correctly
+    settings = user_settings()
+    policy = user_policy(settings)
+    load = forecast_cache.get(db, user["id"], today, MAX_FORECAST_DAYS) if settings["smooth_load"] else None
+    updates, events = {}, []
+    for card_id, result, reviewed_on in sorted(reviews, key=lambda r: r[2]):
+        if card_id not in states:
+            continue
+        box_before = states[card_id][0]
+        box, ease, interval_days = policy.review(*states[card_id], result)
+        if load is not None:
+            interval_days = scheduler.place(interval_days, load, (reviewed_on - today).days)
+        states[card_id] = (box, ease, interval_days)
+        updates[card_id] = (reviewed_on, scheduler.due_date(reviewed_on, interval_days))
+        events.append((user["id"], card_id, reviewed_on, result, box_before, box, interval_days))
+
+    stamp = change_stamp()
+    data_versions.begin_bulk(db, user["id"])
+    db.executemany(
+        MARK_CARD_SQL,
+        [(*states[card_id], reviewed_on, next_review, stamp, card_id, user["id"])
+         for card_id, (reviewed_on, next_review) in updates.items()],
+    )
+    db.executemany(REVIEW_EVENT_SQL, events)
+    data_versions.end_bulk(db, user["id"])
+    db.commit()
+    forecast_cache.invalidate(user["id"])
+
+    return jsonify({
+        "success": True,
+        "cards": [
+            {"card_id": card_id, "leitner_box": states[card_id][0], "next_review": next_review.isoformat()}
+            for card_id, (_, next_review) in updates.items()
+        ],
+        "not_found": [card_id for card_id in card_ids if card_id not in states],
+    })
+
+def parse_daily_cap(value):
+    """users.daily_cap from the settings form: None when blank; raises ValueError"""
+    if not value.strip():
+        return None
+    try:
+        cap = int(value)
+    except ValueError:
+        raise ValueError("The daily limit must be a whole number")
+    if not 1 <= cap <= MAX_DAILY_CAP:
+        raise ValueError(f"The daily limit must be between 1 and {MAX_DAILY_CAP}")
+    return cap
+
+@app.route("/schedule", methods=["POST"])
+@login_required
+def change_schedule():
+    """Save the user's scheduling policy and load settings, and re-date every card under them"""
+    user = current_user()
+    name = request.form.get("scheduler", "")
+    intervals = None
+    if name not in scheduler.POLICIES:
+        flash("Unknown review schedule.", "error")
+        return redirect(url_for("dashboard"))
+    try:
+        if name == "custom":
+            intervals = scheduler.format_intervals(scheduler.parse_intervals(request.form.get("intervals", "")))
+        daily_cap = parse_daily_cap(request.form.get("daily_cap", ""))
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for("dashboard"))
+    settings = {"scheduler": name, "intervals": intervals, "daily_cap": daily_cap,
+                "smooth_load": 1 if request.form.get("smooth_load") else 0}
+
+    db = get_db()
+    stamp = change_stamp()
     db.execute(
-        "UPDATE cards SET leitner_box=?, last_reviewed=?, next_review=? WHERE id=?",
-        (box, today, next_review, card_id),
+        "UPDATE users SET scheduler=?, intervals=?, smooth_load=?, daily_cap=?, updated_at=? WHERE id=?",
+        (name, intervals, settings["smooth_load"], daily_cap, stamp, user["id"]),
+    )
+    count = scheduler.reschedule(
+        db, user["id"], scheduler.get_policy(name, intervals), stamp, smooth=settings["smooth_load"],
     )
     db.commit()
+    forecast_cache.invalidate(user["id"])
+    flash(f"🗓️ Review schedule changed - {count} card(s) rescheduled.", "success")
     return redirect(url_for("dashboard"))
 
 @app.route("/api/improve-note", methods=["POST"])
 @csrf.exempt
 @login_required
 def improve_note_api():
-    """API endpoint to improve notes with AI"""
+    """Queue an AI note improvement; poll the returned status_url for the result.
+    A note improved recently is answered straight from note_cache."""
     try:
         data = request.get_json()
         if not data:
@@ -463,22 +1196,124 @@ def improve_note_api():
         if not note_text:
             return jsonify({"success": False, "error": "Note is empty"}), 400
         
-        improved_note, error = improve_note_with_ai(note_text, problem_title)
+        if not ai_enabled():
+            return jsonify({"success": False, "error": "AI features require OpenAI API key to be configured."}), 400
+        
+        user = current_user()
+        db = get_db()
+        key = ai_cache.cache_key(AI_PROMPT_VERSION, AI_MODEL, problem_title, note_text)
+        cached = note_cache.get(db, key)
+        if cached:
+            return jsonify({"success": True, "status": "done", "improved_note": cached, "cached": True})
         
-        if error:
-            return jsonify({"success": False, "error": error}), 400
+        jobs.purge_jobs(db, AI_JOB_RETENTION)
+        job_id = jobs.create_job(db, user["id"], note_text, problem_title)
+        pool = database.get_pool(app.config["DATABASE"], app.config["DATABASE_URL"])
+        try:
+            ai_jobs.submit(jobs.run_job, pool, job_id, improve_note_cached, pool, key, note_text, problem_title)
+        except jobs.QueueFull:
+            db.execute("DELETE FROM ai_jobs WHERE id=?", (job_id,))
+            db.commit()
+            return jsonify({"success": False, "error": "AI is busy right now. Please try again in a moment."}), 429
         
-        return jsonify({"success": True, "improved_note": improved_note})
+        return jsonify({
+            "success": True,
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": url_for("improve_note_status", job_id=job_id),
+        }), 202
     except Exception as e:
         return jsonify({"success": False, "error": f"Server error: {str(e)}"}), 500
 
-@app.route("/delete/<int:card_id>", methods=["POST"])
+def sse_event(event, data):
+    """One server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route("/api/improve-note/stream", methods=["POST"])
+@login_required
+def improve_note_stream():
+    """Stream an AI note improvement as server-sent events: "delta" events
+    carry text as it is generated, then one "done" or "error" event. If the
+    client goes away, the server closes the generator and with it the
+    OpenAI stream, so abandoned generations stop costing tokens."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "error": "No data provided"}), 400
+    note_text = data.get("note", "")
+    problem_title = data.get("title", "")
+    if not isinstance(note_text, str) or not isinstance(problem_title, str):
+        return jsonify({"success": False, "error": "note and title must be text"}), 400
+    note_text = note_text.strip()
+    if not note_text:
+        return jsonify({"success": False, "error": "Note is empty"}), 400
+    if not ai_enabled():
+        return jsonify({"success": False, "error": "AI features require OpenAI API key to be configured."}), 400
+    
+    key = ai_cache.cache_key(AI_PROMPT_VERSION, AI_MODEL, problem_title, note_text)
+    cached = note_cache.get(get_db(), key)
+    pool = database.get_pool(app.config["DATABASE"], app.config["DATABASE_URL"])
+    if not cached and not ai_streams.acquire(blocking=False):
+        return jsonify({"success": False, "error": "AI is busy right now. Please try again in a moment."}), 429
+    
+    # Runs after the view returns, so no pooled connection is held while streaming
+    def generate():
+        if cached:
+            yield sse_event("delta", {"text": cached})
+            yield sse_event("done", {"cached": True})
+            return
+        pieces = []
+        generation = stream_note_with_ai(note_text, problem_title)
+        try:
+            for piece in generation:
+                pieces.append(piece)
+                yield sse_event("delta", {"text": piece})
+        except Exception as e:
+            yield sse_event("error", {"error": f"AI service error: {e}"})
+            return
+        finally:
+            generation.close()
+        improved_note = "".join(pieces).strip()
+        if improved_note:
+            conn = pool.acquire()
+            try:
+                note_cache.put(conn, key, improved_note)
+            finally:
+                pool.release(conn)
+        yield sse_event("done", {"cached": False})
+    
+    response = Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # stop nginx-style proxies from buffering the stream
+    })
+    if not cached:
+        # The server closes the response when the stream ends or the client
+        # leaves, even if the generator never started
+        response.call_on_close(ai_streams.release)
+    return response
+
+@app.route("/api/improve-note/<job_id>")
+@login_required
+def improve_note_status(job_id):
+    """Status of an AI job; includes improved_note once it is done"""
+    # A job can't outlive its call timeout by much, so anything older is lost
+    job = jobs.get_job(get_db(), job_id, current_user()["id"], stale_after=app.config["AI_TIMEOUT"] * 4 + 60)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    response = {"success": job["status"] != "failed", "job_id": job_id, "status": job["status"]}
+    if job["status"] == "done":
+        response["improved_note"] = job["result"]
+    elif job["status"] == "failed":
+        response["error"] = job["error"]
+    return jsonify(response)
+
+@app.route(f"/delete/<int(max={MAX_ID}):card_id>", methods=["POST"])
 @login_required
 def delete(card_id):
     user = current_user()
     db = get_db()
     db.execute("DELETE FROM cards WHERE id=? AND user_id=?", (card_id, user["id"]))
     db.commit()
+    forecast_cache.invalidate(user["id"])
     flash("Card deleted.", "success")
     return redirect(url_for("dashboard"))
 
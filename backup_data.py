@@ -1,108 +1,362 @@
 #!/usr/bin/env python3
 """
 Simple backup utility for Leitner App
-Exports all data to CSV files for safe keeping
+Two kinds of backup:
+
+- Exports: gzip-compressed CSV (or NDJSON) files for safe keeping. Tables are
+  streamed in keyset batches of BATCH_SIZE rows, so memory stays flat however
+  many cards there are. A manifest.json records each file's row count and
+  SHA-256. Users are exported with their password hashes. An incremental
+  export only holds the rows whose updated_at moved since the previous export,
+  plus the tombstones of deleted rows; restore_data.py replays the full export
+  and its deltas. Review history is exported too: review_events is
+  append-only, so a delta holds the events after the previous export's last
+  id, and every export carries the whole (small) review_daily rollup table.
+- Snapshots: a complete, consistent copy of the database file (password
+  hashes included) made with SQLite's online backup API while the app keeps
+  running.
+
+Only the newest BACKUP_KEEP of each kind are kept.
+
+    python backup_data.py              # CSV export
+    python backup_data.py --ndjson     # NDJSON export
+    python backup_data.py incremental  # changes since the last export
+    python backup_data.py snapshot     # snapshot
+    python backup_data.py rotate       # apply retention now
+    python backup_data.py list         # list backups
 """
 
 import sqlite3
 import csv
-from datetime import datetime
+import glob
+import shutil
+import time
+import gzip
+import hashlib
+import io
+import json
+from datetime import datetime, timedelta
 import os
 
-DATABASE = "db.sqlite3"
+DATABASE = os.environ.get("DATABASE", "db.sqlite3")
 BACKUP_DIR = "backups"
+BATCH_SIZE = 5000
+MANIFEST = "manifest.json"
+BACKUP_KEEP = int(os.environ.get("BACKUP_KEEP", 7))   # newest exports and snapshots kept
+SNAPSHOT_PAGES = 256        # database pages copied per backup step
+SNAPSHOT_PAUSE = 0.01       # seconds between steps, leaving the write lock to the app
+# A delta re-exports rows stamped this long before the previous cutoff, so a
+# write whose transaction committed after that export read is never missed.
+# Replaying a row twice is harmless.
+CHANGE_OVERLAP = timedelta(minutes=5)
+STAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
 
-def create_backup():
-    """Export all data to CSV files"""
-    
-    # Create backup directory if it doesn't exist
-    if not os.path.exists(BACKUP_DIR):
-        os.makedirs(BACKUP_DIR)
-    
-    # Create timestamped backup folder
+TABLES = {
+    # Hashes are salted, and a restore without them locks every user out
+    "users": ["id", "email", "password_hash", "created_at", "updated_at", "scheduler", "intervals",
+              "smooth_load", "daily_cap"],
+    "cards": [
+        "id", "user_id", "title", "link", "idea", "solved_date",
+        "leitner_box", "next_review", "last_reviewed", "created_at", "updated_at", "slug",
+        "difficulty", "tags", "interval_days", "ease"
+    ],
+    "review_events": ["id", "user_id", "card_id", "reviewed_at", "result", "box_before", "box_after",
+                      "interval_days", "recorded_at"],
+    "review_daily": ["user_id", "day", "reviews", "passes", "promoted", "demoted", "mastered"],
+}
+KEYS = {"review_daily": ["user_id", "day"]}   # tables not keyed by id
+TOMBSTONES = ["id", "table_name", "row_id", "deleted_at"]
+
+class HashingWriter(io.RawIOBase):
+    """File wrapper that hashes the (compressed) bytes as they are written"""
+
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self.f.write(data)
+
+def iter_batches(conn, table, columns, batch_size=BATCH_SIZE, since=None, stamp_column="updated_at", after_id=0):
+    """Yield lists of up to batch_size rows.
+
+    Each batch is its own short query that resumes after the last row seen,
+    so writers and WAL checkpoints are never held up by a long-running
+    export. A full export walks the table by its key (id, from after_id on);
+    with `since`, only rows stamped at or after it are read, in (stamp, id)
+    order off the stamp index.
+    """
+    select = f"SELECT {', '.join(columns)} FROM {table}"
+    if since is None:
+        key = KEYS.get(table, ["id"])
+        sql = f"{select} WHERE ({', '.join(key)}) > ({', '.join('?' * len(key))}) ORDER BY {', '.join(key)} LIMIT ?"
+        position = (after_id,) + (0,) * (len(key) - 1)
+        key_index = [columns.index(column) for column in key]
+    else:
+        sql = f"{select} WHERE ({stamp_column}, id) > (?, ?) ORDER BY {stamp_column}, id LIMIT ?"
+        position = (since, 0)
+        stamp_index = columns.index(stamp_column)
+    while True:
+        batch = conn.execute(sql, (*position, batch_size)).fetchall()
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+        position = tuple(last[i] for i in key_index) if since is None else (last[stamp_index], last[0])
+
+def export_table(conn, table, path, fmt="csv", batch_size=BATCH_SIZE, since=None, after_id=0):
+    """Stream one table (all of it, rows changed since `since`, or rows with
+    an id above after_id) into a gzip file; returns (row_count, sha256 of the file)"""
+    columns = TOMBSTONES if table == "tombstones" else TABLES[table]
+    stamp_column = "deleted_at" if table == "tombstones" else "updated_at"
+    rows = 0
+    with open(path, "wb") as raw:
+        hashing = HashingWriter(raw)
+        # mtime=0 keeps the output (and its checksum) identical for identical data
+        with gzip.GzipFile(fileobj=hashing, mode="wb", mtime=0) as compressed:
+            with io.TextIOWrapper(compressed, encoding="utf-8", newline="") as f:
+                if fmt == "csv":
+                    writer = csv.writer(f)
+                    writer.writerow(columns)
+                for batch in iter_batches(conn, table, columns, batch_size, since, stamp_column, after_id):
+                    if fmt == "csv":
+                        writer.writerows(batch)
+                    else:
+                        f.writelines(json.dumps(dict(zip(columns, row))) + "\n" for row in batch)
+                    rows += len(batch)
+    return rows, hashing.sha256.hexdigest()
+
+def iter_rows(path):
+    """Read a backup file (CSV or NDJSON, gzip-compressed or not) as dicts of strings/values"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        if ".ndjson" in os.path.basename(path):
+            for line in f:
+                yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+def read_manifest(folder):
+    """A backup folder's manifest, or None for backups made before manifests existed"""
+    path = os.path.join(folder, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def latest_export(backup_dir):
+    """(folder name, manifest) of the newest export that has a change cutoff, or None"""
+    for name in sorted(glob.glob(os.path.join(backup_dir, "backup_*")), reverse=True):
+        manifest = read_manifest(name)
+        if manifest and manifest.get("cutoff"):
+            return os.path.basename(name), manifest
+    return None
+
+def new_backup_folder(backup_dir):
+    """backups/backup_<timestamp>, suffixed if an export already ran this second"""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_folder = os.path.join(BACKUP_DIR, f"backup_{timestamp}")
-    os.makedirs(backup_folder)
-    
+    folder = os.path.join(backup_dir, f"backup_{timestamp}")
+    n = 1
+    while os.path.exists(folder):
+        n += 1
+        folder = os.path.join(backup_dir, f"backup_{timestamp}_{n}")
+    os.makedirs(folder)
+    return folder
+
+def create_backup(database=None, backup_dir=None, fmt="csv", batch_size=BATCH_SIZE, incremental=False):
+    """Export all data (or, if incremental, what changed since the last export)
+    to compressed files plus a manifest"""
+    database = database or DATABASE
+    backup_dir = backup_dir or BACKUP_DIR
+    previous = latest_export(backup_dir) if incremental else None
+    if incremental and not previous:
+        print("ℹ️  No earlier export to build on - making a full one")
+
+    # Create timestamped backup folder
+    backup_folder = new_backup_folder(backup_dir)
+
     # Connect to database
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Backup users table
-    print("📥 Backing up users...")
-    cursor.execute("SELECT id, email, created_at FROM users")
-    users = cursor.fetchall()
-    
-    with open(os.path.join(backup_folder, "users.csv"), "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["id", "email", "created_at"])
-        for user in users:
-            writer.writerow([user["id"], user["email"], user["created_at"]])
-    
-    print(f"✅ Backed up {len(users)} users")
-    
-    # Backup cards table
-    print("📥 Backing up cards...")
-    cursor.execute("""
-        SELECT id, user_id, title, link, idea, solved_date, 
-               leitner_box, next_review, last_reviewed, created_at
-        FROM cards
-    """)
-    cards = cursor.fetchall()
-    
-    with open(os.path.join(backup_folder, "cards.csv"), "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            "id", "user_id", "title", "link", "idea", "solved_date",
-            "leitner_box", "next_review", "last_reviewed", "created_at"
-        ])
-        for card in cards:
-            writer.writerow([
-                card["id"], card["user_id"], card["title"], card["link"],
-                card["idea"], card["solved_date"], card["leitner_box"],
-                card["next_review"], card["last_reviewed"], card["created_at"]
-            ])
-    
-    print(f"✅ Backed up {len(cards)} cards")
-    
-    conn.close()
-    
+    conn = sqlite3.connect(database)
+    # Rows written after this instant are left for the next delta
+    cutoff = conn.execute("SELECT strftime('%Y-%m-%d %H:%M:%f', 'now')").fetchone()[0]
+    # Events recorded after this are left for the next delta (or exported
+    # twice, which restore ignores)
+    last_event = conn.execute("SELECT COALESCE(MAX(id), 0) FROM review_events").fetchone()[0]
+    since = None
+    after_event = 0
+    manifest = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "kind": "delta" if previous else "full",
+        "format": fmt,
+        "compression": "gzip",
+        "cutoff": cutoff,
+        "tables": {},
+    }
+    if previous:
+        base, base_manifest = previous
+        since = (datetime.strptime(base_manifest["cutoff"], STAMP_FORMAT) - CHANGE_OVERLAP).strftime(STAMP_FORMAT)
+        manifest.update(base=base, since=since)
+        after_event = base_manifest["tables"].get("review_events", {}).get("last_id", 0)
+
+    try:
+        for table in [*TABLES, "tombstones"] if previous else TABLES:
+            print(f"📥 Backing up {table}...")
+            filename = f"{table}.{fmt}.gz"
+            path = os.path.join(backup_folder, filename)
+            if table == "review_events":
+                rows, sha256 = export_table(conn, table, path, fmt, batch_size, after_id=after_event)
+            elif table == "review_daily":
+                rows, sha256 = export_table(conn, table, path, fmt, batch_size)
+            else:
+                rows, sha256 = export_table(conn, table, path, fmt, batch_size, since)
+            columns = TOMBSTONES if table == "tombstones" else TABLES[table]
+            manifest["tables"][table] = {"file": filename, "columns": columns, "rows": rows, "sha256": sha256}
+            if table == "review_events":
+                manifest["tables"][table]["last_id"] = max(last_event, after_event)
+            print(f"✅ Backed up {rows} {'changed ' if previous else ''}{table}")
+        if not previous:
+            # Deletes before a full export are already reflected in it
+            older = (datetime.strptime(cutoff, STAMP_FORMAT) - CHANGE_OVERLAP).strftime(STAMP_FORMAT)
+            conn.execute("DELETE FROM tombstones WHERE deleted_at < ?", (older,))
+            conn.commit()
+    finally:
+        conn.close()
+
+    with open(os.path.join(backup_folder, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
     print(f"\n🎉 Backup completed successfully!")
     print(f"📁 Location: {backup_folder}")
     print(f"\nFiles created:")
-    print(f"  - users.csv ({len(users)} records)")
-    print(f"  - cards.csv ({len(cards)} records)")
-    
+    for table, entry in manifest["tables"].items():
+        print(f"  - {entry['file']} ({entry['rows']} records)")
+    print(f"  - {MANIFEST} (row counts and SHA-256 checksums)")
+
     return backup_folder
 
+def create_snapshot(database=None, backup_dir=None, pages=SNAPSHOT_PAGES, pause=SNAPSHOT_PAUSE):
+    """Copy the whole database into backups/snapshot_<timestamp>.sqlite3"""
+    database = database or DATABASE
+    backup_dir = backup_dir or BACKUP_DIR
+    os.makedirs(backup_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(backup_dir, f"snapshot_{timestamp}.sqlite3")
+    partial = path + ".partial"
+
+    print(f"📸 Snapshotting {database}...")
+    source = sqlite3.connect(database, isolation_level=None)
+    target = sqlite3.connect(partial)
+    try:
+        # Pin one read snapshot for the whole copy. Without it, SQLite restarts
+        # the backup every time the app commits, which under steady review
+        # traffic means it never finishes. In WAL mode the app keeps writing.
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        source.backup(target, pages=pages, progress=lambda status, remaining, total: time.sleep(pause))
+        source.execute("COMMIT")
+
+        # A self-contained file: no -wal sidecar needed to open it
+        target.execute("PRAGMA journal_mode=DELETE")
+        if target.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+            raise sqlite3.DatabaseError(f"Snapshot {partial} failed its integrity check")
+        counts = {t: target.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in TABLES}
+    finally:
+        target.close()
+        source.close()
+    os.replace(partial, path)
+
+    print(f"✅ Snapshot saved: {path}")
+    print(f"   {counts['users']} users, {counts['cards']} cards (password hashes included)")
+    return path
+
+def export_chain(backup_dir, name):
+    """[full export, delta, ..., name] needed to restore export `name`, or None
+    if one of its bases is missing"""
+    chain = [name]
+    while True:
+        manifest = read_manifest(os.path.join(backup_dir, chain[0]))
+        if not manifest or manifest.get("kind", "full") == "full":
+            return chain
+        if not os.path.isdir(os.path.join(backup_dir, manifest["base"])):
+            return None
+        chain.insert(0, manifest["base"])
+
+def rotate_backups(backup_dir=None, keep=None):
+    """Delete all but the newest `keep` exports and `keep` snapshots; returns the removed paths.
+    Older exports that a kept delta builds on are kept too."""
+    backup_dir = backup_dir or BACKUP_DIR
+    keep = BACKUP_KEEP if keep is None else keep
+    # Timestamped names sort chronologically
+    exports = sorted(glob.glob(os.path.join(backup_dir, "backup_*")), reverse=True)
+    needed = set()
+    for path in exports[:keep]:
+        needed.update(export_chain(backup_dir, os.path.basename(path)) or [])
+    snapshots = sorted(glob.glob(os.path.join(backup_dir, "snapshot_*.sqlite3")), reverse=True)
+    removed = []
+    for path in [p for p in exports if os.path.basename(p) not in needed] + snapshots[keep:]:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+        removed.append(path)
+    for path in removed:
+        print(f"🗑️  Removed old backup: {os.path.basename(path)}")
+    return removed
+
 def list_backups():
     """List all available backups"""
     if not os.path.exists(BACKUP_DIR):
         print("No backups found.")
         return
-    
-    backups = [d for d in os.listdir(BACKUP_DIR) if d.startswith("backup_")]
+
+    backups = [
+        d for d in os.listdir(BACKUP_DIR)
+        if d.startswith("backup_") or (d.startswith("snapshot_") and d.endswith(".sqlite3"))
+    ]
     if not backups:
         print("No backups found.")
         return
-    
+
     print(f"\n📦 Available backups ({len(backups)}):")
-    for backup in sorted(backups, reverse=True):
+    for backup in sorted(backups, key=lambda d: d.split("_", 1)[1], reverse=True):
         backup_path = os.path.join(BACKUP_DIR, backup)
-        timestamp = backup.replace("backup_", "")
+        timestamp = backup.split("_", 1)[1][:15]
         # Format timestamp nicely
         dt = datetime.strptime(timestamp, "%Y%m%d_%H%M%S")
         formatted = dt.strftime("%Y-%m-%d %H:%M:%S")
-        print(f"  - {formatted} ({backup})")
+        if backup.startswith("snapshot_"):
+            kind = "snapshot"
+        else:
+            kind = "delta export" if (read_manifest(backup_path) or {}).get("kind") == "delta" else "export"
+        print(f"  - {formatted} {kind} ({backup})")
 
 if __name__ == "__main__":
     import sys
-    
+
     if len(sys.argv) > 1 and sys.argv[1] == "list":
         list_backups()
+    elif len(sys.argv) > 1 and sys.argv[1] == "rotate":
+        rotate_backups()
+    elif len(sys.argv) > 1 and sys.argv[1] == "incremental":
+        create_backup(fmt="ndjson" if "--ndjson" in sys.argv else "csv", incremental=True)
+        rotate_backups()
+    elif len(sys.argv) > 1 and sys.argv[1] == "snapshot":
+        create_snapshot()
+        rotate_backups()
+        print("\n💡 Tip: Upload the snapshot file to Dropbox/Google Drive for safety!")
     else:
-        create_backup()
+        create_backup(fmt="ndjson" if "--ndjson" in sys.argv else "csv")
+        rotate_backups()
         print("\n💡 Tip: Upload the backup folder to Dropbox/Google Drive for safety!")
         print("💡 Run 'python backup_data.py list' to see all backups")
-
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+SQLite concurrency load test for Leitner App
+Runs several worker processes (like gunicorn workers) doing a mix of due-queue
+reads and review writes, first the old way (rollback journal, new connection
+per request) and then with WAL and pooled connections from database.py.
+
+    python bench_concurrency.py                    # 4 workers, 5s per mode
+    python bench_concurrency.py 8 10               # 8 workers, 10s per mode
+"""
+
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import database
+import migrate
+
+USERS = 50
+CARDS_PER_USER = 200
+WRITE_RATIO = 0.2
+
+READ_SQL = """SELECT * FROM cards WHERE user_id=? AND next_review <= ?
+              ORDER BY next_review ASC, id ASC LIMIT 50"""
+WRITE_SQL = "UPDATE cards SET leitner_box=?, last_reviewed=?, next_review=? WHERE id=?"
+
+def build_database(path):
+    migrate.migrate(path)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO users (id, email, password_hash) VALUES (?, ?, 'x')",
+        [(i, f"user{i}@example.com") for i in range(1, USERS + 1)],
+    )
+    today = date.today()
+    conn.executemany(
+        """INSERT INTO cards (user_id, title, solved_date, next_review)
+           VALUES (?, 'Problem', ?, ?)""",
+        [
+            (user_id, today, today - timedelta(days=i % 10))
+            for user_id in range(1, USERS + 1)
+            for i in range(CARDS_PER_USER)
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+def connect_legacy(path):
+    """What get_db() used to do on every request"""
+    conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def worker(path, pooled, seconds, seed, results):
+    rng = random.Random(seed)
+    pool = database.sqlite_pool(path) if pooled else None
+    reads, writes, errors, latencies = 0, 0, 0, []
+    deadline = time.perf_counter() + seconds
+    today = date.today()
+
+    while time.perf_counter() < deadline:
+        conn = pool.acquire() if pooled else connect_legacy(path)
+        start = time.perf_counter()
+        try:
+            if rng.random() < WRITE_RATIO:
+                card_id = rng.randint(1, USERS * CARDS_PER_USER)
+                box = rng.randint(1, 5)
+                conn.execute(WRITE_SQL, (box, today, today + timedelta(days=box), card_id))
+                conn.commit()
+                writes += 1
+            else:
+                conn.execute(READ_SQL, (rng.randint(1, USERS), today)).fetchall()
+                reads += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+        except sqlite3.OperationalError:
+            errors += 1  # "database is locked"
+        finally:
+            if pooled:
+                pool.release(conn)
+            else:
+                conn.close()
+
+    results.put((reads, writes, errors, latencies))
+
+def run(path, pooled, workers, seconds):
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=worker, args=(path, pooled, seconds, seed, results))
+        for seed in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    totals = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    latencies = sorted(l for t in totals for l in t[3])
+    return {
+        "reads": sum(t[0] for t in totals) / seconds,
+        "writes": sum(t[1] for t in totals) / seconds,
+        "errors": sum(t[2] for t in totals),
+        "p50": statistics.median(latencies) if latencies else 0,
+        "p99": latencies[int(len(latencies) * 0.99)] if latencies else 0,
+    }
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    workdir = tempfile.mkdtemp()
+    before_path = os.path.join(workdir, "before.sqlite3")
+    after_path = os.path.join(workdir, "after.sqlite3")
+    print(f"📦 {USERS * CARDS_PER_USER:,} cards, {workers} workers, {seconds:g}s per mode, "
+          f"{WRITE_RATIO:.0%} writes\n")
+    build_database(before_path)
+    build_database(after_path)
+
+    print(f"{'mode':<28}{'reads/s':>10}{'writes/s':>10}{'locked':>8}{'p50 ms':>9}{'p99 ms':>9}")
+    for label, path, pooled in [
+        ("before: journal, connect", before_path, False),
+        ("after: WAL, pooled", after_path, True),
+    ]:
+        r = run(path, pooled, workers, seconds)
+        print(f"{label:<28}{r['reads']:>10.0f}{r['writes']:>10.0f}{r['errors']:>8}"
+              f"{r['p50']:>9.2f}{r['p99']:>9.2f}")
+
+if __name__ == "__main__":
+    main()
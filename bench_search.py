@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Search benchmark for Leitner App
+Compares the old LIKE scan with the FTS5 index on a synthetic collection.
+
+    python bench_search.py            # 100k cards
+    python bench_search.py 250000     # custom size
+"""
+
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+import migrate
+
+TECHNIQUES = (
+    "array hash map two pointers sliding window binary search tree graph bfs dfs "
+    "heap stack queue dynamic programming greedy backtracking trie union find "
+    "interval sort prefix sum bit manipulation linked list matrix string"
+).split()
+
+QUERIES = ["two", "sliding win", "union find", "dynamic programming", "trie"]
+
+def make_vocabulary(rng, size=5000):
+    """Technique words plus filler words, weighted so a few are common (Zipf-like)"""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    filler = ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+    words = TECHNIQUES + filler
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    rng.shuffle(words)
+    return words, weights
+
+def build_database(path, card_count):
+    """One heavy user owning every card - the case where the LIKE scan hurts most"""
+    migrate.migrate(path)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO users (id, email, password_hash) VALUES (1, 'heavy@example.com', 'x')")
+    rng = random.Random(42)
+    words, weights = make_vocabulary(rng)
+    today = date.today().isoformat()
+    rows = (
+        (
+            " ".join(w.capitalize() for w in rng.choices(words, weights, k=3)),
+            " ".join(rng.choices(words, weights, k=25)),
+            today,
+            today,
+        )
+        for _ in range(card_count)
+    )
+    conn.executemany(
+        """INSERT INTO cards (user_id, title, idea, solved_date, next_review)
+           VALUES (1, ?, ?, ?, ?)""",
+        rows,
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    return conn
+
+def time_query(run, repeat=20):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    card_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    # Imported here so app.py's startup check uses the scratch database
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE"] = os.path.join(workdir, "app.sqlite3")
+    import app as leitner
+
+    path = os.path.join(workdir, "bench.sqlite3")
+    print(f"📦 Building {card_count:,} cards...")
+    conn = build_database(path, card_count)
+    conn.row_factory = sqlite3.Row
+    user_id = 1
+
+    print(f"\n{'query':<22}{'LIKE (ms)':>12}{'FTS5 (ms)':>12}")
+    for q in QUERIES:
+        like = time_query(lambda: conn.execute(
+            """SELECT * FROM cards WHERE user_id=? AND (title LIKE ? OR idea LIKE ?)
+               ORDER BY created_at DESC""",
+            (user_id, f"%{q}%", f"%{q}%"),
+        ).fetchall())
+        fts = time_query(lambda: leitner.search_cards(conn, user_id, q))
+        print(f"{q:<22}{like:>12.2f}{fts:>12.2f}")
+
+    conn.close()
+
+if __name__ == "__main__":
+    main()
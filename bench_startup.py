@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for Leitner App
+Imports app.py in a fresh interpreter under `python -X importtime` (what every
+gunicorn worker boot and cold start pays) and reports the total against
+STARTUP_BUDGET_MS, plus the modules that cost the most.
+
+    python bench_startup.py          # median of 5 runs
+    python bench_startup.py 10       # median of 10 runs
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import migrate
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STARTUP_BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", 500))
+
+# Only needed by the AI endpoints, PostgreSQL or rescheduling; importing app must not load them
+LAZY_MODULES = ("openai", "httpx", "requests", "bs4", "psycopg2", "numpy")
+
+def measure(database, module="app"):
+    """Import module once in a new interpreter.
+
+    Returns (total_ms, {module: (self_ms, cumulative_ms)}, [lazy modules loaded]).
+    """
+    check = f"import {module}, sys; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    env = dict(os.environ, DATABASE=database, PYTHONDONTWRITEBYTECODE="1")
+    env.pop("DATABASE_URL", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", check],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+    loaded = [m for m in result.stdout.strip().split(",") if m]
+    return modules[module][1], modules, loaded
+
+def scratch_database():
+    """A migrated database, so the timing doesn't include creating the schema"""
+    path = os.path.join(tempfile.mkdtemp(), "startup.sqlite3")
+    migrate.migrate(path)
+    return path
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    database = scratch_database()
+    measure(database)  # warm the OS file cache
+
+    results = [measure(database) for _ in range(runs)]
+    total = statistics.median(r[0] for r in results)
+    modules, loaded = results[-1][1], results[-1][2]
+
+    print(f"📦 import app: {total:.0f} ms (median of {runs}), budget {STARTUP_BUDGET_MS:.0f} ms\n")
+    print(f"{'module':<40}{'self ms':>10}{'total ms':>10}")
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:15]
+    for name, (self_ms, cumulative_ms) in slowest:
+        print(f"{name:<40}{self_ms:>10.1f}{cumulative_ms:>10.1f}")
+
+    if loaded:
+        print(f"\n⚠️  Loaded at import time but should be lazy: {', '.join(loaded)}")
+    if total > STARTUP_BUDGET_MS:
+        print(f"\n❌ Over budget by {total - STARTUP_BUDGET_MS:.0f} ms")
+        sys.exit(1)
+    print("\n✅ Within budget")
+
+if __name__ == "__main__":
+    main()
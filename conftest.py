@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import tempfile
+from datetime import date
+
+import pytest
+
+# app.py checks its schema at import time, so point it at a scratch database
+# before it is imported.
+os.environ["DATABASE"] = os.path.join(tempfile.mkdtemp(), "db.sqlite3")
+
+import app as leitner
+import forecast
+import leetcode
+import migrate
+
+@pytest.fixture
+def app(tmp_path):
+    path = str(tmp_path / "db.sqlite3")
+    migrate.migrate(path)
+    leitner.app.config.update(
+        DATABASE=path,
+        TESTING=True,
+        WTF_CSRF_ENABLED=False,
+        SESSION_USER_CACHE=False,
+    )
+    # Per-process cache keyed by user id; every test starts a new database
+    leitner.forecast_cache = forecast.ForecastCache(leitner.FORECAST_CACHE_TTL, leitner.FORECAST_CACHE_MAX_ENTRIES)
+    return leitner.app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def db(app):
+    conn = sqlite3.connect(app.config["DATABASE"], detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+@pytest.fixture
+def queries(monkeypatch):
+    """Every SQL statement the app runs during the test, in order"""
+    statements = []
+    get_db = leitner.get_db
+
+    def traced_get_db():
+        conn = get_db()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(leitner, "get_db", traced_get_db)
+    return statements
+
+def create_user(db, email="user@example.com"):
+    cursor = db.execute(
+        "INSERT INTO users (email, password_hash) VALUES (?, ?)", (email, "x")
+    )
+    db.commit()
+    return cursor.lastrowid
+
+def create_card(db, user_id, title="Two Sum", box=1, next_review=None, link=None):
+    today = date.today()
+    link = link or f"https://leetcode.com/problems/{title.lower().replace(' ', '-')}/"
+    cursor = db.execute(
+        """INSERT INTO cards (user_id, title, link, slug, idea, solved_date, leitner_box, next_review)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        (user_id, title, link, leetcode.card_slug(link), "", today, box, next_review or today),
+    )
+    db.commit()
+    return cursor.lastrowid
+
+def login(client, user_id, email="user@example.com"):
+    with client.session_transaction() as sess:
+        sess["user_id"] = user_id
+        sess["user_email"] = email
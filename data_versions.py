@@ -0,0 +1,31 @@
+"""
+Per-user data versions for Leitner App
+data_versions (migration 0014) holds a counter per user that triggers bump on
+every change to their cards, review history or review settings; app.py
+builds page and API ETags from it.
+
+SQLite has no statement-level triggers, so a bulk write wraps itself in
+begin_bulk() / end_bulk() (migration 0015): the version goes up once for the
+whole write instead of once per row.
+"""
+
+import database
+
+VERSION_SQL = database.prepare("data_version", "SELECT version, started_at FROM data_versions WHERE user_id=?")
+
+def current(db, user_id):
+    """(version, started_at) of user_id's data; (0, None) before their first change"""
+    row = db.execute(VERSION_SQL, (user_id,)).fetchone()
+    return (row["version"], str(row["started_at"])) if row else (0, None)
+
+def begin_bulk(db, user_id):
+    """Bump user_id's version once and pause the per-row triggers for the
+    rest of the current transaction; call end_bulk() before committing"""
+    db.execute(
+        """INSERT INTO data_versions (user_id, version, bulk) VALUES (?, 1, 1)
+           ON CONFLICT (user_id) DO UPDATE SET version = data_versions.version + 1, bulk = 1""",
+        (user_id,),
+    )
+
+def end_bulk(db, user_id):
+    db.execute("UPDATE data_versions SET bulk = 0 WHERE user_id=?", (user_id,))
@@ -0,0 +1,254 @@
+"""
+Database connections for Leitner App
+Per-process connection pools for both backends:
+
+- SQLite: idle connections configured once for concurrent access (WAL
+  journal, relaxed fsync, larger cache, memory-mapped reads, busy timeout).
+- PostgreSQL (when DATABASE_URL is set): a bounded pool with health checks,
+  handing out connections that accept the app's "?" placeholders and run
+  registered hot queries as server-side prepared statements.
+
+App code writes one SQL dialect ("?" placeholders, dict-like rows) and calls
+get_pool(...).acquire() / release(conn).
+"""
+
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+SQLITE_POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", 4))
+SQLITE_CACHE_KB = int(os.environ.get("SQLITE_CACHE_KB", 20_000))
+SQLITE_MMAP_BYTES = int(os.environ.get("SQLITE_MMAP_BYTES", 256 * 1024 * 1024))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+PG_POOL_SIZE = int(os.environ.get("PG_POOL_SIZE", 5))
+PG_POOL_TIMEOUT = float(os.environ.get("PG_POOL_TIMEOUT", 10))
+PG_HEALTHCHECK_AFTER = float(os.environ.get("PG_HEALTHCHECK_AFTER", 30))
+
+# Constraint violations from either backend surface as this type
+IntegrityError = sqlite3.IntegrityError
+
+# SQL text -> statement name for hot queries (see prepare())
+PREPARED = {}
+
+def prepare(name, sql):
+    """Register a hot query. PostgreSQL connections PREPARE it once and then
+    EXECUTE it by name; sqlite3 already caches compiled statements per
+    connection, so SQLite needs nothing extra. Returns sql unchanged."""
+    PREPARED[sql] = name
+    return sql
+
+def connect_sqlite(path):
+    """Open a connection with the app's row factory and concurrency pragmas"""
+    conn = sqlite3.connect(
+        path,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,  # pooled connections move between worker threads
+    )
+    conn.row_factory = sqlite3.Row
+    # WAL lets readers run alongside the single writer instead of blocking on
+    # it; with WAL, synchronous=NORMAL only syncs at checkpoints and stays safe
+    # against corruption (a power cut can lose the last commits, not the file).
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    return conn
+
+class SQLitePool:
+    """Keeps up to `size` idle connections to one database file for reuse.
+
+    acquire() never blocks: when every pooled connection is in use it opens
+    another one, and release() closes it again if the pool is already full.
+    """
+
+    def __init__(self, path, size=SQLITE_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return connect_sqlite(self.path)
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        conn.set_trace_callback(None)
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def sqlite_pool(path):
+    """The pool for a database file in this process (rebuilt after a fork)"""
+    pool = _pools.get(path)
+    if pool is None or pool.pid != os.getpid():
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None or pool.pid != os.getpid():
+                pool = _pools[path] = SQLitePool(path)
+    return pool
+
+# --- PostgreSQL ---
+class PoolTimeout(Exception):
+    pass
+
+def _to_pyformat(sql):
+    """Rewrite ? placeholders as psycopg2's %s, doubling any literal %"""
+    return sql.replace("%", "%%").replace("?", "%s")
+
+def _to_numbered(sql):
+    """Rewrite ? placeholders as $1, $2, ... for PREPARE"""
+    counter = iter(range(1, sql.count("?") + 1))
+    return re.sub(r"\?", lambda _: f"${next(counter)}", sql)
+
+class PostgresConnection:
+    """Wraps a psycopg2 connection with the subset of the sqlite3 API the app uses"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.prepared = set()
+        self.last_used = time.monotonic()
+
+    def _cursor(self):
+        import psycopg2.extras
+        return self.raw.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    def execute(self, sql, params=()):
+        import psycopg2
+        cursor = self._cursor()
+        name = PREPARED.get(sql)
+        try:
+            if name:
+                if name not in self.prepared:
+                    cursor.execute(f"PREPARE {name} AS {_to_numbered(sql)}")
+                    self.prepared.add(name)
+                placeholders = ", ".join(["%s"] * len(params))
+                cursor.execute(f"EXECUTE {name}({placeholders})" if params else f"EXECUTE {name}", params)
+            else:
+                cursor.execute(_to_pyformat(sql), params)
+        except psycopg2.IntegrityError as e:
+            raise IntegrityError(str(e)) from e
+        return cursor
+
+    def executemany(self, sql, seq_of_params):
+        import psycopg2
+        cursor = self._cursor()
+        try:
+            cursor.executemany(_to_pyformat(sql), seq_of_params)
+        except psycopg2.IntegrityError as e:
+            raise IntegrityError(str(e)) from e
+        return cursor
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    @property
+    def in_transaction(self):
+        import psycopg2.extensions
+        return self.raw.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.raw.close()
+
+class PostgresPool:
+    """At most `size` connections to one server; acquire() waits up to
+    `timeout` seconds for a free one. Connections idle for longer than
+    PG_HEALTHCHECK_AFTER are pinged before reuse and replaced if dead."""
+
+    def __init__(self, url, size=PG_POOL_SIZE, timeout=PG_POOL_TIMEOUT):
+        self.url = url
+        self.size = size
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        import psycopg2
+        return PostgresConnection(psycopg2.connect(self.url))
+
+    def _healthy(self, conn):
+        if conn.raw.closed:
+            return False
+        if time.monotonic() - conn.last_used < PG_HEALTHCHECK_AFTER:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No PostgreSQL connection free after {self.timeout}s")
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if self._healthy(conn):
+                    return conn
+                conn.close()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        try:
+            if not conn.raw.closed and conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            conn.close()
+        if conn.raw.closed:
+            self._slots.release()
+            return
+        conn.last_used = time.monotonic()
+        self._idle.put(conn)
+        self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+def postgres_pool(url):
+    """The pool for a PostgreSQL URL in this process (rebuilt after a fork)"""
+    pool = _pools.get(url)
+    if pool is None or pool.pid != os.getpid():
+        with _pools_lock:
+            pool = _pools.get(url)
+            if pool is None or pool.pid != os.getpid():
+                pool = _pools[url] = PostgresPool(url)
+    return pool
+
+def get_pool(database=None, database_url=None):
+    """PostgreSQL pool when a URL is configured, otherwise the SQLite file's pool"""
+    if database_url:
+        return postgres_pool(database_url)
+    return sqlite_pool(database)
@@ -0,0 +1,61 @@
+"""
+Review load forecast for Leitner App
+How many cards fall due on each of the coming days, from one grouped read
+of the (user_id, next_review) range of idx_cards_user_due. Overdue cards
+count towards today, since that is when they will be reviewed.
+
+Histograms are cached per user in each worker process and dropped by
+invalidate() whenever a write moves that user's due dates. Writes served by
+another worker process can't reach this cache, so entries also expire after
+`ttl` seconds.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+HISTOGRAM_SQL = """SELECT next_review AS day, COUNT(*) AS due FROM cards
+                   WHERE user_id=? AND next_review <= ?
+                   GROUP BY next_review"""
+
+def due_histogram(db, user_id, today, days):
+    """[due count for today, today + 1, ...] for `days` days"""
+    counts = [0] * days
+    for row in db.execute(HISTOGRAM_SQL, (user_id, today + timedelta(days=days - 1))):
+        counts[max((row["day"] - today).days, 0)] += row["due"]
+    return counts
+
+class ForecastCache:
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # user_id -> (today, counts, created_at), oldest use first
+        self._generation = 0           # bumped by every invalidate()
+        self._lock = threading.Lock()
+
+    def get(self, db, user_id, today, days):
+        """The user's histogram for `days` days from today, computed on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] == today and len(entry[1]) >= days and now - entry[2] < self.ttl:
+                self._entries.move_to_end(user_id)
+                return entry[1][:days]  # a copy; callers may add to it
+            generation = self._generation
+
+        counts = due_histogram(db, user_id, today, days)
+        with self._lock:
+            # A write that committed while we were reading may not be in counts
+            if generation == self._generation:
+                self._entries[user_id] = (today, counts, now)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return counts[:]
+
+    def invalidate(self, user_id):
+        """Forget user_id's histogram; call after committing a change to their due dates"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generation += 1
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Bulk card import for Leitner App
+Adds a CSV or JSON list of LeetCode problems to a user's collection - the same
+import the dashboard's upload form runs - skipping problems they already have.
+
+    python import_cards.py user@example.com solved.csv
+    python import_cards.py user@example.com solved.json --report report.json
+
+CSV files have a header with a link (or url) column and optional title, note,
+leitner_box and solved_date columns, or are just one link per line.
+"""
+
+import json
+import sys
+
+import app as leitner
+import database
+
+def import_file(db, email, path):
+    """Import path into email's collection in MAX_IMPORT_ROWS chunks; returns the report"""
+    user = db.execute(
+        "SELECT id, scheduler, intervals, smooth_load FROM users WHERE email=?", (email.strip().lower(),)
+    ).fetchone()
+    if not user:
+        raise ValueError(f"No user with email {email}")
+    with open(path, encoding="utf-8-sig") as f:
+        rows = leitner.parse_import_file(path, f.read())
+    report = []
+    for start in range(0, len(rows), leitner.MAX_IMPORT_ROWS):
+        chunk = rows[start:start + leitner.MAX_IMPORT_ROWS]
+        report += leitner.import_cards(db, user["id"], chunk, first_row=start + 1,
+                                       policy=leitner.user_policy(user), smooth=user["smooth_load"])
+    return report
+
+def main():
+    args = sys.argv[1:]
+    report_path = None
+    if "--report" in args:
+        i = args.index("--report")
+        report_path = args[i + 1] if i + 1 < len(args) else None
+        del args[i:i + 2]
+    if len(args) != 2 or ("--report" in sys.argv and not report_path):
+        print(__doc__)
+        sys.exit(1)
+    email, path = args
+
+    print(f"📥 Importing {path} for {email}...")
+    pool = database.get_pool(leitner.app.config["DATABASE"], leitner.app.config["DATABASE_URL"])
+    db = pool.acquire()
+    try:
+        report = import_file(db, email, path)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        pool.release(db)
+
+    summary = leitner.import_summary(report)
+    print(f"✅ Imported {summary['imported']} card(s)")
+    print(f"⏭️  Skipped {summary['duplicate']} already in the collection")
+    errors = [r for r in report if r["status"] == "error"]
+    if errors:
+        print(f"⚠️  {len(errors)} row(s) could not be imported:")
+        for entry in errors[:20]:
+            print(f"  - row {entry['row']}: {entry['error']}")
+        if len(errors) > 20:
+            print(f"  ...and {len(errors) - 20} more")
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"📄 Per-row report written to {report_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Background jobs for Leitner App
+Slow work (the AI note rewrite) runs on a per-process thread pool so the web
+worker that accepted the request answers at once with a job id. Job state is
+kept in the ai_jobs table, so whichever worker receives the status poll can
+answer it.
+"""
+
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+class QueueFull(Exception):
+    """Raised by submit() when the process already has max_queued jobs waiting"""
+
+class JobRunner:
+    """Thread pool with a cap on running (max_workers) and waiting (max_queued) jobs"""
+
+    def __init__(self, max_workers, max_queued):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Threads don't survive a fork; start a fresh pool in each worker
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="job")
+                self._pid = os.getpid()
+                self._pending = 0
+            if self._pending >= self.max_queued:
+                raise QueueFull()
+            self._pending += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future):
+        with self._lock:
+            self._pending -= 1
+
+def create_job(db, user_id, note, title):
+    job_id = uuid.uuid4().hex
+    db.execute(
+        "INSERT INTO ai_jobs (id, user_id, note, title) VALUES (?, ?, ?, ?)",
+        (job_id, user_id, note, title),
+    )
+    db.commit()
+    return job_id
+
+def get_job(db, job_id, user_id, stale_after):
+    """The user's job as a dict, reporting unfinished jobs older than stale_after as failed"""
+    job = db.execute(
+        "SELECT id, status, result, error, created_at FROM ai_jobs WHERE id=? AND user_id=?",
+        (job_id, user_id),
+    ).fetchone()
+    if not job:
+        return None
+    job = dict(job)
+    if job["status"] in ("queued", "running") and \
+            datetime.utcnow() - job["created_at"] > timedelta(seconds=stale_after):
+        # The worker process running it was restarted or killed
+        job["status"], job["error"] = "failed", "The AI job did not finish. Please try again."
+    return job
+
+def purge_jobs(db, older_than):
+    """Delete jobs created more than older_than seconds ago"""
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+    db.execute("DELETE FROM ai_jobs WHERE created_at < ?", (cutoff.strftime("%Y-%m-%d %H:%M:%S"),))
+    db.commit()
+
+def run_job(pool, job_id, work, *args):
+    """Run work(*args) -> (result, error) for a job, recording its progress.
+
+    The pooled connection is only held for the status writes, not for the
+    slow call in between.
+    """
+    _set_status(pool, job_id, "running")
+    try:
+        result, error = work(*args)
+    except Exception as e:
+        result, error = None, f"AI service error: {e}"
+    _set_status(pool, job_id, "failed" if error else "done", result, error)
+
+def _set_status(pool, job_id, status, result=None, error=None):
+    conn = pool.acquire()
+    try:
+        if status == "running":
+            conn.execute("UPDATE ai_jobs SET status=? WHERE id=?", (status, job_id))
+        else:
+            conn.execute(
+                "UPDATE ai_jobs SET status=?, result=?, error=?, finished_at=CURRENT_TIMESTAMP WHERE id=?",
+                (status, result, error, job_id),
+            )
+        conn.commit()
+    finally:
+        pool.release(conn)
@@ -0,0 +1,123 @@
+"""
+LeetCode helpers for Leitner App
+A problem link is reduced to its slug ("two-sum"), which names the problem
+whatever form the URL takes: trailing slash, /description/, a query string
+or different capitalisation. cards.slug (migration 0009) stores it, and the
+unique (user_id, slug) index is what stops a problem being added twice.
+
+The slug is also the key into the offline problem catalog
+(data/leetcode_problems.json, or LEETCODE_CATALOG): canonical title,
+difficulty and topic tags, with no network call. It is read on first use and
+shared by every request in the process.
+
+    python leetcode.py backfill    # fill in catalog data on existing cards
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+from collections import namedtuple
+
+import database
+import migrate
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CATALOG_PATH = os.environ.get("LEETCODE_CATALOG", os.path.join(BASE_DIR, "data", "leetcode_problems.json"))
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+
+PROBLEM_URL = re.compile(r"leetcode\.com/problems/([^/?#]+)", re.IGNORECASE)
+
+def problem_slug(url):
+    """The problem slug of a LeetCode URL, or None for any other link"""
+    match = PROBLEM_URL.search(url or "")
+    return match.group(1).lower() if match else None
+
+def card_slug(link):
+    """cards.slug for a link: the problem slug, or for other sites the link
+    itself without a trailing slash (migration 0009 backfills the same way)"""
+    link = (link or "").strip()
+    return problem_slug(link) or link.rstrip("/") or None
+
+def slug_title(slug):
+    """Title from a slug: two-sum -> Two Sum"""
+    return " ".join(word.capitalize() for word in slug.split("-") if word)
+
+# --- Catalog ---
+Problem = namedtuple("Problem", ["slug", "title", "difficulty", "tags"])
+
+class Catalog:
+    """Problems by slug, built from [[slug, title, difficulty, [tag, ...]], ...].
+
+    Difficulty and tag strings, and identical tag tuples, are stored once and
+    shared, so each problem costs little more than its title.
+    """
+
+    def __init__(self, rows):
+        strings, tag_sets = {}, {}
+        self._problems = {}
+        for slug, title, difficulty, tags in rows:
+            tags = tuple(strings.setdefault(tag, tag) for tag in tags)
+            self._problems[slug] = Problem(
+                slug, title, strings.setdefault(difficulty, difficulty), tag_sets.setdefault(tags, tags)
+            )
+        self.tags = sorted({tag for tags in tag_sets for tag in tags})
+
+    def get(self, slug):
+        return self._problems.get(slug)
+
+    def __len__(self):
+        return len(self._problems)
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def catalog():
+    """The process-wide catalog, read from CATALOG_PATH on first use"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                rows = []
+                if os.path.exists(CATALOG_PATH):
+                    with open(CATALOG_PATH) as f:
+                        rows = json.load(f)
+                _catalog = Catalog(rows)
+    return _catalog
+
+def lookup(link):
+    """Catalog entry for a problem link, or None (other sites, or unknown problems)"""
+    slug = problem_slug(link)
+    return catalog().get(slug) if slug else None
+
+# --- Backfill ---
+def backfill(db):
+    """Copy catalog difficulty and tags onto cards added before they were
+    stored, and swap slug-made titles ("Lru Cache") for the catalog's.
+    Returns the number of cards updated."""
+    updates = []
+    for card in db.execute("SELECT id, title, slug FROM cards WHERE difficulty IS NULL AND slug IS NOT NULL"):
+        problem = catalog().get(card["slug"])
+        if not problem:
+            continue
+        title = problem.title if card["title"] == slug_title(card["slug"]) else card["title"]
+        updates.append((title, problem.difficulty, ",".join(problem.tags), card["id"]))
+    db.executemany("UPDATE cards SET title=?, difficulty=?, tags=? WHERE id=?", updates)
+    db.commit()
+    return len(updates)
+
+def main():
+    if sys.argv[1:] != ["backfill"]:
+        print(__doc__)
+        sys.exit(1)
+    pool = database.get_pool(migrate.DATABASE, migrate.DATABASE_URL)
+    db = pool.acquire()
+    try:
+        count = backfill(db)
+    finally:
+        pool.release(db)
+    print(f"✅ Catalog data added to {count} card(s) ({len(catalog())} problems in the catalog)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Schema migration runner for Leitner App
+Applies the numbered SQL scripts in migrations/<dialect>/ in order and
+records each one in the schema_version table.
+
+Run at deploy time:
+    python migrate.py           # apply pending migrations
+    python migrate.py status    # show current and latest version
+"""
+
+import os
+import re
+import sqlite3
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MIGRATIONS_DIR = os.path.join(BASE_DIR, "migrations")
+DATABASE = os.environ.get("DATABASE", os.path.join(BASE_DIR, "db.sqlite3"))
+DATABASE_URL = os.environ.get("DATABASE_URL")
+if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent deploys don't race
+PG_LOCK_KEY = 7245001
+
+MIGRATION_FILE = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+
+class MigrationError(Exception):
+    pass
+
+# --- Loading ---
+def load_migrations(dialect):
+    """Return [(version, name, sql), ...] for a dialect, ordered by version"""
+    folder = os.path.join(MIGRATIONS_DIR, dialect)
+    migrations = []
+    for filename in os.listdir(folder):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(folder, filename)) as f:
+            migrations.append((int(match.group(1)), match.group(2), f.read()))
+    migrations.sort()
+
+    versions = [m[0] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise MigrationError(f"Duplicate migration version in {folder}")
+    return migrations
+
+def latest_version(dialect):
+    migrations = load_migrations(dialect)
+    return migrations[-1][0] if migrations else 0
+
+def split_statements(sql):
+    """Split a SQLite script into statements (trigger bodies stay intact)"""
+    statements = []
+    buffer = ""
+    for line in sql.splitlines(keepends=True):
+        if not buffer and line.strip().startswith("--"):
+            continue
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            if buffer.strip():
+                statements.append(buffer.strip())
+            buffer = ""
+    if buffer.strip():
+        statements.append(buffer.strip())
+    return statements
+
+# --- SQLite ---
+def _sqlite_version(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='schema_version'"
+    ).fetchone()
+    if not exists:
+        return 0
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def _sqlite_migrate(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    applied = []
+    try:
+        # BEGIN IMMEDIATE takes the write lock up front, so when several
+        # workers boot at once only one applies the scripts; the others wait
+        # and then see the new version.
+        conn.execute("PRAGMA busy_timeout = 30000")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS schema_version (
+                       version INTEGER PRIMARY KEY,
+                       name TEXT NOT NULL,
+                       applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                   )"""
+            )
+            current = _sqlite_version(conn)
+            for version, name, sql in load_migrations("sqlite"):
+                if version <= current:
+                    continue
+                for statement in split_statements(sql):
+                    conn.execute(statement)
+                conn.execute(
+                    "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                    (version, name),
+                )
+                applied.append((version, name))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return applied
+
+def _sqlite_current(path):
+    if not os.path.exists(path):
+        return 0
+    conn = sqlite3.connect(path)
+    try:
+        return _sqlite_version(conn)
+    finally:
+        conn.close()
+
+# --- PostgreSQL ---
+def _pg_connect(url):
+    import psycopg2
+    return psycopg2.connect(url)
+
+def _pg_version(cursor):
+    cursor.execute("SELECT to_regclass('schema_version')")
+    if cursor.fetchone()[0] is None:
+        return 0
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cursor.fetchone()[0]
+
+def _pg_migrate(url):
+    conn = _pg_connect(url)
+    applied = []
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (PG_LOCK_KEY,))
+                cursor.execute(
+                    """CREATE TABLE IF NOT EXISTS schema_version (
+                           version INTEGER PRIMARY KEY,
+                           name TEXT NOT NULL,
+                           applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                       )"""
+                )
+                current = _pg_version(cursor)
+                for version, name, sql in load_migrations("postgres"):
+                    if version <= current:
+                        continue
+                    cursor.execute(sql)
+                    cursor.execute(
+                        "INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                        (version, name),
+                    )
+                    applied.append((version, name))
+    finally:
+        conn.close()
+    return applied
+
+def _pg_current(url):
+    conn = _pg_connect(url)
+    try:
+        with conn.cursor() as cursor:
+            return _pg_version(cursor)
+    finally:
+        conn.close()
+
+# --- Public API ---
+def migrate(database=None, database_url=None):
+    """Apply all pending migrations; returns [(version, name), ...] applied"""
+    if database_url:
+        return _pg_migrate(database_url)
+    return _sqlite_migrate(database or DATABASE)
+
+def current_version(database=None, database_url=None):
+    if database_url:
+        return _pg_current(database_url)
+    return _sqlite_current(database or DATABASE)
+
+def ensure_schema(database=None, database_url=None):
+    """Startup check: one version read, and a migrate only if we're behind.
+
+    Called once per process when the app is imported - never per request.
+    """
+    dialect = "postgres" if database_url else "sqlite"
+    if current_version(database, database_url) >= latest_version(dialect):
+        return []
+    applied = migrate(database, database_url)
+    for version, name in applied:
+        print(f"Applied migration {version:04d}_{name}")
+    return applied
+
+def main():
+    dialect = "postgres" if DATABASE_URL else "sqlite"
+    target = DATABASE_URL or DATABASE
+
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        current = current_version(DATABASE, DATABASE_URL)
+        latest = latest_version(dialect)
+        print(f"📦 Database: {target} ({dialect})")
+        print(f"   Current version: {current}")
+        print(f"   Latest version:  {latest}")
+        if current < latest:
+            print(f"⚠️  {latest - current} migration(s) pending - run 'python migrate.py'")
+        return
+
+    applied = migrate(DATABASE, DATABASE_URL)
+    if not applied:
+        print("✅ Schema is up to date.")
+        return
+    for version, name in applied:
+        print(f"✅ Applied {version:04d}_{name}")
+    print(f"\n🎉 Database migrated to version {applied[-1][0]}")
+
+if __name__ == "__main__":
+    main()
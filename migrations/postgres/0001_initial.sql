@@ -0,0 +1,24 @@
+-- Initial schema (matches the tables the app used to create on every request,
+-- so existing databases adopt it without changes)
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS cards (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    link TEXT,
+    idea TEXT,
+    solved_date DATE NOT NULL,
+    leitner_box INTEGER NOT NULL DEFAULT 1,
+    next_review DATE NOT NULL,
+    last_reviewed DATE,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_cards_user ON cards(user_id);
+CREATE INDEX IF NOT EXISTS idx_cards_nextreview ON cards(next_review);
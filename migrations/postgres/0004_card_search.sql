@@ -0,0 +1,9 @@
+-- Full-text search over card titles and notes. The generated tsvector keeps
+-- itself in sync with title/idea; the GIN index serves @@ queries.
+ALTER TABLE cards ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(idea, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_cards_search ON cards USING GIN (search_vector);
@@ -0,0 +1,55 @@
+-- Per-user card counters for the dashboard header, kept current by a trigger
+-- on cards so every write path (app routes, restore, imports) maintains them.
+-- user_stats.py checks them against cards and can rebuild them.
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY,
+    total_cards INTEGER NOT NULL DEFAULT 0,
+    box_1 INTEGER NOT NULL DEFAULT 0,
+    box_2 INTEGER NOT NULL DEFAULT 0,
+    box_3 INTEGER NOT NULL DEFAULT 0,
+    box_4 INTEGER NOT NULL DEFAULT 0,
+    box_5 INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION user_stats_apply(uid INTEGER, box INTEGER, delta INTEGER)
+RETURNS void AS $$
+BEGIN
+    INSERT INTO user_stats (user_id) VALUES (uid) ON CONFLICT (user_id) DO NOTHING;
+    UPDATE user_stats SET
+        total_cards = total_cards + delta,
+        box_1 = box_1 + CASE WHEN box = 1 THEN delta ELSE 0 END,
+        box_2 = box_2 + CASE WHEN box = 2 THEN delta ELSE 0 END,
+        box_3 = box_3 + CASE WHEN box = 3 THEN delta ELSE 0 END,
+        box_4 = box_4 + CASE WHEN box = 4 THEN delta ELSE 0 END,
+        box_5 = box_5 + CASE WHEN box = 5 THEN delta ELSE 0 END
+    WHERE user_id = uid;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION cards_user_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM user_stats_apply(OLD.user_id, OLD.leitner_box, -1);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        PERFORM user_stats_apply(NEW.user_id, NEW.leitner_box, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS cards_user_stats ON cards;
+CREATE TRIGGER cards_user_stats
+    AFTER INSERT OR DELETE OR UPDATE OF user_id, leitner_box ON cards
+    FOR EACH ROW EXECUTE FUNCTION cards_user_stats();
+
+INSERT INTO user_stats (user_id, total_cards, box_1, box_2, box_3, box_4, box_5)
+SELECT user_id, COUNT(*),
+       COUNT(*) FILTER (WHERE leitner_box = 1), COUNT(*) FILTER (WHERE leitner_box = 2),
+       COUNT(*) FILTER (WHERE leitner_box = 3), COUNT(*) FILTER (WHERE leitner_box = 4),
+       COUNT(*) FILTER (WHERE leitner_box = 5)
+FROM cards GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE SET
+    total_cards = EXCLUDED.total_cards,
+    box_1 = EXCLUDED.box_1, box_2 = EXCLUDED.box_2, box_3 = EXCLUDED.box_3,
+    box_4 = EXCLUDED.box_4, box_5 = EXCLUDED.box_5;
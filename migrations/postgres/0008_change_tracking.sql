@@ -0,0 +1,44 @@
+-- Change tracking for incremental backups. updated_at (UTC) is set by the
+-- app's write statements; the triggers fill it in for any other writer
+-- (restore, imports, manual SQL). Deletes leave a row in tombstones so a
+-- delta backup can replay them.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+ALTER TABLE cards ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+UPDATE users SET updated_at = created_at;
+UPDATE cards SET updated_at = COALESCE(last_reviewed::timestamp, created_at);
+
+CREATE INDEX IF NOT EXISTS idx_users_updated ON users(updated_at);
+CREATE INDEX IF NOT EXISTS idx_cards_updated ON cards(updated_at);
+
+CREATE TABLE IF NOT EXISTS tombstones (
+    id SERIAL PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    deleted_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_tombstones_deleted ON tombstones(deleted_at);
+
+CREATE OR REPLACE FUNCTION track_changes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO tombstones (table_name, row_id, deleted_at)
+        VALUES (TG_TABLE_NAME, OLD.id, clock_timestamp() AT TIME ZONE 'UTC');
+        RETURN OLD;
+    END IF;
+    IF NEW.updated_at IS NULL OR (TG_OP = 'UPDATE' AND NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at) THEN
+        NEW.updated_at := clock_timestamp() AT TIME ZONE 'UTC';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_track_changes ON users;
+CREATE TRIGGER users_track_changes
+    BEFORE INSERT OR UPDATE OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION track_changes();
+
+DROP TRIGGER IF EXISTS cards_track_changes ON cards;
+CREATE TRIGGER cards_track_changes
+    BEFORE INSERT OR UPDATE OR DELETE ON cards
+    FOR EACH ROW EXECUTE FUNCTION track_changes();
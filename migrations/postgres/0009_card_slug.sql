@@ -0,0 +1,17 @@
+-- Canonical problem key for duplicate detection: the LeetCode slug
+-- ("two-sum" for .../two-sum, .../two-sum/ and .../two-sum/description/),
+-- or for other links the link without a trailing slash. The app computes it
+-- with leetcode.card_slug(); this backfill does the same parsing in SQL.
+ALTER TABLE cards ADD COLUMN IF NOT EXISTS slug TEXT;
+
+UPDATE cards SET slug = COALESCE(
+    lower(substring(link from '(?i)leetcode\.com/problems/([^/?#]+)')),
+    NULLIF(rtrim(link, '/'), '')
+);
+
+-- Problems added twice before this check existed keep their oldest card as
+-- the canonical one; the later copies are kept but left without a slug
+UPDATE cards SET slug = NULL
+WHERE slug IS NOT NULL AND id NOT IN (SELECT MIN(id) FROM cards WHERE slug IS NOT NULL GROUP BY user_id, slug);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cards_user_slug ON cards(user_id, slug);
@@ -0,0 +1,9 @@
+-- Pluggable review scheduling (scheduler.py). users.scheduler picks the
+-- policy ('leitner', 'custom' or 'sm2') and users.intervals holds the days
+-- for boxes 1-5 under 'custom' ("1,2,5,10,21"). cards.interval_days is the
+-- interval the card was last scheduled with and cards.ease its SM-2 ease
+-- factor; both stay NULL until the card is reviewed or rescheduled.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS scheduler TEXT NOT NULL DEFAULT 'leitner';
+ALTER TABLE users ADD COLUMN IF NOT EXISTS intervals TEXT;
+ALTER TABLE cards ADD COLUMN IF NOT EXISTS interval_days INTEGER;
+ALTER TABLE cards ADD COLUMN IF NOT EXISTS ease REAL;
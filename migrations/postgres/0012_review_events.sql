@@ -0,0 +1,61 @@
+-- Review history. Every pass/fail appends one review_events row (the cards
+-- row only keeps the latest state); a trigger refuses updates and deletes.
+-- review_daily holds per-user, per-day totals for the dashboard and the
+-- stats API, kept current by a trigger on review_events in the same
+-- transaction as the review. review_stats.py checks it against the events
+-- and can rebuild it.
+CREATE TABLE IF NOT EXISTS review_events (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    card_id INTEGER NOT NULL,
+    reviewed_at DATE NOT NULL,
+    result TEXT NOT NULL,
+    box_before INTEGER NOT NULL,
+    box_after INTEGER NOT NULL,
+    interval_days INTEGER,
+    recorded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_review_events_user_day ON review_events(user_id, reviewed_at);
+
+CREATE TABLE IF NOT EXISTS review_daily (
+    user_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    reviews INTEGER NOT NULL DEFAULT 0,
+    passes INTEGER NOT NULL DEFAULT 0,
+    promoted INTEGER NOT NULL DEFAULT 0,
+    demoted INTEGER NOT NULL DEFAULT 0,
+    mastered INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+
+CREATE OR REPLACE FUNCTION review_events_rollup() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO review_daily (user_id, day) VALUES (NEW.user_id, NEW.reviewed_at)
+    ON CONFLICT (user_id, day) DO NOTHING;
+    UPDATE review_daily SET
+        reviews = reviews + 1,
+        passes = passes + CASE WHEN NEW.result = 'pass' THEN 1 ELSE 0 END,
+        promoted = promoted + CASE WHEN NEW.box_after > NEW.box_before THEN 1 ELSE 0 END,
+        demoted = demoted + CASE WHEN NEW.box_after < NEW.box_before THEN 1 ELSE 0 END,
+        mastered = mastered + CASE WHEN NEW.box_after = 5 AND NEW.box_before < 5 THEN 1 ELSE 0 END
+    WHERE user_id = NEW.user_id AND day = NEW.reviewed_at;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS review_events_rollup ON review_events;
+CREATE TRIGGER review_events_rollup
+    AFTER INSERT ON review_events
+    FOR EACH ROW EXECUTE FUNCTION review_events_rollup();
+
+CREATE OR REPLACE FUNCTION review_events_append_only() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'review_events is append-only';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS review_events_append_only ON review_events;
+CREATE TRIGGER review_events_append_only
+    BEFORE UPDATE OR DELETE ON review_events
+    FOR EACH ROW EXECUTE FUNCTION review_events_append_only();
@@ -0,0 +1,62 @@
+-- Per-user data version for HTTP caching. Triggers bump it on every change
+-- to the user's cards, review history or review settings, whichever code
+-- path makes it; the app derives page and API ETags from (version,
+-- started_at). started_at tells apart counters that restarted from zero
+-- (a rebuilt or restored database) so an old ETag can't match again.
+-- The card and review triggers run once per statement over the changed
+-- rows, so a bulk reschedule bumps each user once rather than once per card.
+CREATE TABLE IF NOT EXISTS data_versions (
+    user_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    started_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE OR REPLACE FUNCTION bump_data_versions() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO data_versions (user_id, version)
+    SELECT DISTINCT user_id, 1 FROM changed_rows
+    ON CONFLICT (user_id) DO UPDATE SET version = data_versions.version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS cards_version_insert ON cards;
+CREATE TRIGGER cards_version_insert AFTER INSERT ON cards
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_versions();
+
+CREATE OR REPLACE FUNCTION bump_data_versions_on_update() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO data_versions (user_id, version)
+    SELECT user_id, 1 FROM old_rows UNION SELECT user_id, 1 FROM new_rows
+    ON CONFLICT (user_id) DO UPDATE SET version = data_versions.version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS cards_version_update ON cards;
+CREATE TRIGGER cards_version_update AFTER UPDATE ON cards
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_versions_on_update();
+
+DROP TRIGGER IF EXISTS cards_version_delete ON cards;
+CREATE TRIGGER cards_version_delete AFTER DELETE ON cards
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_versions();
+
+DROP TRIGGER IF EXISTS review_events_version ON review_events;
+CREATE TRIGGER review_events_version AFTER INSERT ON review_events
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_versions();
+
+CREATE OR REPLACE FUNCTION users_data_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO data_versions (user_id, version) VALUES (NEW.id, 1)
+    ON CONFLICT (user_id) DO UPDATE SET version = data_versions.version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_version_update ON users;
+CREATE TRIGGER users_version_update AFTER UPDATE OF scheduler, intervals, smooth_load, daily_cap ON users
+    FOR EACH ROW EXECUTE FUNCTION users_data_version();
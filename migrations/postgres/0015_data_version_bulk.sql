@@ -0,0 +1,5 @@
+-- Bulk writes call data_versions.begin_bulk() / end_bulk() so SQLite's
+-- per-row triggers bump the version once (see the SQLite migration). The
+-- triggers here already run once per statement and ignore the flag; the
+-- column keeps the two schemas alike.
+ALTER TABLE data_versions ADD COLUMN IF NOT EXISTS bulk INTEGER NOT NULL DEFAULT 0;
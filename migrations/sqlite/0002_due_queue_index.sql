@@ -0,0 +1,4 @@
+-- Due queue: user_id equality + next_review range, returned in (next_review, id)
+-- order straight from the index. Supersedes the global next_review index.
+CREATE INDEX IF NOT EXISTS idx_cards_user_due ON cards(user_id, next_review, id);
+DROP INDEX IF EXISTS idx_cards_nextreview;
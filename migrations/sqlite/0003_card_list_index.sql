@@ -0,0 +1,4 @@
+-- Card list keyset pagination on (created_at, id), newest first. Together with
+-- idx_cards_user_due this covers every user_id lookup, so idx_cards_user goes.
+CREATE INDEX IF NOT EXISTS idx_cards_user_created ON cards(user_id, created_at, id);
+DROP INDEX IF EXISTS idx_cards_user;
@@ -0,0 +1,26 @@
+-- Full-text search over card titles and notes. External-content FTS5 table:
+-- the text lives only in cards, triggers keep the index in sync. user_id is
+-- indexed too so a search is restricted to one user inside the FTS index.
+CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(
+    user_id, title, idea,
+    content='cards', content_rowid='id'
+);
+
+CREATE TRIGGER IF NOT EXISTS cards_fts_insert AFTER INSERT ON cards BEGIN
+    INSERT INTO cards_fts(rowid, user_id, title, idea)
+    VALUES (new.id, new.user_id, new.title, new.idea);
+END;
+
+CREATE TRIGGER IF NOT EXISTS cards_fts_delete AFTER DELETE ON cards BEGIN
+    INSERT INTO cards_fts(cards_fts, rowid, user_id, title, idea)
+    VALUES ('delete', old.id, old.user_id, old.title, old.idea);
+END;
+
+CREATE TRIGGER IF NOT EXISTS cards_fts_update AFTER UPDATE OF user_id, title, idea ON cards BEGIN
+    INSERT INTO cards_fts(cards_fts, rowid, user_id, title, idea)
+    VALUES ('delete', old.id, old.user_id, old.title, old.idea);
+    INSERT INTO cards_fts(rowid, user_id, title, idea)
+    VALUES (new.id, new.user_id, new.title, new.idea);
+END;
+
+INSERT INTO cards_fts(cards_fts) VALUES ('rebuild');
@@ -0,0 +1,62 @@
+-- Per-user card counters for the dashboard header, kept current by triggers
+-- on cards so every write path (app routes, restore, imports) maintains them.
+-- user_stats.py checks them against cards and can rebuild them.
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY,
+    total_cards INTEGER NOT NULL DEFAULT 0,
+    box_1 INTEGER NOT NULL DEFAULT 0,
+    box_2 INTEGER NOT NULL DEFAULT 0,
+    box_3 INTEGER NOT NULL DEFAULT 0,
+    box_4 INTEGER NOT NULL DEFAULT 0,
+    box_5 INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS cards_stats_insert AFTER INSERT ON cards BEGIN
+    INSERT OR IGNORE INTO user_stats (user_id) VALUES (new.user_id);
+    UPDATE user_stats SET
+        total_cards = total_cards + 1,
+        box_1 = box_1 + (new.leitner_box = 1),
+        box_2 = box_2 + (new.leitner_box = 2),
+        box_3 = box_3 + (new.leitner_box = 3),
+        box_4 = box_4 + (new.leitner_box = 4),
+        box_5 = box_5 + (new.leitner_box = 5)
+    WHERE user_id = new.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cards_stats_delete AFTER DELETE ON cards BEGIN
+    UPDATE user_stats SET
+        total_cards = total_cards - 1,
+        box_1 = box_1 - (old.leitner_box = 1),
+        box_2 = box_2 - (old.leitner_box = 2),
+        box_3 = box_3 - (old.leitner_box = 3),
+        box_4 = box_4 - (old.leitner_box = 4),
+        box_5 = box_5 - (old.leitner_box = 5)
+    WHERE user_id = old.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cards_stats_update AFTER UPDATE OF user_id, leitner_box ON cards
+WHEN old.user_id IS NOT new.user_id OR old.leitner_box IS NOT new.leitner_box BEGIN
+    UPDATE user_stats SET
+        total_cards = total_cards - 1,
+        box_1 = box_1 - (old.leitner_box = 1),
+        box_2 = box_2 - (old.leitner_box = 2),
+        box_3 = box_3 - (old.leitner_box = 3),
+        box_4 = box_4 - (old.leitner_box = 4),
+        box_5 = box_5 - (old.leitner_box = 5)
+    WHERE user_id = old.user_id;
+    INSERT OR IGNORE INTO user_stats (user_id) VALUES (new.user_id);
+    UPDATE user_stats SET
+        total_cards = total_cards + 1,
+        box_1 = box_1 + (new.leitner_box = 1),
+        box_2 = box_2 + (new.leitner_box = 2),
+        box_3 = box_3 + (new.leitner_box = 3),
+        box_4 = box_4 + (new.leitner_box = 4),
+        box_5 = box_5 + (new.leitner_box = 5)
+    WHERE user_id = new.user_id;
+END;
+
+INSERT OR REPLACE INTO user_stats (user_id, total_cards, box_1, box_2, box_3, box_4, box_5)
+SELECT user_id, COUNT(*),
+       SUM(leitner_box = 1), SUM(leitner_box = 2), SUM(leitner_box = 3),
+       SUM(leitner_box = 4), SUM(leitner_box = 5)
+FROM cards GROUP BY user_id;
@@ -0,0 +1,17 @@
+-- Background AI note-improvement jobs. The request that creates a job returns
+-- its id straight away; a worker thread fills in status/result, and any web
+-- worker can answer the poll from this table.
+CREATE TABLE IF NOT EXISTS ai_jobs (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    note TEXT NOT NULL,
+    title TEXT,
+    result TEXT,
+    error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP,
+    FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_ai_jobs_created ON ai_jobs(created_at);
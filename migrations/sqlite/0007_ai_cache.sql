@@ -0,0 +1,11 @@
+-- Improved notes keyed by a hash of (prompt version, model, title, note), so
+-- a repeated request is answered without calling the model. Times are epoch
+-- seconds; last_used_at drives LRU eviction once the table is over its cap.
+CREATE TABLE IF NOT EXISTS ai_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_ai_cache_last_used ON ai_cache(last_used_at);
@@ -0,0 +1,50 @@
+-- Change tracking for incremental backups. updated_at (UTC, millisecond
+-- precision) is set by the app's write statements; the triggers fill it in
+-- for any other writer (restore, imports, manual SQL). Deletes leave a row in
+-- tombstones so a delta backup can replay them.
+ALTER TABLE users ADD COLUMN updated_at TIMESTAMP;
+ALTER TABLE cards ADD COLUMN updated_at TIMESTAMP;
+UPDATE users SET updated_at = created_at;
+UPDATE cards SET updated_at = COALESCE(last_reviewed || ' 00:00:00', created_at);
+
+CREATE INDEX IF NOT EXISTS idx_users_updated ON users(updated_at);
+CREATE INDEX IF NOT EXISTS idx_cards_updated ON cards(updated_at);
+
+CREATE TABLE IF NOT EXISTS tombstones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    deleted_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_tombstones_deleted ON tombstones(deleted_at);
+
+CREATE TRIGGER IF NOT EXISTS users_touch_insert AFTER INSERT ON users
+WHEN new.updated_at IS NULL BEGIN
+    UPDATE users SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_touch_update AFTER UPDATE ON users
+WHEN new.updated_at IS old.updated_at BEGIN
+    UPDATE users SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_tombstone AFTER DELETE ON users BEGIN
+    INSERT INTO tombstones (table_name, row_id, deleted_at)
+    VALUES ('users', old.id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+END;
+
+CREATE TRIGGER IF NOT EXISTS cards_touch_insert AFTER INSERT ON cards
+WHEN new.updated_at IS NULL BEGIN
+    UPDATE cards SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cards_touch_update AFTER UPDATE ON cards
+WHEN new.updated_at IS old.updated_at BEGIN
+    UPDATE cards SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cards_tombstone AFTER DELETE ON cards BEGIN
+    INSERT INTO tombstones (table_name, row_id, deleted_at)
+    VALUES ('cards', old.id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+END;
@@ -0,0 +1,21 @@
+-- Canonical problem key for duplicate detection: the LeetCode slug
+-- ("two-sum" for .../two-sum, .../two-sum/ and .../two-sum/description/),
+-- or for other links the link without a trailing slash. The app computes it
+-- with leetcode.card_slug(); this backfill does the same parsing in SQL.
+ALTER TABLE cards ADD COLUMN slug TEXT;
+
+-- Everything after "leetcode.com/problems/", cut at the first "#", "?" or "/"
+UPDATE cards SET slug = substr(link, instr(lower(link), 'leetcode.com/problems/') + 22)
+WHERE instr(lower(link), 'leetcode.com/problems/') > 0;
+UPDATE cards SET slug = substr(slug, 1, instr(slug, '#') - 1) WHERE instr(slug, '#') > 0;
+UPDATE cards SET slug = substr(slug, 1, instr(slug, '?') - 1) WHERE instr(slug, '?') > 0;
+UPDATE cards SET slug = substr(slug, 1, instr(slug, '/') - 1) WHERE instr(slug, '/') > 0;
+UPDATE cards SET slug = lower(slug) WHERE slug <> '';
+UPDATE cards SET slug = NULLIF(rtrim(link, '/'), '') WHERE slug IS NULL OR slug = '';
+
+-- Problems added twice before this check existed keep their oldest card as
+-- the canonical one; the later copies are kept but left without a slug
+UPDATE cards SET slug = NULL
+WHERE slug IS NOT NULL AND id NOT IN (SELECT MIN(id) FROM cards WHERE slug IS NOT NULL GROUP BY user_id, slug);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cards_user_slug ON cards(user_id, slug);
@@ -0,0 +1,6 @@
+-- Difficulty and topic tags from the offline problem catalog (leetcode.py),
+-- copied onto the card when it is added so the dashboard can filter on them.
+-- tags holds the catalog's tag names joined with commas ("Array,Hash Table").
+-- Existing cards are filled in by `python leetcode.py backfill`.
+ALTER TABLE cards ADD COLUMN difficulty TEXT;
+ALTER TABLE cards ADD COLUMN tags TEXT;
@@ -0,0 +1,49 @@
+-- Review history. Every pass/fail appends one review_events row (the cards
+-- row only keeps the latest state); triggers refuse updates and deletes.
+-- review_daily holds per-user, per-day totals for the dashboard and the
+-- stats API, kept current by a trigger on review_events in the same
+-- transaction as the review. review_stats.py checks it against the events
+-- and can rebuild it.
+CREATE TABLE IF NOT EXISTS review_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    card_id INTEGER NOT NULL,
+    reviewed_at DATE NOT NULL,
+    result TEXT NOT NULL,
+    box_before INTEGER NOT NULL,
+    box_after INTEGER NOT NULL,
+    interval_days INTEGER,
+    recorded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_review_events_user_day ON review_events(user_id, reviewed_at);
+
+CREATE TABLE IF NOT EXISTS review_daily (
+    user_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    reviews INTEGER NOT NULL DEFAULT 0,
+    passes INTEGER NOT NULL DEFAULT 0,
+    promoted INTEGER NOT NULL DEFAULT 0,
+    demoted INTEGER NOT NULL DEFAULT 0,
+    mastered INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+
+CREATE TRIGGER IF NOT EXISTS review_events_rollup AFTER INSERT ON review_events BEGIN
+    INSERT OR IGNORE INTO review_daily (user_id, day) VALUES (new.user_id, new.reviewed_at);
+    UPDATE review_daily SET
+        reviews = reviews + 1,
+        passes = passes + (new.result = 'pass'),
+        promoted = promoted + (new.box_after > new.box_before),
+        demoted = demoted + (new.box_after < new.box_before),
+        mastered = mastered + (new.box_after = 5 AND new.box_before < 5)
+    WHERE user_id = new.user_id AND day = new.reviewed_at;
+END;
+
+CREATE TRIGGER IF NOT EXISTS review_events_no_update BEFORE UPDATE ON review_events BEGIN
+    SELECT RAISE(ABORT, 'review_events is append-only');
+END;
+
+CREATE TRIGGER IF NOT EXISTS review_events_no_delete BEFORE DELETE ON review_events BEGIN
+    SELECT RAISE(ABORT, 'review_events is append-only');
+END;
@@ -0,0 +1,6 @@
+-- Review load settings (scheduler.py). smooth_load = 1 lets the scheduler
+-- move a review a few days either side of its interval to the least busy
+-- day; daily_cap limits how many reviews a day the review queue offers
+-- (NULL for no limit).
+ALTER TABLE users ADD COLUMN smooth_load INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE users ADD COLUMN daily_cap INTEGER;
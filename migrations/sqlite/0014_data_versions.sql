@@ -0,0 +1,34 @@
+-- Per-user data version for HTTP caching. Triggers bump it on every change
+-- to the user's cards, review history or review settings, whichever code
+-- path makes it; the app derives page and API ETags from (version,
+-- started_at). started_at tells apart counters that restarted from zero
+-- (a rebuilt or restored database) so an old ETag can't match again.
+CREATE TABLE IF NOT EXISTS data_versions (
+    user_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    started_at TIMESTAMP NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+
+CREATE TRIGGER IF NOT EXISTS cards_version_insert AFTER INSERT ON cards BEGIN
+    INSERT OR IGNORE INTO data_versions (user_id) VALUES (new.user_id);
+    UPDATE data_versions SET version = version + 1 WHERE user_id = new.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS cards_version_update AFTER UPDATE ON cards BEGIN
+    INSERT OR IGNORE INTO data_versions (user_id) VALUES (new.user_id);
+    UPDATE data_versions SET version = version + 1 WHERE user_id IN (old.user_id, new.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS cards_version_delete AFTER DELETE ON cards BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE user_id = old.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS review_events_version AFTER INSERT ON review_events BEGIN
+    INSERT OR IGNORE INTO data_versions (user_id) VALUES (new.user_id);
+    UPDATE data_versions SET version = version + 1 WHERE user_id = new.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_version_update AFTER UPDATE OF scheduler, intervals, smooth_load, daily_cap ON users BEGIN
+    INSERT OR IGNORE INTO data_versions (user_id) VALUES (new.id);
+    UPDATE data_versions SET version = version + 1 WHERE user_id = new.id;
+END;
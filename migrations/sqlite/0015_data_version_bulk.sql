@@ -0,0 +1,28 @@
+-- Bulk writes (reschedule, import, batch review) bump data_versions once
+-- instead of once per row: data_versions.begin_bulk() bumps the version and
+-- sets bulk = 1 inside the write's transaction, the per-row triggers skip
+-- while it is set, and end_bulk() clears it before the commit. No other
+-- connection ever sees bulk = 1, and a rollback clears it.
+ALTER TABLE data_versions ADD COLUMN bulk INTEGER NOT NULL DEFAULT 0;
+
+DROP TRIGGER IF EXISTS cards_version_insert;
+CREATE TRIGGER cards_version_insert AFTER INSERT ON cards
+WHEN (SELECT bulk FROM data_versions WHERE user_id = new.user_id) IS NOT 1 BEGIN
+    INSERT OR IGNORE INTO data_versions (user_id) VALUES (new.user_id);
+    UPDATE data_versions SET version = version + 1 WHERE user_id = new.user_id;
+END;
+
+DROP TRIGGER IF EXISTS cards_version_update;
+CREATE TRIGGER cards_version_update AFTER UPDATE ON cards
+WHEN (SELECT bulk FROM data_versions WHERE user_id = new.user_id) IS NOT 1
+  OR old.user_id IS NOT new.user_id BEGIN
+    INSERT OR IGNORE INTO data_versions (user_id) VALUES (new.user_id);
+    UPDATE data_versions SET version = version + 1 WHERE user_id IN (old.user_id, new.user_id);
+END;
+
+DROP TRIGGER IF EXISTS review_events_version;
+CREATE TRIGGER review_events_version AFTER INSERT ON review_events
+WHEN (SELECT bulk FROM data_versions WHERE user_id = new.user_id) IS NOT 1 BEGIN
+    INSERT OR IGNORE INTO data_versions (user_id) VALUES (new.user_id);
+    UPDATE data_versions SET version = version + 1 WHERE user_id = new.user_id;
+END;
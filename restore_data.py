@@ -1,17 +1,39 @@
 #!/usr/bin/env python3
 """
 Restore utility for Leitner App
-Restores data from CSV backup files
+Restores data from exports (CSV/NDJSON, checked against their manifest), or a
+whole database from a snapshot. The restore is built in a staging file and
+then copied into the live database file, so the app can keep running.
+
+    python restore_data.py              # pick a backup interactively
+    python restore_data.py 1            # newest backup, by number or name
+    python restore_data.py --yes 1      # no confirmation prompt, for scripts
 """
 
 import sqlite3
-import csv
+import itertools
+import json
 import os
+import shutil
 import sys
 from datetime import datetime
+import migrate
+import backup_data
+import user_stats
+import leetcode
 
-DATABASE = "db.sqlite3"
+DATABASE = os.environ.get("DATABASE", "db.sqlite3")
 BACKUP_DIR = "backups"
+LIVE_LOCK_TIMEOUT = 30   # seconds to wait for the app's write lock before copying the restore in
+
+def backup_files(backup_path):
+    """{table: path} for a backup - from its manifest, or the plain CSVs older backups used"""
+    manifest_path = os.path.join(backup_path, backup_data.MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            tables = json.load(f)["tables"]
+        return {table: os.path.join(backup_path, entry["file"]) for table, entry in tables.items()}
+    return {table: os.path.join(backup_path, f"{table}.csv") for table in ("users", "cards")}
 
 def list_available_backups():
     """List all available backups"""
@@ -20,111 +42,271 @@ def list_available_backups():
         return []
     
     backups = [d for d in os.listdir(BACKUP_DIR) if d.startswith("backup_") and os.path.isdir(os.path.join(BACKUP_DIR, d))]
-    backups.sort(reverse=True)
+    backups += [d for d in os.listdir(BACKUP_DIR) if d.startswith("snapshot_") and d.endswith(".sqlite3")]
+    backups.sort(key=lambda d: d.split("_", 1)[1], reverse=True)
     return backups
 
-def restore_from_backup(backup_name):
-    """Restore data from a specific backup"""
-    backup_path = os.path.join(BACKUP_DIR, backup_name)
-    
-    if not os.path.exists(backup_path):
-        print(f"❌ Backup '{backup_name}' not found.")
+def set_aside_current_database():
+    """Copy the live database (including commits still in its WAL) next to it before a restore"""
+    if os.path.exists(DATABASE):
+        backup_current = f"{DATABASE}.before-restore-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        live = sqlite3.connect(DATABASE)
+        copy = sqlite3.connect(backup_current)
+        try:
+            live.backup(copy)
+        finally:
+            copy.close()
+            live.close()
+        print(f"📦 Current database backed up to: {backup_current}")
+
+def replace_live_database(source_path):
+    """Copy a fully built database over the live one with SQLite's backup API.
+
+    The copy is one write transaction into the live file, so a running app
+    waits for it like any other writer and its pooled connections read the
+    restored data on their next query. Renaming a new file into place would
+    leave them reading and writing the old one."""
+    set_aside_current_database()
+    source = sqlite3.connect(source_path)
+    live = sqlite3.connect(DATABASE, timeout=LIVE_LOCK_TIMEOUT)
+    try:
+        source.backup(live)
+    finally:
+        live.close()
+        source.close()
+    os.remove(source_path)
+
+def restore_from_snapshot(snapshot_name, assume_yes=False):
+    """Replace the database with a snapshot taken by 'python backup_data.py snapshot'"""
+    snapshot_path = os.path.join(BACKUP_DIR, snapshot_name)
+    if not os.path.exists(snapshot_path):
+        print(f"❌ Snapshot '{snapshot_name}' not found.")
         return False
     
-    users_file = os.path.join(backup_path, "users.csv")
-    cards_file = os.path.join(backup_path, "cards.csv")
-    
-    if not os.path.exists(users_file) or not os.path.exists(cards_file):
-        print(f"❌ Backup files not found in '{backup_name}'.")
+    if not confirm(snapshot_name, assume_yes):
         return False
     
-    # Confirm before proceeding
+    # Snapshots from older releases are brought up to the current schema
+    # before they go live
+    staging = DATABASE + ".restoring"
+    shutil.copyfile(snapshot_path, staging)
+    migrate.migrate(staging)
+    replace_live_database(staging)
+    
+    conn = sqlite3.connect(DATABASE)
+    users, cards = (conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("users", "cards"))
+    conn.close()
+    print(f"\n✅ Restore completed successfully!")
+    print(f"📊 Restored {users} users and {cards} cards - everyone can log in with their existing password")
+    return True
+
+LOAD_BATCH = 10_000   # rows handed to each executemany call
+NULLABLE = {"link", "idea", "last_reviewed", "updated_at", "slug", "difficulty", "tags",
+            "intervals", "interval_days", "ease", "daily_cap"}   # an empty CSV field means NULL
+DEFAULTS = {"scheduler": "leitner", "smooth_load": 0}   # NOT NULL columns missing from older backups
+
+def confirm(backup_name, assume_yes, detail=None):
+    """Ask before replacing the live database (skipped with --yes)"""
     print(f"\n⚠️  WARNING: This will replace your current data!")
     print(f"Restoring from: {backup_name}")
+    if detail:
+        print(f"   ({detail})")
+    if assume_yes:
+        return True
     response = input("Are you sure you want to continue? (yes/no): ")
-    
     if response.lower() != 'yes':
         print("❌ Restore cancelled.")
         return False
+    return True
+
+def verify_backup(backup_path):
+    """Problems found checking a backup's files against its manifest ([] if none)"""
+    manifest = backup_data.read_manifest(backup_path)
+    files = backup_files(backup_path)
+    problems = [f"{table} file is missing" for table, path in files.items() if not os.path.exists(path)]
+    for table, entry in (manifest or {}).get("tables", {}).items():
+        path = files[table]
+        if os.path.exists(path) and backup_data.file_sha256(path) != entry["sha256"]:
+            problems.append(f"{entry['file']} does not match its SHA-256 in the manifest")
+    return problems
+
+def read_table(path, columns):
+    """A backup file's rows as tuples in `columns` order"""
+    for row in backup_data.iter_rows(path):
+        values = (row.get(c) for c in columns)
+        yield tuple(
+            (None if c in NULLABLE else DEFAULTS.get(c, v)) if v in ("", None) else v
+            for c, v in zip(columns, values)
+        )
+
+def load_rows(conn, sql, rows):
+    """executemany in LOAD_BATCH chunks, so a big table is never held in memory; returns the row count"""
+    count = 0
+    while batch := list(itertools.islice(rows, LOAD_BATCH)):
+        conn.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+def drop_indexes_and_triggers(conn):
+    """Drop the secondary indexes and triggers on the restored tables; returns the SQL to recreate them"""
+    objects = conn.execute(
+        """SELECT type, name, sql FROM sqlite_master
+           WHERE type IN ('index', 'trigger') AND tbl_name IN ('users', 'cards', 'review_events')
+             AND sql IS NOT NULL
+           ORDER BY type = 'trigger', name"""
+    ).fetchall()
+    for kind, name, _ in objects:
+        conn.execute(f"DROP {kind.upper()} {name}")
+    return [sql for _, _, sql in objects]
+
+def fill_slugs(conn):
+    """Set cards.slug on rows from exports made before it existed, leaving a
+    later copy of a problem without one (as migration 0009 does)"""
+    taken = set(conn.execute("SELECT user_id, slug FROM cards WHERE slug IS NOT NULL"))
+    slugs = []
+    for card_id, user_id, link in conn.execute("SELECT id, user_id, link FROM cards WHERE slug IS NULL ORDER BY id"):
+        key = (user_id, leetcode.card_slug(link))
+        if key[1] and key not in taken:
+            taken.add(key)
+            slugs.append((key[1], card_id))
+    conn.executemany("UPDATE cards SET slug=? WHERE id=?", slugs)
+
+def bulk_load(path, chain, chain_files):
+    """Build a database at path from an export chain; returns (users, cards, emails without a hash)"""
+    migrate.migrate(path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    # Nothing else opens this file until it replaces the live database, so a
+    # crash mid-load only costs a rerun - no journal or fsync needed
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-200000")   # ~200 MB
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+    user_columns = backup_data.TABLES["users"]
+    card_columns = backup_data.TABLES["cards"]
+    insert_user = f"INSERT OR REPLACE INTO users ({', '.join(user_columns)}) VALUES ({', '.join('?' * len(user_columns))})"
+    insert_card = f"INSERT OR REPLACE INTO cards ({', '.join(card_columns)}) VALUES ({', '.join('?' * len(card_columns))})"
+    event_columns = backup_data.TABLES["review_events"]
+    daily_columns = backup_data.TABLES["review_daily"]
+    # An event can be in two exports (see backup_data.create_backup); it is loaded once
+    insert_event = f"INSERT OR IGNORE INTO review_events ({', '.join(event_columns)}) VALUES ({', '.join('?' * len(event_columns))})"
+    insert_daily = f"INSERT INTO review_daily ({', '.join(daily_columns)}) VALUES ({', '.join('?' * len(daily_columns))})"
+    without_hash = []
+
+    def users(rows):
+        # Exports made before hashes were included can't restore accounts
+        for row in rows:
+            if row[user_columns.index("password_hash")]:
+                yield row
+            else:
+                without_hash.append(row[user_columns.index("email")])
+
+    conn.execute("BEGIN")
+    # Indexes are built once at the end instead of updated row by row; the
+    # triggers (search index, user_stats, change tracking, daily rollups)
+    # would only redo work that is rebuilt or loaded below
+    recreate = drop_indexes_and_triggers(conn)
+    for name, files in zip(chain, chain_files):
+        print(f"📥 Replaying {name}...")
+        manifest = backup_data.read_manifest(os.path.join(BACKUP_DIR, name)) or {}
+        counts = {}
+        if "tombstones" in files:
+            deletes = [(r["table_name"], r["row_id"]) for r in backup_data.iter_rows(files["tombstones"])]
+            conn.executemany("DELETE FROM cards WHERE id=?", [(i,) for t, i in deletes if t == "cards"])
+            conn.executemany("DELETE FROM cards WHERE user_id=?", [(i,) for t, i in deletes if t == "users"])
+            conn.executemany("DELETE FROM users WHERE id=?", [(i,) for t, i in deletes if t == "users"])
+            counts["tombstones"] = len(deletes)
+        skipped = len(without_hash)
+        counts["users"] = load_rows(conn, insert_user, users(read_table(files["users"], user_columns)))
+        counts["users"] += len(without_hash) - skipped
+        counts["cards"] = load_rows(conn, insert_card, read_table(files["cards"], card_columns))
+        if "review_events" in files:
+            counts["review_events"] = load_rows(conn, insert_event, read_table(files["review_events"], event_columns))
+        if "review_daily" in files:
+            # Every export holds the whole rollup table
+            conn.execute("DELETE FROM review_daily")
+            counts["review_daily"] = load_rows(conn, insert_daily, read_table(files["review_daily"], daily_columns))
+        for table, entry in manifest.get("tables", {}).items():
+            if counts.get(table) != entry["rows"]:
+                raise ValueError(f"{name}: read {counts.get(table)} {table} rows, manifest says {entry['rows']}")
+        print(f"   " + ", ".join(f"{n} {t}" for t, n in counts.items()))
+
+    fill_slugs(conn)
+    print("🔧 Building indexes...")
+    for sql in recreate:
+        conn.execute(sql)
+    # Rows from exports made before change tracking have no stamp
+    for table in ("users", "cards"):
+        conn.execute(f"UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL")
+    conn.execute("INSERT INTO cards_fts(cards_fts) VALUES('rebuild')")
+    # New counters (with a new started_at) so no ETag from before the restore matches
+    conn.execute("INSERT INTO data_versions (user_id) SELECT id FROM users")
+    conn.execute("COMMIT")
+    user_stats.rebuild(conn)
+
+    users_count, cards_count = (conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("users", "cards"))
+    conn.close()
+    return users_count, cards_count, without_hash
+
+def restore_from_backup(backup_name, assume_yes=False):
+    """Restore data from a specific backup (a delta export is replayed on top of its base exports)"""
+    if backup_name.startswith("snapshot_"):
+        return restore_from_snapshot(backup_name, assume_yes)
     
-    # Backup current database first
-    if os.path.exists(DATABASE):
-        backup_current = f"{DATABASE}.before-restore-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        os.rename(DATABASE, backup_current)
-        print(f"📦 Current database backed up to: {backup_current}")
+    backup_path = os.path.join(BACKUP_DIR, backup_name)
     
-    # Create new database
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    
-    # Create tables
-    cursor.executescript("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS cards (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            title TEXT NOT NULL,
-            link TEXT,
-            idea TEXT,
-            solved_date DATE NOT NULL,
-            leitner_box INTEGER NOT NULL DEFAULT 1,
-            next_review DATE NOT NULL,
-            last_reviewed DATE,
-            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
-        );
-
-        CREATE INDEX IF NOT EXISTS idx_cards_user ON cards(user_id);
-        CREATE INDEX IF NOT EXISTS idx_cards_nextreview ON cards(next_review);
-    """)
-    
-    # Restore users
-    print("📥 Restoring users...")
-    with open(users_file, 'r') as f:
-        reader = csv.DictReader(f)
-        user_count = 0
-        for row in reader:
-            # Note: We can't restore password_hash from CSV for security
-            # You'll need to reset passwords after restore
-            print(f"⚠️  Note: User '{row['email']}' will need to re-register (passwords not backed up for security)")
-            user_count += 1
-    
-    # Restore cards
-    print("📥 Restoring cards...")
-    with open(cards_file, 'r') as f:
-        reader = csv.DictReader(f)
-        card_count = 0
-        for row in reader:
-            cursor.execute("""
-                INSERT INTO cards (id, user_id, title, link, idea, solved_date, 
-                                 leitner_box, next_review, last_reviewed, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                row['id'], row['user_id'], row['title'], row['link'],
-                row['idea'] if row['idea'] else None,
-                row['solved_date'], row['leitner_box'], row['next_review'],
-                row['last_reviewed'] if row['last_reviewed'] else None,
-                row['created_at']
-            ))
-            card_count += 1
-    
-    conn.commit()
-    conn.close()
+    if not os.path.exists(backup_path):
+        print(f"❌ Backup '{backup_name}' not found.")
+        return False
+    
+    chain = backup_data.export_chain(BACKUP_DIR, backup_name)
+    if not chain:
+        print(f"❌ '{backup_name}' is a delta export and an earlier export it builds on is missing.")
+        return False
+    
+    # Check every file before anything is touched
+    for name in chain:
+        problems = verify_backup(os.path.join(BACKUP_DIR, name))
+        if problems:
+            print(f"❌ Backup '{name}' is damaged:")
+            for problem in problems:
+                print(f"   - {problem}")
+            return False
+    chain_files = [backup_files(os.path.join(BACKUP_DIR, name)) for name in chain]
+    
+    detail = f"full export {chain[0]} plus {len(chain) - 1} delta(s)" if len(chain) > 1 else None
+    if not confirm(backup_name, assume_yes, detail):
+        return False
+    
+    # Load next to the live database and swap it in at the end, so a failed
+    # or interrupted restore leaves the current data alone and can be rerun
+    staging = DATABASE + ".restoring"
+    for suffix in ("", "-journal"):
+        if os.path.exists(staging + suffix):
+            os.remove(staging + suffix)
+    try:
+        users, cards, without_hash = bulk_load(staging, chain, chain_files)
+    except Exception as e:
+        os.remove(staging)
+        print(f"❌ Restore failed, current database unchanged: {e}")
+        return False
+    
+    replace_live_database(staging)
     
     print(f"\n✅ Restore completed successfully!")
-    print(f"📊 Restored {card_count} cards")
-    print(f"\n⚠️  IMPORTANT: You'll need to re-register your account")
-    print(f"   Use the same email as before: check {users_file}")
+    print(f"📊 Restored {users} users and {cards} cards")
+    if without_hash:
+        # Exports made before password hashes were included
+        for email in without_hash:
+            print(f"⚠️  Note: User '{email}' will need to re-register (passwords not in this backup)")
+        print(f"\n⚠️  IMPORTANT: Re-register with the same email as before to get your cards back")
     
     return True
 
 def main():
+    args = [arg for arg in sys.argv[1:] if arg not in ("--yes", "-y")]
+    assume_yes = len(args) < len(sys.argv) - 1
+    
     print("🔄 Leitner App - Data Restore Utility")
     print("=" * 50)
     
@@ -138,20 +320,21 @@ def main():
     print(f"\n📦 Available backups ({len(backups)}):\n")
     
     for i, backup in enumerate(backups, 1):
-        timestamp = backup.replace("backup_", "")
+        timestamp = backup.split("_", 1)[1].replace(".sqlite3", "")
+        kind = "snapshot" if backup.startswith("snapshot_") else "export"
         try:
             dt = datetime.strptime(timestamp, "%Y%m%d_%H%M%S")
             formatted = dt.strftime("%Y-%m-%d %H:%M:%S")
-            print(f"  {i}. {formatted}")
+            print(f"  {i}. {formatted} ({kind})")
         except:
             print(f"  {i}. {backup}")
     
     print(f"\n{'='*50}")
     
-    if len(sys.argv) > 1:
+    if args:
         # Backup name provided as argument
-        backup_name = sys.argv[1]
-        if not backup_name.startswith("backup_"):
+        backup_name = args[0]
+        if not backup_name.startswith(("backup_", "snapshot_")):
             # Try to find by number
             try:
                 idx = int(backup_name) - 1
@@ -163,6 +346,9 @@ def main():
             except ValueError:
                 print(f"❌ Invalid backup: {backup_name}")
                 return
+    elif assume_yes:
+        print("❌ --yes needs a backup number or name.")
+        sys.exit(1)
     else:
         # Interactive mode
         choice = input(f"\nEnter backup number to restore (1-{len(backups)}) or 'q' to quit: ")
@@ -182,7 +368,8 @@ def main():
             print("❌ Invalid input.")
             return
     
-    restore_from_backup(backup_name)
+    if not restore_from_backup(backup_name, assume_yes) and assume_yes:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
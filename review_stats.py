@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Review history rollups for Leitner App
+Every review appends a review_events row; a trigger adds it to the user's
+review_daily row for that day (migration 0012). Dashboards and the stats API
+read review_daily only. This checks the rollups against the raw events and
+can rebuild them.
+
+    python review_stats.py            # report mismatches
+    python review_stats.py rebuild    # recompute every user's daily rollups
+"""
+
+import sys
+from datetime import timedelta
+
+import database
+import migrate
+
+COLUMNS = ["reviews", "passes", "promoted", "demoted", "mastered"]
+
+RECOUNT_SQL = """
+    SELECT user_id, reviewed_at AS day, COUNT(*) AS reviews,
+           SUM(CASE WHEN result = 'pass' THEN 1 ELSE 0 END) AS passes,
+           SUM(CASE WHEN box_after > box_before THEN 1 ELSE 0 END) AS promoted,
+           SUM(CASE WHEN box_after < box_before THEN 1 ELSE 0 END) AS demoted,
+           SUM(CASE WHEN box_after = 5 AND box_before < 5 THEN 1 ELSE 0 END) AS mastered
+    FROM review_events GROUP BY user_id, reviewed_at
+"""
+
+def daily_totals(db, user_id, since):
+    """review_daily rows for user_id from since onwards, oldest first"""
+    return db.execute(
+        f"SELECT day, {', '.join(COLUMNS)} FROM review_daily WHERE user_id=? AND day >= ? ORDER BY day",
+        (user_id, since),
+    ).fetchall()
+
+def streak(db, user_id, today):
+    """Consecutive days with at least one review, ending today (or yesterday,
+    so the streak isn't lost before today's reviews are done)"""
+    rows = db.execute(
+        "SELECT day FROM review_daily WHERE user_id=? AND day <= ? ORDER BY day DESC", (user_id, today)
+    )
+    count, expected = 0, None
+    for row in rows:
+        day = row["day"]
+        if expected is None and day < today - timedelta(days=1):
+            break
+        if expected is not None and day != expected:
+            break
+        count += 1
+        expected = day - timedelta(days=1)
+    return count
+
+def summarize(rows):
+    """Totals and pass rate (None without reviews) over daily_totals() rows"""
+    totals = {column: sum(row[column] for row in rows) for column in COLUMNS}
+    totals["pass_rate"] = round(totals["passes"] / totals["reviews"], 3) if totals["reviews"] else None
+    return totals
+
+def find_mismatches(conn):
+    """Return [((user_id, day), stored, actual), ...] where rollups disagree with events"""
+    actual = {(row["user_id"], row["day"]): tuple(row[c] for c in COLUMNS) for row in conn.execute(RECOUNT_SQL)}
+    stored = {
+        (row["user_id"], row["day"]): tuple(row[c] for c in COLUMNS)
+        for row in conn.execute("SELECT * FROM review_daily")
+    }
+    empty = (0,) * len(COLUMNS)
+    mismatches = []
+    for key in sorted(set(actual) | set(stored)):
+        have = stored.get(key, empty)
+        want = actual.get(key, empty)
+        if have != want:
+            mismatches.append((key, have, want))
+    return mismatches
+
+def rebuild(conn):
+    """Recompute all rollups from review_events in one transaction; returns rows written"""
+    try:
+        conn.execute("DELETE FROM review_daily")
+        cursor = conn.execute(f"INSERT INTO review_daily (user_id, day, {', '.join(COLUMNS)}) {RECOUNT_SQL}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return cursor.rowcount
+
+def main():
+    pool = database.get_pool(migrate.DATABASE, migrate.DATABASE_URL)
+    conn = pool.acquire()
+    try:
+        if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+            count = rebuild(conn)
+            print(f"✅ Rebuilt {count} daily rollup row(s)")
+            return
+        mismatches = find_mismatches(conn)
+    finally:
+        pool.release(conn)
+
+    if not mismatches:
+        print("✅ review_daily matches review_events for every user")
+        return
+
+    print(f"⚠️  {len(mismatches)} stale daily rollup(s):")
+    for (user_id, day), have, want in mismatches:
+        print(f"  - user {user_id} on {day}: stored {have}, actual {want}")
+    print("\n💡 Run 'python review_stats.py rebuild' to fix them")
+    sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Review scheduling for Leitner App
+A policy decides how long a card waits before its next review. Each user
+picks one (users.scheduler, migration 0011):
+
+    leitner   boxes 1-5 come back after 1, 3, 7, 14 and 30 days
+    custom    the same boxes with the user's own intervals (users.intervals)
+    sm2       SuperMemo-2: every card's interval grows by its own ease
+              factor, which drops each time the card is failed
+
+Cards move between boxes the same way under every policy (a pass moves the
+card up one box, a fail sends it back to box 1), so box counts and
+user_stats mean the same thing whichever one is in use.
+
+Switching policy re-dates the user's whole collection with reschedule(): one
+SELECT, the date arithmetic done on NumPy arrays, and the results written back
+with batched UPDATE ... FROM (VALUES ...) statements, bumping the user's data
+version once for all of them (data_versions.begin_bulk()).
+
+With load smoothing on (users.smooth_load, migration 0013) an interval of 3
+days or more may move up to LOAD_FUZZ of its length either way, onto the day
+with the fewest cards already due, so a burst of cards added or reviewed
+together doesn't all come back on one day.
+"""
+
+from datetime import timedelta
+
+import data_versions
+
+POLICIES = ("leitner", "custom", "sm2")
+LEITNER_INTERVALS = (1, 3, 7, 14, 30)   # days, for boxes 1-5
+MAX_INTERVAL = 3650                      # days; SM-2 intervals grow without bound otherwise
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+PASS_QUALITY = 4   # SM-2 grades recall 0-5; the app only records pass or fail
+FAIL_QUALITY = 2
+LOAD_FUZZ = 0.15           # share of an interval load smoothing may move a review by
+MAX_FUZZ_DAYS = 7
+RESCHEDULE_BATCH = 5_000   # cards per UPDATE (4 parameters each, well under SQLite's limit)
+
+def next_box(box: int, result: str) -> int:
+    """A pass moves the card up one box (max 5); a fail sends it back to box 1"""
+    return min(5, box + 1) if result == "pass" else 1
+
+def due_date(reviewed_on, days):
+    return reviewed_on + timedelta(days=days)
+
+class Leitner:
+    """One fixed interval per box"""
+
+    def __init__(self, intervals=LEITNER_INTERVALS, name="leitner"):
+        self.name = name
+        self.intervals = tuple(intervals)
+
+    def interval(self, box, ease=None):
+        """Days until the next review of a card that has just reached box"""
+        return self.intervals[box - 1]
+
+    def review(self, box, ease, interval_days, result):
+        """(box, ease, interval_days) after the card is graded result"""
+        box = next_box(box, result)
+        return box, None, self.intervals[box - 1]
+
+    def schedule(self, boxes, eases, interval_days):
+        """interval() for arrays of cards; returns (interval_days, eases)"""
+        import numpy as np
+        return np.asarray(self.intervals)[boxes - 1], np.full(len(boxes), np.nan)
+
+class SM2:
+    """SuperMemo-2 with pass graded PASS_QUALITY and fail FAIL_QUALITY"""
+
+    name = "sm2"
+
+    def interval(self, box, ease=None):
+        """The SM-2 sequence (1 day, 6 days, then x ease per pass) at box"""
+        if box <= 1:
+            return 1
+        return min(MAX_INTERVAL, round(6 * (ease or DEFAULT_EASE) ** (box - 2)))
+
+    def review(self, box, ease, interval_days, result):
+        quality = PASS_QUALITY if result == "pass" else FAIL_QUALITY
+        ease = ease or DEFAULT_EASE
+        ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        if result != "pass":
+            return 1, ease, 1
+        if box <= 1:
+            return next_box(box, result), ease, 6
+        previous = interval_days or self.interval(box, ease)
+        return next_box(box, result), ease, min(MAX_INTERVAL, round(previous * ease))
+
+    def schedule(self, boxes, eases, interval_days):
+        import numpy as np
+        # Cards already reviewed under SM-2 keep their interval; the rest get
+        # the interval the SM-2 sequence gives for their box
+        known = ~np.isnan(eases) & ~np.isnan(interval_days)
+        eases = np.where(np.isnan(eases), DEFAULT_EASE, eases)
+        sequence = np.where(boxes <= 1, 1, np.rint(6 * eases ** np.maximum(boxes - 2, 0)))
+        days = np.where(known, interval_days, sequence)
+        return np.clip(days, 1, MAX_INTERVAL).astype(np.int64), eases
+
+def fuzz_days(interval_days):
+    """How many days either side of interval_days load smoothing may use"""
+    if interval_days < 3:
+        return 0
+    return min(MAX_FUZZ_DAYS, max(1, round(interval_days * LOAD_FUZZ)))
+
+def horizon(interval_days):
+    """Days of due counts least_loaded() needs to look at"""
+    return interval_days + fuzz_days(interval_days) + 1
+
+def least_loaded(interval_days, load, start=0):
+    """interval_days moved within its fuzz window onto the day with the fewest
+    cards due. load[i] is the number due i days from today (forecast.py) and
+    start is how far from today the interval counts from (negative for a
+    review dated in the past). Ties go to the day nearest interval_days; days
+    past the end of load count as empty."""
+    fuzz = fuzz_days(interval_days)
+
+    def cost(days):
+        day = max(start + days, 0)
+        return (load[day] if day < len(load) else 0, abs(days - interval_days), days)
+
+    return min(range(interval_days - fuzz, interval_days + fuzz + 1), key=cost)
+
+def place(interval_days, load, start=0):
+    """least_loaded(), counting the card into load so the next one placed sees it"""
+    interval_days = least_loaded(interval_days, load, start)
+    day = max(start + interval_days, 0)
+    if day < len(load):
+        load[day] += 1
+    return interval_days
+
+def parse_intervals(value):
+    """Five whole days (one per box), from "1,3,7,14,30" or a sequence; raises ValueError"""
+    parts = value.split(",") if isinstance(value, str) else list(value)
+    try:
+        intervals = tuple(int(str(p).strip()) for p in parts)
+    except ValueError:
+        raise ValueError("Intervals must be whole numbers of days")
+    if len(intervals) != 5:
+        raise ValueError("Give one interval for each of the 5 boxes")
+    if not all(1 <= days <= 365 for days in intervals):
+        raise ValueError("Each interval must be between 1 and 365 days")
+    if list(intervals) != sorted(intervals):
+        raise ValueError("Intervals can't get shorter in higher boxes")
+    return intervals
+
+def format_intervals(intervals):
+    return ",".join(str(days) for days in intervals)
+
+def get_policy(name, intervals=None):
+    """The policy stored for a user (users.scheduler and users.intervals)"""
+    if name == "sm2":
+        return SM2()
+    if name == "custom" and intervals:
+        return Leitner(parse_intervals(intervals), name="custom")
+    return Leitner()
+
+def reschedule_sql(rows):
+    values = ", ".join(["(?, ?, ?, ?)"] * rows)
+    # CAST: a batch whose eases are all NULL would otherwise be text on PostgreSQL
+    return f"""UPDATE cards SET next_review = v.column2, interval_days = v.column3,
+                      ease = CAST(v.column4 AS REAL), updated_at = ?
+               FROM (VALUES {values}) AS v
+               WHERE cards.id = v.column1 AND cards.user_id = ?"""
+
+def reschedule(db, user_id, policy, stamp, smooth=False):
+    """Re-date all of user_id's cards under policy, counting from each card's
+    last review (or solved date). Leaves the commit to the caller; returns the
+    number of cards.
+
+    This re-dates every card at once, so there is no existing load to steer
+    around: smoothing spreads cards evenly over each fuzz window by id."""
+    import numpy as np   # only needed here; keeps it out of app start-up
+
+    rows = db.execute(
+        """SELECT id, leitner_box, ease, interval_days, COALESCE(last_reviewed, solved_date) AS reviewed_on
+           FROM cards WHERE user_id=?""",
+        (user_id,),
+    ).fetchall()
+    if not rows:
+        return 0
+    ids, boxes, eases, interval_days, reviewed_on = (
+        [row[column] for row in rows] for column in ("id", "leitner_box", "ease", "interval_days", "reviewed_on")
+    )
+    boxes = np.clip(np.array(boxes, dtype=np.int64), 1, 5)
+    days, eases = policy.schedule(boxes, np.array(eases, dtype=float), np.array(interval_days, dtype=float))
+    if smooth:
+        fuzz = np.where(days < 3, 0, np.clip(np.rint(days * LOAD_FUZZ), 1, MAX_FUZZ_DAYS)).astype(np.int64)
+        days = days + np.array(ids, dtype=np.int64) % (2 * fuzz + 1) - fuzz
+    due = np.array(reviewed_on, dtype="datetime64[D]") + days.astype("timedelta64[D]")
+    eases = np.where(np.isnan(eases), None, eases)
+
+    updates = list(zip(ids, due.tolist(), days.tolist(), eases.tolist()))
+    data_versions.begin_bulk(db, user_id)
+    for start in range(0, len(updates), RESCHEDULE_BATCH):
+        batch = updates[start:start + RESCHEDULE_BATCH]
+        db.execute(reschedule_sql(len(batch)), (stamp, *(value for row in batch for value in row), user_id))
+    data_versions.end_bulk(db, user_id)
+    return len(updates)
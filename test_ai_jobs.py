@@ -0,0 +1,317 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from openai import OpenAI
+
+import ai_cache
+import app as leitner
+import jobs
+from conftest import create_user, login
+
+class FakeLLM(BaseHTTPRequestHandler):
+    """Answers /v1/chat/completions like OpenAI, after `delay` seconds"""
+    delay = 0
+    reply = "- Use a hash map\n- O(n) time"
+    calls = 0
+    repeat = 1     # times the reply is repeated when streaming
+    streamed = 0   # stream chunks written before the client hung up
+
+    def do_POST(self):
+        type(self).calls += 1
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if request.get("stream"):
+            return self.stream()
+        time.sleep(self.delay)
+        self.send_json({
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-3.5-turbo",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        })
+
+    def send_json(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream(self):
+        """Chat completion chunks, one word every `delay` seconds, until the client hangs up"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        pieces = [word + " " for word in self.reply.split(" ")] * self.repeat
+        try:
+            for piece in pieces:
+                time.sleep(self.delay)
+                chunk = {
+                    "id": "chatcmpl-test",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": "gpt-3.5-turbo",
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                type(self).streamed += 1
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def llm(app, monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeLLM)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(FakeLLM, "delay", 0)
+    monkeypatch.setattr(FakeLLM, "calls", 0)
+    monkeypatch.setattr(FakeLLM, "repeat", 1)
+    monkeypatch.setattr(FakeLLM, "streamed", 0)
+    leitner.note_cache.clear()
+    monkeypatch.setattr(leitner, "ai_streams", threading.BoundedSemaphore(leitner.AI_MAX_STREAMS))
+    monkeypatch.setattr(leitner, "openai_client", OpenAI(
+        api_key="test", base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0,
+    ))
+    monkeypatch.setitem(app.config, "OPENAI_API_KEY", "test")
+    monkeypatch.setitem(app.config, "AI_TIMEOUT", 5)
+    yield FakeLLM
+    server.shutdown()
+    server.server_close()
+
+def wait_for(client, status_url, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(status_url).get_json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("AI job did not finish")
+
+def test_improve_note_returns_job_before_ai_answers(client, db, llm):
+    llm.delay = 0.5
+    login(client, create_user(db))
+
+    start = time.monotonic()
+    response = client.post("/api/improve-note", json={"note": "hashmap lol", "title": "Two Sum"})
+    assert time.monotonic() - start < 0.3
+    assert response.status_code == 202
+    assert client.get(response.get_json()["status_url"]).get_json()["status"] in ("queued", "running")
+
+    job = wait_for(client, response.get_json()["status_url"])
+    assert job == {
+        "success": True,
+        "job_id": response.get_json()["job_id"],
+        "status": "done",
+        "improved_note": FakeLLM.reply,
+    }
+
+def test_ai_timeout_marks_job_failed(app, client, db, llm):
+    llm.delay = 1
+    app.config["AI_TIMEOUT"] = 0.2
+    login(client, create_user(db))
+
+    response = client.post("/api/improve-note", json={"note": "two pointers"})
+    job = wait_for(client, response.get_json()["status_url"])
+    assert job["status"] == "failed"
+    assert job["success"] is False
+    assert "AI service error" in job["error"]
+
+def test_jobs_are_private_to_their_owner(client, db, llm):
+    login(client, create_user(db, "a@example.com"), "a@example.com")
+    status_url = client.post("/api/improve-note", json={"note": "dp"}).get_json()["status_url"]
+    wait_for(client, status_url)
+
+    login(client, create_user(db, "b@example.com"), "b@example.com")
+    assert client.get(status_url).status_code == 404
+
+def test_full_queue_answers_429(client, db, llm, monkeypatch):
+    llm.delay = 0.5
+    monkeypatch.setattr(leitner, "ai_jobs", jobs.JobRunner(max_workers=1, max_queued=2))
+    login(client, create_user(db))
+
+    codes = [client.post("/api/improve-note", json={"note": "bfs"}).status_code for _ in range(3)]
+    assert codes == [202, 202, 429]
+    assert db.execute("SELECT COUNT(*) FROM ai_jobs").fetchone()[0] == 2
+
+def test_unfinished_job_past_deadline_reports_failure(client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+    db.execute(
+        """INSERT INTO ai_jobs (id, user_id, status, note, created_at)
+           VALUES ('lost', ?, 'running', 'x', datetime('now', '-1 day'))""",
+        (user_id,),
+    )
+    db.commit()
+
+    job = client.get("/api/improve-note/lost").get_json()
+    assert job["status"] == "failed"
+
+def improve(client, note, title="Two Sum"):
+    response = client.post("/api/improve-note", json={"note": note, "title": title}).get_json()
+    return wait_for(client, response["status_url"]) if "status_url" in response else response
+
+def test_repeat_request_is_served_from_cache(client, db, llm):
+    login(client, create_user(db))
+    first = improve(client, "use a  hashmap\n\n one pass ")
+    again = improve(client, "use a hashmap\none pass")
+
+    assert again == {"success": True, "status": "done", "improved_note": first["improved_note"], "cached": True}
+    assert llm.calls == 1
+    assert leitner.note_cache.stats()["memory_hits"] == 1
+
+    improve(client, "use a hashmap\none pass", title="3Sum")
+    assert llm.calls == 2
+
+def test_database_tier_is_shared_across_processes(client, db, llm):
+    login(client, create_user(db))
+    improve(client, "sliding window")
+    leitner.note_cache.clear()  # as if another worker took the request
+
+    assert improve(client, "sliding window")["cached"] is True
+    assert llm.calls == 1
+    assert leitner.note_cache.stats() == {
+        "memory_hits": 0, "database_hits": 1, "misses": 0, "hit_rate": 1.0, "entries": 1,
+    }
+
+def test_cache_expires_and_evicts_least_recently_used(db, monkeypatch):
+    cache = ai_cache.NoteCache(max_entries=2, max_rows=2, ttl=60)
+    clock = [1000.0]
+    monkeypatch.setattr(ai_cache, "time", SimpleNamespace(time=lambda: clock[0]))
+    for key in "abc":
+        clock[0] += 1
+        cache.put(db, key, key.upper())
+        if key == "b":
+            clock[0] += 1
+            cache.get(db, "a")  # a is now more recently used than b
+    assert list(cache._entries) == ["a", "c"]
+
+    cache.put(db, "a", "A")
+    cache.put(db, "b", "B")
+    cache.clear()
+    clock[0] += 1
+    assert cache.get(db, "a") == "A"  # from the table, refreshing last_used_at
+    clock[0] += 1
+    cache.put(db, "c", "C")
+    assert [r["key"] for r in db.execute("SELECT key FROM ai_cache ORDER BY key")] == ["a", "c"]
+
+    clock[0] += 60
+    cache.clear()
+    assert cache.get(db, "c") is None
+
+def read_events(response):
+    """Parse a server-sent event stream into [(event, data), ...] as it arrives"""
+    buffer = ""
+    for chunk in response.response:
+        buffer += chunk.decode() if isinstance(chunk, bytes) else chunk
+        while "\n\n" in buffer:
+            frame, buffer = buffer.split("\n\n", 1)
+            lines = dict(line.split(": ", 1) for line in frame.splitlines())
+            yield lines["event"], json.loads(lines["data"])
+
+def test_stream_sends_text_as_it_is_generated(client, db, llm):
+    llm.delay = 0.1
+    login(client, create_user(db))
+
+    start = time.monotonic()
+    response = client.post("/api/improve-note/stream", json={"note": "hashmap"}, buffered=False)
+    assert response.mimetype == "text/event-stream"
+    events = read_events(response)
+    first = next(events)
+    first_at = time.monotonic() - start
+    rest = list(events)
+
+    assert first[0] == "delta"
+    assert first_at < 0.1 * len(FakeLLM.reply.split(" ")) - 0.1
+    assert rest[-1] == ("done", {"cached": False})
+    assert "".join(data["text"] for _, data in [first] + rest[:-1]) == FakeLLM.reply + " "
+
+    # The finished text is cached for the next request, streamed or not
+    again = client.post("/api/improve-note/stream", json={"note": "hashmap"}, buffered=False)
+    assert list(read_events(again)) == [("delta", {"text": FakeLLM.reply}), ("done", {"cached": True})]
+    assert improve(client, "hashmap", title="")["cached"] is True
+    assert llm.calls == 1
+
+def test_stream_stops_generation_when_client_disconnects(client, db, llm):
+    llm.delay = 0.02
+    llm.repeat = 100
+    login(client, create_user(db))
+
+    response = client.post("/api/improve-note/stream", json={"note": "dfs"}, buffered=False)
+    assert next(read_events(response))[0] == "delta"
+    response.close()
+    time.sleep(0.2)
+    streamed = llm.streamed
+    time.sleep(0.3)
+
+    assert llm.streamed == streamed  # the model stopped sending
+    assert llm.streamed < len(FakeLLM.reply.split(" ")) * llm.repeat
+    assert db.execute("SELECT COUNT(*) FROM ai_cache").fetchone()[0] == 0
+
+def test_stream_reports_model_errors(app, client, db, llm):
+    llm.delay = 1
+    app.config["AI_TIMEOUT"] = 0.2
+    login(client, create_user(db))
+
+    response = client.post("/api/improve-note/stream", json={"note": "greedy"}, buffered=False)
+    event, data = next(read_events(response))
+    assert event == "error" and "AI service error" in data["error"]
+
+def test_streams_past_the_limit_answer_429(client, db, llm, monkeypatch):
+    llm.delay = 0.02
+    llm.repeat = 100
+    monkeypatch.setattr(leitner, "ai_streams", threading.BoundedSemaphore(2))
+    login(client, create_user(db))
+
+    streams = [client.post("/api/improve-note/stream", json={"note": "bfs"}, buffered=False) for _ in range(2)]
+    busy = client.post("/api/improve-note/stream", json={"note": "bfs"}, buffered=False)
+    assert [r.status_code for r in streams] == [200, 200]
+    assert busy.status_code == 429
+
+    streams[0].close()  # a finished or abandoned stream frees its slot
+    again = client.post("/api/improve-note/stream", json={"note": "bfs"}, buffered=False)
+    assert again.status_code == 200
+    again.close()
+    streams[1].close()
+
+@pytest.mark.parametrize("body", [["hashmap"], {"note": 42}, {"note": ["hashmap"]}, {"note": "dp", "title": 7}])
+def test_stream_rejects_malformed_bodies(client, db, llm, body):
+    login(client, create_user(db))
+
+    response = client.post("/api/improve-note/stream", json=body)
+
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+def test_improve_button_only_shown_when_ai_is_configured(client, db, llm, monkeypatch):
+    login(client, create_user(db))
+    assert b"data-ai-improve" in client.get("/dashboard").data
+
+    monkeypatch.setitem(leitner.app.config, "OPENAI_API_KEY", None)
+    assert b"data-ai-improve" not in client.get("/dashboard").data
+
+def test_openai_client_is_created_once_on_first_use(app, monkeypatch):
+    monkeypatch.setattr(leitner, "openai_client", None)
+    monkeypatch.setitem(app.config, "OPENAI_API_KEY", "test")
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(leitner.get_openai_client())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(c) for c in clients}) == 1
+    assert clients[0].api_key == "test"
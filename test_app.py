@@ -0,0 +1,573 @@
+import base64
+import os
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+import app as leitner
+import bench_startup
+import database
+import leetcode
+import migrate
+import user_stats
+from conftest import create_card, create_user, login
+
+def users_queries(statements):
+    return [s for s in statements if "FROM users" in s]
+
+ROUTES = [
+    ("get", "/dashboard"),
+    ("get", "/review"),
+    ("get", "/edit/{card_id}"),
+    ("post", "/mark/{card_id}/pass"),
+    ("post", "/add"),
+    ("post", "/delete/{card_id}"),
+]
+SETTINGS_ROUTES = {"/dashboard", "/review", "/mark/{card_id}/pass", "/add"}
+
+@pytest.mark.parametrize("method,route", ROUTES)
+def test_users_table_read_at_most_once_per_request(app, client, db, queries, method, route):
+    user_id = create_user(db)
+    card_id = create_card(db, user_id)
+    login(client, user_id)
+
+    data = {"link": "https://leetcode.com/problems/3sum/"} if route == "/add" else None
+    response = getattr(client, method)(route.format(card_id=card_id), data=data)
+
+    assert response.status_code in (200, 302)
+    assert len(users_queries(queries)) == 1
+
+@pytest.mark.parametrize("method,route", ROUTES)
+def test_signed_session_skips_users_table(app, client, db, queries, method, route):
+    app.config["SESSION_USER_CACHE"] = True
+    user_id = create_user(db)
+    card_id = create_card(db, user_id)
+    login(client, user_id)
+
+    data = {"link": "https://leetcode.com/problems/3sum/"} if route == "/add" else None
+    response = getattr(client, method)(route.format(card_id=card_id), data=data)
+
+    assert response.status_code in (200, 302)
+    # Only routes that schedule cards read the users row, for the review settings
+    expected = 1 if route in SETTINGS_ROUTES else 0
+    assert [s.split(" FROM")[0] for s in users_queries(queries)] == ["SELECT scheduler, intervals, smooth_load, daily_cap"] * expected
+
+def test_settings_change_reaches_the_users_other_sessions(app, db):
+    app.config["SESSION_USER_CACHE"] = True
+    user_id = create_user(db)
+    first, second = app.test_client(), app.test_client()
+    login(first, user_id)
+    login(second, user_id)
+    second.get("/dashboard")
+
+    first.post("/schedule", data={"scheduler": "custom", "intervals": "2,4,8,16,32"})
+    second.post("/add", data={"link": "https://leetcode.com/problems/3sum/"})
+
+    assert db.execute("SELECT interval_days FROM cards").fetchone()[0] == 2
+
+def test_dashboard_shows_email_from_session(app, client, db):
+    app.config["SESSION_USER_CACHE"] = True
+    user_id = create_user(db, "cached@example.com")
+    login(client, user_id, "cached@example.com")
+
+    response = client.get("/dashboard")
+
+    assert b"cached@example.com" in response.data
+
+def test_anonymous_request_is_redirected_without_queries(client, queries):
+    response = client.get("/dashboard")
+
+    assert response.status_code == 302
+    assert queries == []
+
+def query_plan(db, sql, params):
+    return [row["detail"] for row in db.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+@pytest.mark.parametrize("sql,extra", [
+    (leitner.DUE_CARDS_SQL, ()),
+    (leitner.DUE_CARDS_AFTER_SQL, ("2000-01-01", 0)),
+])
+def test_due_query_uses_composite_index_without_sort(db, sql, extra):
+    user_id = create_user(db)
+    for i in range(50):
+        create_card(db, user_id, title=f"Problem {i}")
+    db.execute("ANALYZE")
+
+    plan = query_plan(db, sql, (user_id, date.today(), *extra, 50))
+
+    # Both the user and the date bound must be index constraints; wrapping
+    # next_review in date() would drop the second one.
+    assert any("USING INDEX idx_cards_user_due (user_id=? AND next_review" in step
+               and "next_review<?" in step for step in plan), plan
+    assert not any(step.startswith("SCAN") for step in plan), plan
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+def test_due_cards_include_overdue_and_exclude_future(db):
+    user_id = create_user(db)
+    today = date.today()
+    overdue = create_card(db, user_id, title="Overdue", next_review=today - timedelta(days=3))
+    due = create_card(db, user_id, title="Due", next_review=today)
+    create_card(db, user_id, title="Later", next_review=today + timedelta(days=1))
+
+    cards, next_cursor = leitner.fetch_due_cards(db, user_id)
+
+    assert [c["id"] for c in cards] == [overdue, due]
+    assert next_cursor is None
+
+def collect_pages(client, url):
+    ids, cursor = [], None
+    while True:
+        response = client.get(url, query_string={"limit": 3, "cursor": cursor or ""})
+        data = response.get_json()
+        ids += [card["id"] for card in data["cards"]]
+        cursor = data["next_cursor"]
+        if not cursor:
+            return ids
+
+def test_card_list_pages_newest_first_without_gaps(client, db):
+    user_id = create_user(db)
+    card_ids = [create_card(db, user_id, title=f"Problem {i}") for i in range(10)]
+    login(client, user_id)
+
+    # Same created_at second for every card, so order falls back to id
+    assert collect_pages(client, "/api/cards") == card_ids[::-1]
+
+def test_review_queue_pages_oldest_first_without_gaps(client, db):
+    user_id = create_user(db)
+    today = date.today()
+    card_ids = [
+        create_card(db, user_id, title=f"Problem {i}", next_review=today - timedelta(days=i % 4))
+        for i in range(10)
+    ]
+    create_card(db, user_id, title="Future", next_review=today + timedelta(days=2))
+    login(client, user_id)
+
+    expected = [card_id for _, card_id in sorted(
+        ((i % 4) * -1, card_id) for i, card_id in enumerate(card_ids)
+    )]
+    assert collect_pages(client, "/api/review-queue") == expected
+
+def test_page_size_is_capped(client, db):
+    user_id = create_user(db)
+    for i in range(leitner.MAX_PAGE_SIZE + 5):
+        create_card(db, user_id, title=f"Problem {i}")
+    login(client, user_id)
+
+    data = client.get("/api/cards", query_string={"limit": 10_000}).get_json()
+
+    assert len(data["cards"]) == leitner.MAX_PAGE_SIZE
+    assert data["next_cursor"]
+
+def test_dashboard_renders_first_page_only(app, client, db):
+    user_id = create_user(db)
+    for i in range(leitner.PAGE_SIZE + 1):
+        create_card(db, user_id, title=f"Problem {i}")
+    login(client, user_id)
+
+    html = client.get("/dashboard").get_data(as_text=True)
+
+    assert html.count('<tr id="card-') == leitner.PAGE_SIZE
+    assert "Load more" in html
+    assert f"<strong>{leitner.PAGE_SIZE + 1}</strong> problem(s) due" in html
+
+def test_malformed_cursor_starts_from_first_page(client, db):
+    user_id = create_user(db)
+    create_card(db, user_id)
+    login(client, user_id)
+
+    data = client.get("/api/cards", query_string={"cursor": "not-a-cursor"}).get_json()
+
+    assert len(data["cards"]) == 1
+
+@pytest.mark.parametrize("route", ["/api/cards", "/api/review-queue"])
+@pytest.mark.parametrize("raw", [b'["2024-01-01", 1180591620717411303424]', b'["2024-01-01", 1e999]'])
+def test_out_of_range_cursor_starts_from_first_page(client, db, route, raw):
+    user_id = create_user(db)
+    create_card(db, user_id)
+    login(client, user_id)
+    cursor = base64.urlsafe_b64encode(raw).decode()
+
+    response = client.get(route, query_string={"cursor": cursor})
+
+    assert response.status_code == 200
+    assert len(response.get_json()["cards"]) == 1
+
+def test_search_matches_prefixes_and_ranks_titles_first(db):
+    user_id = create_user(db)
+    in_note = create_card(db, user_id, title="Three Sum")
+    db.execute("UPDATE cards SET idea=? WHERE id=?", ("reuse the two pointer trick", in_note))
+    in_title = create_card(db, user_id, title="Two Pointers")
+    create_card(db, user_id, title="Valid Anagram")
+    db.commit()
+
+    cards = leitner.search_cards(db, user_id, "two poi")
+
+    assert [c["id"] for c in cards] == [in_title, in_note]
+    assert cards[0]["title_match"] == "<mark>Two</mark> <mark>Pointers</mark>"
+
+def test_search_is_scoped_to_user(db):
+    me = create_user(db)
+    other = create_user(db, "other@example.com")
+    create_card(db, other, title="Two Sum")
+
+    assert leitner.search_cards(db, me, "two") == []
+
+def test_search_digits_only_match_titles_and_notes(db):
+    for n in range(12):
+        user_id = create_user(db, f"user{n}@example.com")
+    create_card(db, user_id, title="Two Sum")
+    in_title = create_card(db, user_id, title="01 Matrix")
+
+    assert user_id == 12
+    assert [c["id"] for c in leitner.search_cards(db, user_id, "1")] == []
+    assert [c["id"] for c in leitner.search_cards(db, user_id, "01")] == [in_title]
+
+def test_search_index_follows_edits_and_deletes(db):
+    user_id = create_user(db)
+    card_id = create_card(db, user_id, title="Two Sum")
+    db.execute("UPDATE cards SET title='Word Ladder' WHERE id=?", (card_id,))
+    db.commit()
+
+    assert leitner.search_cards(db, user_id, "two") == []
+    assert [c["id"] for c in leitner.search_cards(db, user_id, "ladder")] == [card_id]
+
+    db.execute("DELETE FROM cards WHERE id=?", (card_id,))
+    db.commit()
+
+    assert leitner.search_cards(db, user_id, "ladder") == []
+
+def test_search_escapes_note_html(client, db):
+    user_id = create_user(db)
+    card_id = create_card(db, user_id, title="Two Sum")
+    db.execute("UPDATE cards SET idea=? WHERE id=?", ("<script>two</script>", card_id))
+    db.commit()
+    login(client, user_id)
+
+    html = client.get("/dashboard", query_string={"q": "two"}).get_data(as_text=True)
+
+    assert "&lt;script&gt;<mark>two</mark>&lt;/script&gt;" in html
+
+def test_search_ignores_fts_syntax(db):
+    user_id = create_user(db)
+    create_card(db, user_id, title="Two Sum")
+
+    assert leitner.search_cards(db, user_id, '"') == []
+    assert len(leitner.search_cards(db, user_id, 'two" OR user_id:*')) == 0
+
+def stats_row(db, user_id):
+    row = db.execute("SELECT * FROM user_stats WHERE user_id=?", (user_id,)).fetchone()
+    return row["total_cards"], [row[f"box_{b}"] for b in range(1, 6)]
+
+@pytest.mark.parametrize("link,slug", [
+    ("https://leetcode.com/problems/two-sum", "two-sum"),
+    ("https://leetcode.com/problems/two-sum/", "two-sum"),
+    ("https://leetcode.com/problems/two-sum/description/", "two-sum"),
+    ("https://LeetCode.com/problems/Two-Sum/?envType=study-plan#x", "two-sum"),
+    ("https://example.com/problems/a/", "https://example.com/problems/a"),
+])
+def test_links_reduce_to_one_slug_per_problem(link, slug):
+    assert leetcode.card_slug(link) == slug
+
+def test_add_rejects_same_problem_under_another_url(client, db, queries):
+    user_id = create_user(db)
+    login(client, user_id)
+    client.post("/add", data={"link": "https://leetcode.com/problems/two-sum/"})
+    assert not any("slug=?" in q for q in queries)  # a new card is one INSERT, no lookup first
+
+    response = client.post("/add", data={"link": "https://leetcode.com/problems/two-sum/description/"})
+
+    card_id = db.execute("SELECT id FROM cards").fetchone()[0]
+    assert response.headers["Location"].endswith(f"highlight={card_id}")
+    assert db.execute("SELECT COUNT(*) FROM cards").fetchone()[0] == 1
+
+def test_unique_slug_index_serves_duplicate_lookup(db):
+    user_id = create_user(db)
+    create_card(db, user_id, "Two Sum")
+    with pytest.raises(sqlite3.IntegrityError):
+        create_card(db, user_id, "Two Sum", link="https://leetcode.com/problems/two-sum/description/")
+    create_card(db, create_user(db, "other@example.com"), "Two Sum")  # per user
+
+    plan = query_plan(db, leitner.CARD_BY_SLUG_SQL, (user_id, "two-sum"))
+    assert any("USING INDEX idx_cards_user_slug (user_id=? AND slug=?)" in step for step in plan), plan
+
+def test_edit_cannot_turn_a_card_into_a_duplicate(client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+    create_card(db, user_id, "Two Sum")
+    card_id = create_card(db, user_id, "3Sum")
+
+    response = client.post(f"/edit/{card_id}", data={"link": "https://leetcode.com/problems/two-sum", "note": ""})
+
+    assert "already exists" in response.get_data(as_text=True)
+    assert db.execute("SELECT slug FROM cards WHERE id=?", (card_id,)).fetchone()[0] == "3sum"
+
+def test_note_edit_of_a_legacy_duplicate_keeps_its_missing_slug(client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+    create_card(db, user_id, "Two Sum")
+    # A later copy of a problem from before migration 0009 has no slug
+    link = "https://leetcode.com/problems/two-sum/description/"
+    card_id = db.execute(
+        """INSERT INTO cards (user_id, title, link, idea, solved_date, next_review)
+           VALUES (?, 'Two Sum', ?, '', '2024-01-01', '2024-01-01')""",
+        (user_id, link),
+    ).lastrowid
+    db.commit()
+
+    response = client.post(f"/edit/{card_id}", data={"link": link, "note": "hash map"})
+
+    assert response.status_code == 302
+    assert tuple(db.execute("SELECT idea, slug FROM cards WHERE id=?", (card_id,)).fetchone()) == ("hash map", None)
+
+def test_slug_migration_backfills_and_keeps_old_duplicates(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.sqlite3")
+    migrations = migrate.load_migrations("sqlite")
+    monkeypatch.setattr(migrate, "load_migrations", lambda dialect: [m for m in migrations if m[0] < 9])
+    migrate.migrate(path)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO users (email, password_hash) VALUES ('a@example.com', 'x')")
+    links = [
+        "https://leetcode.com/problems/two-sum/",
+        "https://LeetCode.com/problems/Two-Sum/description/?x=1",
+        "https://leetcode.com/problems/3sum?envType=study-plan",
+        "https://example.com/a/",
+    ]
+    conn.executemany(
+        "INSERT INTO cards (user_id, title, link, solved_date, next_review) VALUES (1, 't', ?, '2024-01-01', '2024-01-01')",
+        [(link,) for link in links],
+    )
+    conn.commit()
+
+    monkeypatch.undo()
+    migrate.migrate(path)
+
+    slugs = conn.execute("SELECT slug FROM cards ORDER BY id").fetchall()
+    assert slugs == [("two-sum",), (None,), ("3sum",), ("https://example.com/a",)]
+    assert [leetcode.card_slug(link) for link in links] == ["two-sum", "two-sum", "3sum", "https://example.com/a"]
+
+def test_add_takes_title_difficulty_and_tags_from_catalog(client, db):
+    login(client, create_user(db))
+    client.post("/add", data={"link": "https://leetcode.com/problems/lru-cache/description/"})
+    client.post("/add", data={"link": "https://leetcode.com/problems/some-new-problem/"})
+
+    rows = [tuple(r) for r in db.execute("SELECT title, difficulty, tags FROM cards ORDER BY id")]
+    assert rows == [
+        ("LRU Cache", "Medium", "Hash Table,Linked List,Design,Doubly-Linked List"),
+        ("Some New Problem", None, None),  # not in the catalog: title from the slug
+    ]
+
+def test_catalog_is_loaded_once_and_shares_strings(monkeypatch):
+    monkeypatch.setattr(leetcode, "_catalog", None)
+    catalogs = []
+    threads = [threading.Thread(target=lambda: catalogs.append(leetcode.catalog())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(c) for c in catalogs}) == 1
+    catalog = catalogs[0]
+    assert catalog.get("two-sum").tags[0] is catalog.get("contains-duplicate").tags[0]  # "Array", stored once
+    assert catalog.get("3sum").title == "3Sum" and catalog.get("3sum").difficulty == "Medium"
+    assert "Dynamic Programming" in catalog.tags
+
+def test_app_import_does_not_read_the_catalog(tmp_path):
+    database_path = str(tmp_path / "startup.sqlite3")
+    migrate.migrate(database_path)
+    result = subprocess.run(
+        [sys.executable, "-c", "import app, leetcode; print(leetcode._catalog is None)"],
+        env=dict(os.environ, DATABASE=database_path), capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip() == "True"
+
+def test_dashboard_filters_by_difficulty_and_tag(client, db):
+    login(client, create_user(db))
+    for slug in ("two-sum", "lru-cache", "3sum", "combination-sum"):
+        client.post("/add", data={"link": f"https://leetcode.com/problems/{slug}/"})
+
+    def titles(response):
+        return sorted(re.findall(r'class="problem-link">([^<]+)</a>', response.get_data(as_text=True)))
+
+    assert titles(client.get("/dashboard?difficulty=Medium")) == ["3Sum", "Combination Sum", "LRU Cache"]
+    assert titles(client.get("/dashboard?tag=Two Pointers")) == ["3Sum"]
+    assert titles(client.get("/dashboard?tag=Hash Table&difficulty=Easy")) == ["Two Sum"]
+    data = client.get("/api/cards", query_string={"tag": "Design"}).get_json()
+    assert [c["title"] for c in data["cards"]] == ["LRU Cache"]
+    data = client.get("/api/cards", query_string={"q": "sum", "difficulty": "Medium"}).get_json()
+    assert [c["title"] for c in data["cards"]] == ["Combination Sum"]
+
+def test_backfill_fills_catalog_data_on_old_cards(db):
+    user_id = create_user(db)
+    create_card(db, user_id, "Lru Cache")
+    create_card(db, user_id, "my own title", link="https://leetcode.com/problems/two-sum/")
+
+    assert leetcode.backfill(db) == 2
+    rows = [tuple(r) for r in db.execute("SELECT title, difficulty FROM cards ORDER BY id")]
+    assert rows == [("LRU Cache", "Medium"), ("my own title", "Easy")]
+    assert leetcode.backfill(db) == 0
+
+def test_user_stats_follow_add_mark_and_delete(client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+
+    client.post("/add", data={"link": "https://leetcode.com/problems/two-sum/", "leitner_box": "2"})
+    client.post("/add", data={"link": "https://leetcode.com/problems/3sum/"})
+    assert stats_row(db, user_id) == (2, [1, 1, 0, 0, 0])
+
+    card_id = db.execute("SELECT id FROM cards WHERE leitner_box=2").fetchone()["id"]
+    client.post(f"/mark/{card_id}/pass")
+    assert stats_row(db, user_id) == (2, [1, 0, 1, 0, 0])
+
+    client.post(f"/delete/{card_id}")
+    assert stats_row(db, user_id) == (1, [1, 0, 0, 0, 0])
+    assert user_stats.find_mismatches(db) == []
+
+def test_dashboard_header_reads_stats_by_primary_key(client, db, queries):
+    user_id = create_user(db)
+    create_card(db, user_id, box=3)
+    login(client, user_id)
+
+    html = client.get("/dashboard").get_data(as_text=True)
+
+    assert not any("GROUP BY" in q or "COUNT(" in q for q in queries)
+    assert 'Box 3: <strong style="display:inline;">1</strong>' in html
+
+def test_user_stats_checker_rebuilds_drifted_counters(db):
+    user_id = create_user(db)
+    create_card(db, user_id, "Two Sum", box=1)
+    create_card(db, user_id, "3Sum", box=4)
+    db.execute("UPDATE user_stats SET total_cards=7, box_4=0")
+    db.commit()
+
+    assert user_stats.find_mismatches(db) == [(user_id, (7, 1, 0, 0, 0, 0), (2, 1, 0, 0, 1, 0))]
+
+    user_stats.rebuild(db)
+
+    assert user_stats.find_mismatches(db) == []
+    assert stats_row(db, user_id) == (2, [1, 0, 0, 1, 0])
+
+def test_review_batch_applies_all_grades(client, db):
+    user_id = create_user(db)
+    other_id = create_user(db, "other@example.com")
+    first = create_card(db, user_id, title="Two Sum", box=2)
+    second = create_card(db, user_id, title="Three Sum", box=4)
+    foreign = create_card(db, other_id, title="Valid Anagram")
+    login(client, user_id)
+    yesterday = date.today() - timedelta(days=1)
+
+    response = client.post("/api/review/batch", json={"reviews": [
+        {"card_id": first, "result": "pass", "reviewed_at": date.today().isoformat()},
+        {"card_id": first, "result": "pass", "reviewed_at": yesterday.isoformat()},
+        {"card_id": second, "result": "fail"},
+        {"card_id": foreign, "result": "pass"},
+    ]})
+
+    data = response.get_json()
+    assert data["success"]
+    assert data["not_found"] == [foreign]
+    results = {c["card_id"]: c for c in data["cards"]}
+    # Yesterday's grade is replayed first: box 2 -> 3 -> 4, scheduled from today
+    assert results[first]["leitner_box"] == 4
+    assert results[first]["next_review"] == (date.today() + timedelta(days=14)).isoformat()
+    assert results[second]["leitner_box"] == 1
+    row = db.execute("SELECT leitner_box, last_reviewed FROM cards WHERE id=?", (first,)).fetchone()
+    assert (row["leitner_box"], row["last_reviewed"]) == (4, date.today())
+    assert db.execute("SELECT leitner_box FROM cards WHERE id=?", (foreign,)).fetchone()[0] == 1
+
+def test_review_batch_clamps_future_dates(client, db):
+    user_id = create_user(db)
+    card_id = create_card(db, user_id)
+    login(client, user_id)
+
+    data = client.post("/api/review/batch", json={"reviews": [
+        {"card_id": card_id, "result": "fail", "reviewed_at": "2999-01-01"},
+    ]}).get_json()
+
+    assert data["cards"][0]["next_review"] == (date.today() + timedelta(days=1)).isoformat()
+
+@pytest.mark.parametrize("payload", [
+    {},
+    {"reviews": []},
+    {"reviews": [{"card_id": "abc", "result": "pass"}]},
+    {"reviews": [{"card_id": 1, "result": "maybe"}]},
+    {"reviews": [{"card_id": 2**70, "result": "pass"}]},
+    {"reviews": [{"card_id": 0, "result": "pass"}]},
+    {"reviews": [{"card_id": 1, "result": "pass", "reviewed_at": "yesterday"}]},
+    {"reviews": [{"card_id": 1, "result": "pass"}] * (leitner.MAX_REVIEW_BATCH + 1)},
+])
+def test_review_batch_rejects_invalid_payloads(client, db, payload):
+    user_id = create_user(db)
+    login(client, user_id)
+
+    response = client.post("/api/review/batch", json=payload)
+
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+def test_review_batch_rejects_an_infinite_card_id(client, db):
+    login(client, create_user(db))
+
+    # Python's JSON decoder reads 1e999 as inf, which int() can't convert
+    response = client.post(
+        "/api/review/batch",
+        data='{"reviews": [{"card_id": 1e999, "result": "pass"}]}',
+        content_type="application/json",
+    )
+
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+def test_out_of_range_card_ids_in_urls_are_not_found(client, db):
+    login(client, create_user(db))
+    huge = 2**70
+
+    assert client.post(f"/mark/{huge}/pass").status_code == 404
+    assert client.get(f"/edit/{huge}").status_code == 404
+    assert client.post(f"/delete/{huge}").status_code == 404
+    assert client.get("/dashboard", query_string={"highlight": huge}).status_code == 200
+
+def test_requests_reuse_pooled_connection(app, client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+    seen = []
+    for _ in range(3):
+        with app.test_request_context():
+            seen.append(id(leitner.get_db()))
+
+    assert len(set(seen)) == 1
+    assert client.get("/dashboard").status_code == 200
+
+def test_pooled_connections_use_wal_and_busy_timeout(app):
+    conn = database.sqlite_pool(app.config["DATABASE"]).acquire()
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == database.SQLITE_BUSY_TIMEOUT_MS
+    finally:
+        database.sqlite_pool(app.config["DATABASE"]).release(conn)
+
+def test_pool_rolls_back_abandoned_transactions(app):
+    pool = database.sqlite_pool(app.config["DATABASE"])
+    conn = pool.acquire()
+    conn.execute("INSERT INTO users (email, password_hash) VALUES ('x@example.com', 'x')")
+    pool.release(conn)
+
+    conn = pool.acquire()
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+    finally:
+        pool.release(conn)
+
+def test_app_import_stays_within_startup_budget(tmp_path):
+    database = str(tmp_path / "startup.sqlite3")
+    migrate.migrate(database)
+
+    runs = [bench_startup.measure(database) for _ in range(3)]
+    assert runs[0][2] == []  # heavy dependencies load on first use
+    assert statistics.median(r[0] for r in runs) < bench_startup.STARTUP_BUDGET_MS
@@ -0,0 +1,323 @@
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import tracemalloc
+
+import pytest
+
+import backup_data
+import database
+import restore_data
+import user_stats
+from conftest import create_card, create_user, login
+
+def add_cards(db, user_id, count):
+    db.executemany(
+        """INSERT INTO cards (user_id, title, link, idea, solved_date, next_review)
+           VALUES (?, ?, ?, ?, '2024-01-01', '2024-01-02')""",
+        ((user_id, f"Problem {i}", f"https://leetcode.com/problems/p{i}/", "x" * 200) for i in range(count)),
+    )
+    db.commit()
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+def test_backup_streams_compressed_files_with_manifest(app, db, tmp_path, fmt):
+    user_id = create_user(db)
+    create_card(db, user_id, "Two Sum")
+    add_cards(db, user_id, 25)
+
+    folder = backup_data.create_backup(app.config["DATABASE"], str(tmp_path), fmt=fmt, batch_size=10)
+    with open(os.path.join(folder, backup_data.MANIFEST)) as f:
+        manifest = json.load(f)
+
+    assert manifest["format"] == fmt
+    assert {t: e["rows"] for t, e in manifest["tables"].items()} == {
+        "users": 1, "cards": 26, "review_events": 0, "review_daily": 0,
+    }
+    for entry in manifest["tables"].values():
+        path = os.path.join(folder, entry["file"])
+        assert entry["sha256"] == backup_data.file_sha256(path)
+        gzip.open(path).read()  # valid gzip
+
+    cards = list(backup_data.iter_rows(os.path.join(folder, f"cards.{fmt}.gz")))
+    assert len(cards) == 26
+    assert cards[0]["title"] == "Two Sum"
+    assert [int(c["id"]) for c in cards] == sorted(int(c["id"]) for c in cards)
+
+def test_backup_reads_in_bounded_batches(app, db, tmp_path):
+    user_id = create_user(db)
+    add_cards(db, user_id, 95)
+    statements = []
+    conn = sqlite3.connect(app.config["DATABASE"])
+    conn.set_trace_callback(statements.append)
+
+    rows, _ = backup_data.export_table(conn, "cards", str(tmp_path / "cards.csv.gz"), batch_size=20)
+    assert rows == 95
+    assert len([s for s in statements if "FROM cards" in s]) == 6  # 5 batches + the empty one
+
+def test_backup_memory_does_not_grow_with_table_size(app, db, tmp_path):
+    user_id = create_user(db)
+
+    def peak_memory(name):
+        tracemalloc.start()
+        backup_data.create_backup(app.config["DATABASE"], str(tmp_path / name), batch_size=500)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    add_cards(db, user_id, 2_000)
+    small = peak_memory("small")
+    add_cards(db, user_id, 18_000)
+    large = peak_memory("large")
+    assert large < small * 1.5
+
+def test_restore_reads_compressed_backup(app, db, tmp_path, monkeypatch):
+    user_id = create_user(db)
+    create_card(db, user_id, "Two Sum")
+    add_cards(db, user_id, 30)
+    folder = backup_data.create_backup(app.config["DATABASE"], str(tmp_path / "backups"), batch_size=7)
+
+    target = str(tmp_path / "restored.sqlite3")
+    monkeypatch.setattr(restore_data, "DATABASE", target)
+    monkeypatch.setattr(restore_data, "BACKUP_DIR", str(tmp_path / "backups"))
+    monkeypatch.setattr("builtins.input", lambda prompt: "yes")
+    assert restore_data.restore_from_backup(os.path.basename(folder))
+
+    restored = sqlite3.connect(target)
+    assert restored.execute("SELECT COUNT(*), MIN(title) FROM cards").fetchone() == (31, "Problem 0")
+
+def test_snapshot_is_consistent_while_the_app_writes(app, db, tmp_path):
+    user_id = create_user(db)
+    add_cards(db, user_id, 3_000)
+    before = db.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+    stop = threading.Event()
+    writes = []
+
+    def review_traffic():
+        conn = database.connect_sqlite(app.config["DATABASE"])
+        while not stop.is_set():
+            conn.execute("UPDATE cards SET leitner_box = leitner_box % 5 + 1 WHERE id = ?", (len(writes) % before + 1,))
+            conn.execute(
+                "INSERT INTO cards (user_id, title, solved_date, next_review) VALUES (?, 'New', '2024-01-01', '2024-01-01')",
+                (user_id,),
+            )
+            conn.commit()
+            writes.append(1)
+            started.set()
+        conn.close()
+
+    started = threading.Event()
+    writer = threading.Thread(target=review_traffic)
+    writer.start()
+    started.wait()  # the writer has switched the database to WAL
+    writes.clear()
+    try:
+        path = backup_data.create_snapshot(app.config["DATABASE"], str(tmp_path), pages=5, pause=0.002)
+    finally:
+        stop.set()
+        writer.join()
+
+    assert writes  # the app kept committing during the copy
+    snapshot = sqlite3.connect(path)
+    assert snapshot.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    assert snapshot.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    cards = snapshot.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+    # user_stats is trigger-maintained, so a torn copy would disagree with cards
+    assert snapshot.execute("SELECT total_cards FROM user_stats WHERE user_id=?", (user_id,)).fetchone()[0] == cards
+    assert snapshot.execute("SELECT password_hash FROM users").fetchone()[0] == "x"
+
+def test_restore_from_snapshot_keeps_passwords(app, db, tmp_path, monkeypatch):
+    user_id = create_user(db)
+    create_card(db, user_id, "Two Sum")
+    path = backup_data.create_snapshot(app.config["DATABASE"], str(tmp_path / "backups"))
+
+    target = str(tmp_path / "restored.sqlite3")
+    monkeypatch.setattr(restore_data, "DATABASE", target)
+    monkeypatch.setattr(restore_data, "BACKUP_DIR", str(tmp_path / "backups"))
+    monkeypatch.setattr("builtins.input", lambda prompt: "yes")
+    assert restore_data.list_available_backups() == [os.path.basename(path)]
+    assert restore_data.restore_from_backup(os.path.basename(path))
+
+    restored = sqlite3.connect(target)
+    assert restored.execute("SELECT email, password_hash FROM users").fetchall() == [("user@example.com", "x")]
+    assert restored.execute("SELECT title FROM cards").fetchall() == [("Two Sum",)]
+
+def test_rotation_keeps_newest_of_each_kind(tmp_path):
+    for day in range(1, 6):
+        os.makedirs(tmp_path / f"backup_2024010{day}_120000")
+        (tmp_path / f"snapshot_2024010{day}_120000.sqlite3").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("keep me")
+
+    removed = backup_data.rotate_backups(str(tmp_path), keep=2)
+
+    assert len(removed) == 6
+    assert sorted(os.listdir(tmp_path)) == [
+        "backup_20240104_120000", "backup_20240105_120000", "notes.txt",
+        "snapshot_20240104_120000.sqlite3", "snapshot_20240105_120000.sqlite3",
+    ]
+
+def test_writes_are_stamped_and_deletes_leave_tombstones(client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+    old = "2000-01-01 00:00:00"
+    card_ids = [create_card(db, user_id, f"Card {i}") for i in range(3)]
+    db.execute("UPDATE cards SET updated_at=?", (old,))
+    db.commit()
+
+    client.post("/add", data={"link": "https://leetcode.com/problems/two-sum/"})
+    client.post(f"/edit/{card_ids[0]}", data={"link": "https://leetcode.com/problems/3sum/", "note": "sort"})
+    client.post(f"/mark/{card_ids[1]}/pass")
+    client.post(f"/delete/{card_ids[2]}")
+
+    stamps = dict(db.execute("SELECT title, updated_at FROM cards").fetchall())
+    assert stamps.pop("Card 1").year > 2000 and stamps.pop("3Sum").year > 2000
+    assert stamps.pop("Two Sum").year > 2000 and not stamps
+    assert [tuple(r) for r in db.execute("SELECT table_name, row_id FROM tombstones")] == [("cards", card_ids[2])]
+
+def test_delta_query_reads_the_change_index(db):
+    for table, columns, stamp in [("cards", backup_data.TABLES["cards"], "updated_at"),
+                                  ("tombstones", backup_data.TOMBSTONES, "deleted_at")]:
+        sql = f"""SELECT {', '.join(columns)} FROM {table} WHERE ({stamp}, id) > (?, ?)
+                  ORDER BY {stamp}, id LIMIT ?"""
+        plan = " ".join(row[3] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}", ("2024-01-01", 0, 10)))
+        assert "USING INDEX" in plan and "TEMP B-TREE" not in plan
+
+def test_incremental_backup_holds_only_changes_and_restores_with_its_base(app, client, db, tmp_path, monkeypatch):
+    user_id = create_user(db)
+    login(client, user_id)
+    card_ids = [create_card(db, user_id, f"Card {i}") for i in range(40)]
+    db.execute("UPDATE cards SET updated_at='2000-01-01 00:00:00'")
+    db.commit()
+    backups = str(tmp_path / "backups")
+    base = backup_data.create_backup(app.config["DATABASE"], backups)
+
+    client.post(f"/mark/{card_ids[0]}/pass")
+    client.post(f"/delete/{card_ids[1]}")
+    first = backup_data.create_backup(app.config["DATABASE"], backups, incremental=True)
+    client.post(f"/edit/{card_ids[2]}", data={"link": "https://leetcode.com/problems/3sum/", "note": "sort"})
+    client.post("/add", data={"link": "https://leetcode.com/problems/two-sum/"})
+    client.post(f"/mark/{card_ids[3]}/fail")
+    second = backup_data.create_backup(app.config["DATABASE"], backups, incremental=True, fmt="ndjson")
+
+    first_manifest = backup_data.read_manifest(first)
+    assert first_manifest["kind"] == "delta" and first_manifest["base"] == os.path.basename(base)
+    assert first_manifest["tables"]["cards"]["rows"] == 1
+    assert first_manifest["tables"]["tombstones"]["rows"] == 1
+    assert first_manifest["tables"]["review_events"]["rows"] == 1
+    assert backup_data.read_manifest(second)["tables"]["review_events"]["rows"] == 1
+    # The overlap window re-sends the first delta's changes; replaying them is harmless
+    assert backup_data.read_manifest(second)["tables"]["cards"]["rows"] == 4
+
+    target = str(tmp_path / "restored.sqlite3")
+    monkeypatch.setattr(restore_data, "DATABASE", target)
+    monkeypatch.setattr(restore_data, "BACKUP_DIR", backups)
+    monkeypatch.setattr("builtins.input", lambda prompt: "yes")
+    assert backup_data.export_chain(backups, os.path.basename(second)) == [
+        os.path.basename(p) for p in (base, first, second)
+    ]
+    assert restore_data.restore_from_backup(os.path.basename(second))
+
+    # Restore has always stored an empty note as NULL
+    columns = ", ".join(backup_data.TABLES["cards"]).replace("idea", "COALESCE(idea, '')")
+    restored = sqlite3.connect(target)
+    live = sqlite3.connect(app.config["DATABASE"])
+    assert restored.execute(f"SELECT {columns} FROM cards ORDER BY id").fetchall() == \
+        live.execute(f"SELECT {columns} FROM cards ORDER BY id").fetchall()
+    for table, rows in [("review_events", 2), ("review_daily", 1)]:
+        sql = f"SELECT {', '.join(backup_data.TABLES[table])} FROM {table} ORDER BY 1, 2"
+        assert len(live.execute(sql).fetchall()) == rows
+        assert restored.execute(sql).fetchall() == live.execute(sql).fetchall()
+
+def test_rotation_keeps_the_base_of_a_kept_delta(app, db, tmp_path):
+    create_user(db)
+    backups = str(tmp_path / "backups")
+    old_chain = [backup_data.create_backup(app.config["DATABASE"], backups)]
+    old_chain.append(backup_data.create_backup(app.config["DATABASE"], backups, incremental=True))
+    base = backup_data.create_backup(app.config["DATABASE"], backups)
+    deltas = [backup_data.create_backup(app.config["DATABASE"], backups, incremental=True) for _ in range(2)]
+
+    removed = backup_data.rotate_backups(backups, keep=1)
+
+    assert removed == old_chain[::-1]
+    assert backup_data.export_chain(backups, os.path.basename(deltas[-1])) == [
+        os.path.basename(p) for p in [base, *deltas]
+    ]
+
+def schema_objects(conn):
+    return conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall()
+
+def test_restore_brings_back_users_indexes_and_derived_data(app, db, tmp_path, monkeypatch):
+    user_id = create_user(db)
+    create_user(db, "other@example.com")
+    create_card(db, user_id, "Two Sum", box=3)
+    add_cards(db, user_id, 50)
+    folder = backup_data.create_backup(app.config["DATABASE"], str(tmp_path / "backups"), fmt="ndjson")
+
+    target = str(tmp_path / "restored.sqlite3")
+    monkeypatch.setattr(restore_data, "DATABASE", target)
+    monkeypatch.setattr(restore_data, "BACKUP_DIR", str(tmp_path / "backups"))
+    monkeypatch.setattr(restore_data, "LOAD_BATCH", 16)
+    assert restore_data.restore_from_backup(os.path.basename(folder), assume_yes=True)
+
+    restored = sqlite3.connect(target)
+    restored.row_factory = sqlite3.Row
+    live = sqlite3.connect(app.config["DATABASE"])
+    assert [tuple(r) for r in restored.execute("SELECT id, email, password_hash FROM users ORDER BY id")] == \
+        live.execute("SELECT id, email, password_hash FROM users ORDER BY id").fetchall()
+    assert [tuple(r) for r in schema_objects(restored)] == schema_objects(live)
+    assert user_stats.find_mismatches(restored) == []
+    assert restored.execute("SELECT COUNT(*) FROM data_versions").fetchone()[0] == 2
+    assert [tuple(r) for r in restored.execute("SELECT rowid FROM cards_fts WHERE cards_fts MATCH 'two'")] == [(1,)]
+    assert not os.path.exists(target + ".restoring")
+
+def test_restore_reaches_connections_the_app_already_has_open(app, db, tmp_path, monkeypatch):
+    user_id = create_user(db)
+    create_card(db, user_id, "Two Sum")
+    folder = backup_data.create_backup(app.config["DATABASE"], str(tmp_path / "backups"))
+    create_card(db, user_id, "3Sum")
+    worker = database.connect_sqlite(app.config["DATABASE"])   # a pooled WAL connection
+    assert worker.execute("SELECT COUNT(*) FROM cards").fetchone()[0] == 2
+
+    monkeypatch.setattr(restore_data, "DATABASE", app.config["DATABASE"])
+    monkeypatch.setattr(restore_data, "BACKUP_DIR", str(tmp_path / "backups"))
+    assert restore_data.restore_from_backup(os.path.basename(folder), assume_yes=True)
+
+    assert [row["title"] for row in worker.execute("SELECT title FROM cards")] == ["Two Sum"]
+    create_card(worker, user_id, "Valid Anagram")
+    worker.close()
+    live = sqlite3.connect(app.config["DATABASE"])
+    assert [t for t, in live.execute("SELECT title FROM cards ORDER BY id")] == ["Two Sum", "Valid Anagram"]
+    before = [p for p in os.listdir(os.path.dirname(app.config["DATABASE"])) if ".before-restore-" in p]
+    assert len(before) == 1
+
+def test_restore_refuses_a_backup_that_fails_its_checksum(app, db, tmp_path, monkeypatch):
+    create_card(db, create_user(db), "Two Sum")
+    folder = backup_data.create_backup(app.config["DATABASE"], str(tmp_path / "backups"))
+    with open(os.path.join(folder, "cards.csv.gz"), "r+b") as f:
+        f.seek(20)
+        byte = f.read(1)
+        f.seek(20)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    (tmp_path / "live").mkdir()
+    target = tmp_path / "live" / "db.sqlite3"
+    target.write_bytes(b"current data")
+    monkeypatch.setattr(restore_data, "DATABASE", str(target))
+    monkeypatch.setattr(restore_data, "BACKUP_DIR", str(tmp_path / "backups"))
+    assert not restore_data.restore_from_backup(os.path.basename(folder), assume_yes=True)
+    assert os.listdir(tmp_path / "live") == ["db.sqlite3"]
+    assert target.read_bytes() == b"current data"
+
+def test_restore_yes_flag_skips_the_prompt(app, db, tmp_path, monkeypatch):
+    create_card(db, create_user(db), "Two Sum")
+    backup_data.create_backup(app.config["DATABASE"], str(tmp_path / "backups"))
+
+    target = str(tmp_path / "restored.sqlite3")
+    monkeypatch.setattr(restore_data, "DATABASE", target)
+    monkeypatch.setattr(restore_data, "BACKUP_DIR", str(tmp_path / "backups"))
+    monkeypatch.setattr("builtins.input", lambda prompt: pytest.fail("prompted for input"))
+    monkeypatch.setattr("sys.argv", ["restore_data.py", "--yes", "1"])
+    restore_data.main()
+
+    assert sqlite3.connect(target).execute("SELECT title FROM cards").fetchall() == [("Two Sum",)]
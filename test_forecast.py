@@ -0,0 +1,86 @@
+import time
+from datetime import date, timedelta
+
+import pytest
+
+import app as leitner
+import forecast
+from conftest import create_card, create_user, login
+
+def due_counts(client, days=7):
+    return [d["due"] for d in client.get(f"/api/forecast?days={days}").get_json()["days"]]
+
+def test_forecast_counts_cards_per_day(client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+    today = date.today()
+    for title, days_ahead in [("a", -5), ("b", -1), ("c", 0), ("d", 3), ("e", 3), ("f", 6), ("g", 7), ("h", 40)]:
+        create_card(db, user_id, title, next_review=today + timedelta(days=days_ahead))
+    create_card(db, create_user(db, "other@example.com"), "x", next_review=today)
+
+    data = client.get("/api/forecast?days=7").get_json()
+
+    assert data["days"][0] == {"date": today.isoformat(), "due": 3}  # overdue cards count today
+    assert [d["due"] for d in data["days"]] == [3, 0, 0, 2, 0, 0, 1]
+    assert data["total"] == 6
+    assert len(client.get("/api/forecast").get_json()["days"]) == leitner.FORECAST_DAYS
+
+def test_forecast_is_one_grouped_index_range_read(db):
+    plan = " ".join(row[3] for row in db.execute(
+        "EXPLAIN QUERY PLAN " + forecast.HISTOGRAM_SQL, (1, date.today())
+    ))
+    assert "USING COVERING INDEX idx_cards_user_due" in plan
+    assert "TEMP B-TREE" not in plan
+
+def test_forecast_is_cached_until_the_users_cards_change(client, db, queries):
+    user_id = create_user(db)
+    login(client, user_id)
+    card_id = create_card(db, user_id, next_review=date.today())
+    assert due_counts(client) == [1, 0, 0, 0, 0, 0, 0]
+
+    queries.clear()
+    assert due_counts(client) == [1, 0, 0, 0, 0, 0, 0]
+    assert not any("FROM cards" in q for q in queries)
+
+    client.post(f"/mark/{card_id}/pass")
+    assert due_counts(client) == [0, 0, 0, 1, 0, 0, 0]
+    client.post("/add", data={"link": "https://leetcode.com/problems/3sum/"})
+    assert due_counts(client) == [0, 1, 0, 1, 0, 0, 0]
+    client.post("/api/review/batch", json={"reviews": [{"card_id": card_id, "result": "fail"}]})
+    assert due_counts(client) == [0, 2, 0, 0, 0, 0, 0]
+    client.post("/schedule", data={"scheduler": "custom", "intervals": "2,4,8,16,32"})
+    assert due_counts(client) == [0, 0, 2, 0, 0, 0, 0]
+    client.post(f"/delete/{card_id}")
+    assert due_counts(client) == [0, 0, 1, 0, 0, 0, 0]
+
+def test_cache_drops_a_histogram_read_before_a_concurrent_write(db):
+    cache = forecast.ForecastCache(ttl=60, max_entries=10)
+    user_id = create_user(db)
+    today = date.today()
+
+    class WriteDuringRead:
+        def execute(self, sql, params):
+            rows = db.execute(sql, params).fetchall()
+            cache.invalidate(user_id)  # another request commits a change meanwhile
+            return rows
+
+    cache.get(WriteDuringRead(), user_id, today, 7)
+    assert user_id not in cache._entries
+    cache.get(db, user_id, today, 7)
+    assert user_id in cache._entries
+
+def test_forecast_for_fifty_thousand_cards_takes_milliseconds(db):
+    user_id = create_user(db)
+    today = date.today()
+    db.executemany(
+        "INSERT INTO cards (user_id, title, link, slug, solved_date, leitner_box, next_review) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(user_id, f"p{i}", f"l{i}", f"l{i}", today, 1, today + timedelta(days=i % 60 - 10)) for i in range(50_000)],
+    )
+    db.commit()
+
+    start = time.perf_counter()
+    counts = forecast.due_histogram(db, user_id, today, 30)
+    elapsed = time.perf_counter() - start
+
+    assert sum(counts) == sum(1 for i in range(50_000) if i % 60 < 40)  # due in days -10..29
+    assert elapsed < 0.05
@@ -0,0 +1,135 @@
+import pytest
+
+import app as leitner
+import data_versions
+from conftest import create_card, create_user, login
+
+ROUTES = ["/dashboard", "/review", "/api/cards", "/api/review-queue", "/api/forecast", "/api/stats/reviews"]
+
+def card_queries(statements):
+    return [s for s in statements if "cards" in s or "review_daily" in s or "user_stats" in s]
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_unchanged_page_is_304_without_card_queries(client, db, queries, route):
+    user_id = create_user(db)
+    create_card(db, user_id)
+    login(client, user_id)
+
+    first = client.get(route)
+    assert first.status_code == 200
+    assert first.headers["ETag"].startswith('"')  # strong, not W/"..."
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    queries.clear()
+
+    second = client.get(route, headers={"If-None-Match": first.headers["ETag"]})
+
+    assert second.status_code == 304
+    assert second.get_data() == b""
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert card_queries(queries) == []
+    assert len([q for q in queries if "FROM data_versions" in q]) == 1
+
+@pytest.mark.parametrize("method,route,data", [
+    ("post", "/add", {"link": "https://leetcode.com/problems/3sum/"}),
+    ("post", "/mark/{card_id}/pass", None),
+    ("post", "/edit/{card_id}", {"link": "https://leetcode.com/problems/two-sum/", "note": "hash map"}),
+    ("post", "/delete/{card_id}", None),
+    ("post", "/schedule", {"scheduler": "sm2"}),
+])
+def test_every_write_route_changes_the_etag(client, db, method, route, data):
+    user_id = create_user(db)
+    card_id = create_card(db, user_id)
+    login(client, user_id)
+    etag = client.get("/dashboard").headers["ETag"]
+
+    getattr(client, method)(route.format(card_id=card_id), data=data)
+    client.get("/dashboard")  # shows and clears any flashed message
+
+    response = client.get("/dashboard", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+def test_review_batch_changes_the_etag(client, db):
+    user_id = create_user(db)
+    card_id = create_card(db, user_id)
+    login(client, user_id)
+    etag = client.get("/api/review-queue").headers["ETag"]
+
+    client.post("/api/review/batch", json={"reviews": [{"card_id": card_id, "result": "pass"}]})
+
+    assert client.get("/api/review-queue", headers={"If-None-Match": etag}).status_code == 200
+
+def test_settings_change_without_cards_changes_the_etag(client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+    etag = client.get("/dashboard").headers["ETag"]
+
+    db.execute("UPDATE users SET daily_cap=10 WHERE id=?", (user_id,))
+    db.commit()
+
+    assert client.get("/dashboard", headers={"If-None-Match": etag}).status_code == 200
+
+def test_other_users_writes_keep_the_etag(client, db):
+    user_id = create_user(db)
+    other_id = create_user(db, "other@example.com")
+    login(client, user_id)
+    etag = client.get("/dashboard").headers["ETag"]
+
+    create_card(db, other_id)
+
+    assert client.get("/dashboard", headers={"If-None-Match": etag}).status_code == 304
+
+def test_etag_depends_on_query_and_user(client, db):
+    user_id = create_user(db)
+    other_id = create_user(db, "other@example.com")
+    login(client, user_id)
+    etag = client.get("/dashboard").headers["ETag"]
+
+    assert client.get("/dashboard?tag=Array", headers={"If-None-Match": etag}).status_code == 200
+    login(client, other_id, "other@example.com")
+    assert client.get("/dashboard", headers={"If-None-Match": etag}).status_code == 200
+
+def test_pending_flash_is_rendered_not_304(client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+    etag = client.get("/dashboard").headers["ETag"]
+
+    client.post("/mark/999/pass")  # flashes an error without changing any data
+    response = client.get("/dashboard", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+    assert client.get("/dashboard", headers={"If-None-Match": etag}).status_code == 304
+
+def test_data_version_counts_from_first_change(app, db):
+    user_id = create_user(db)
+    with app.test_request_context():
+        conn = leitner.get_db()
+        assert data_versions.current(conn, user_id) == (0, None)
+        card_id = create_card(db, user_id)
+        first = data_versions.current(conn, user_id)
+        db.execute("DELETE FROM cards WHERE id=?", (card_id,))
+        db.commit()
+        second = data_versions.current(conn, user_id)
+    assert second[0] > first[0] > 0
+    assert second[1] == first[1]
+
+def test_bulk_writes_bump_the_version_once(app, client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+    card_ids = [create_card(db, user_id, f"Card {i}") for i in range(20)]
+    versions = []
+
+    def version():
+        return db.execute("SELECT version, bulk FROM data_versions WHERE user_id=?", (user_id,)).fetchone()
+
+    start = version()
+    client.post("/schedule", data={"scheduler": "sm2"})
+    versions.append(version())
+    client.post("/api/review/batch", json={"reviews": [{"card_id": i, "result": "pass"} for i in card_ids]})
+    versions.append(version())
+    leitner.import_cards(db, user_id, [{"link": f"https://leetcode.com/problems/p{i}/"} for i in range(30)])
+    versions.append(version())
+
+    # The settings change and the reschedule each count once
+    assert [tuple(v) for v in versions] == [(start[0] + 2, 0), (start[0] + 3, 0), (start[0] + 4, 0)]
@@ -0,0 +1,123 @@
+import io
+import json
+import time
+from datetime import date, timedelta
+
+import app as leitner
+import import_cards
+from conftest import create_card, create_user, login
+
+def upload(client, name, text):
+    return client.post(
+        "/api/cards/import",
+        data={"file": (io.BytesIO(text.encode()), name)},
+        content_type="multipart/form-data",
+    )
+
+def test_import_csv_reports_every_row(client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+    create_card(db, user_id, "Two Sum")
+    csv_text = "\n".join([
+        "url,note,box,solved_date",
+        "https://leetcode.com/problems/two-sum/,already have it,,",
+        "https://leetcode.com/problems/3sum/,sort first,3,2024-01-10",
+        "https://leetcode.com/problems/3sum/,listed twice,,",
+        "https://example.com/not-leetcode,,,",
+        "https://leetcode.com/problems/valid-anagram/,,x,",
+    ])
+
+    data = upload(client, "solved.csv", csv_text).get_json()
+
+    assert (data["imported"], data["duplicate"], data["error"]) == (1, 2, 2)
+    assert [(r["row"], r["status"]) for r in data["rows"]] == [
+        (1, "duplicate"), (2, "imported"), (3, "duplicate"), (4, "error"), (5, "error"),
+    ]
+    card = db.execute("SELECT title, idea, leitner_box, solved_date, next_review FROM cards WHERE title='3Sum'").fetchone()
+    assert tuple(card) == ("3Sum", "sort first", 3, date(2024, 1, 10), date(2024, 1, 17))
+    assert tuple(db.execute("SELECT total_cards, box_3 FROM user_stats WHERE user_id=?", (user_id,)).fetchone()) == (2, 1)
+
+def test_import_json_list_of_links_and_objects(client, db):
+    login(client, create_user(db))
+    body = json.dumps({"cards": [
+        "https://leetcode.com/problems/two-sum/",
+        {"link": "https://example.com/p/1", "title": "Custom Problem", "note": "graph"},
+        {"title": "no link"},
+    ]})
+
+    response = client.post("/api/cards/import", data=body, content_type="application/json")
+
+    assert [r["status"] for r in response.get_json()["rows"]] == ["imported", "imported", "error"]
+    assert sorted(r["title"] for r in db.execute("SELECT title FROM cards")) == ["Custom Problem", "Two Sum"]
+
+def test_import_reports_an_infinite_box_as_a_row_error(client, db):
+    login(client, create_user(db))
+    # Python's JSON decoder reads 1e999 as inf, which int() can't convert
+    body = '{"cards": [{"link": "https://leetcode.com/problems/two-sum/", "leitner_box": 1e999}]}'
+
+    response = client.post("/api/cards/import", data=body, content_type="application/json")
+
+    assert response.status_code == 200
+    assert response.get_json()["rows"][0]["error"] == "leitner_box must be a number from 1 to 5"
+
+def test_import_checks_duplicates_in_one_query_and_batches_inserts(client, db, queries, monkeypatch):
+    user_id = create_user(db)
+    login(client, user_id)
+    for i in range(0, 50, 2):
+        create_card(db, user_id, f"p{i}", link=f"https://leetcode.com/problems/p{i}/")
+    monkeypatch.setattr(leitner, "IMPORT_BATCH", 10)
+    links = "\n".join(f"https://leetcode.com/problems/p{i}/" for i in range(50))
+
+    data = upload(client, "links.csv", links).get_json()
+
+    assert (data["imported"], data["duplicate"]) == (25, 25)
+    assert len([q for q in queries if "FROM cards" in q]) == 1
+    assert len([q for q in queries if q.startswith("COMMIT")]) == 3
+
+def test_import_rejects_unreadable_and_oversized_files(client, db, monkeypatch):
+    login(client, create_user(db))
+    assert upload(client, "cards.json", "{not json").status_code == 400
+    assert upload(client, "empty.csv", "").status_code == 400
+
+    monkeypatch.setattr(leitner, "MAX_IMPORT_ROWS", 2)
+    response = upload(client, "links.csv", "a\nb\nc")
+    assert response.status_code == 400
+    assert "At most 2" in response.get_json()["error"]
+
+def test_import_form_flashes_summary(client, db):
+    login(client, create_user(db))
+    response = client.post(
+        "/import",
+        data={"file": (io.BytesIO(b"https://leetcode.com/problems/two-sum/\nnot a link\n"), "list.csv")},
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    html = response.get_data(as_text=True)
+    assert "Imported 1 card(s)" in html
+    assert "Row 2:" in html
+
+def test_import_ten_thousand_rows_in_seconds(db):
+    user_id = create_user(db)
+    rows = [{"link": f"https://leetcode.com/problems/problem-{i}/", "solved_date": "2024-01-01"} for i in range(10_000)]
+
+    start = time.monotonic()
+    report = leitner.import_cards(db, user_id, rows)
+    elapsed = time.monotonic() - start
+
+    assert leitner.import_summary(report) == {"imported": 10_000, "duplicate": 0, "error": 0}
+    assert db.execute("SELECT COUNT(*) FROM cards").fetchone()[0] == 10_000
+    assert elapsed < 5
+
+def test_cli_imports_file_for_user(app, db, tmp_path, monkeypatch, capsys):
+    user_id = create_user(db)
+    create_card(db, user_id, "Two Sum")
+    path = tmp_path / "solved.csv"
+    path.write_text("link,leitner_box\nhttps://leetcode.com/problems/two-sum/,1\nhttps://leetcode.com/problems/3sum/,2\n")
+    report_path = tmp_path / "report.json"
+    monkeypatch.setattr("sys.argv", ["import_cards.py", "user@example.com", str(path), "--report", str(report_path)])
+
+    import_cards.main()
+
+    assert "Imported 1 card(s)" in capsys.readouterr().out
+    assert [r["status"] for r in json.loads(report_path.read_text())] == ["duplicate", "imported"]
+    assert db.execute("SELECT next_review FROM cards WHERE title='3Sum'").fetchone()[0] == date.today() + timedelta(days=3)
@@ -0,0 +1,96 @@
+import sqlite3
+
+import pytest
+
+import migrate
+
+def schema(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY name").fetchall()
+    finally:
+        conn.close()
+
+def recorded(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT version, name FROM schema_version ORDER BY version").fetchall()
+    finally:
+        conn.close()
+
+def only_up_to(monkeypatch, version):
+    migrations = migrate.load_migrations("sqlite")
+    monkeypatch.setattr(migrate, "load_migrations", lambda dialect: [m for m in migrations if m[0] <= version])
+
+def test_migrate_applies_and_records_every_migration_in_order(tmp_path):
+    path = str(tmp_path / "db.sqlite3")
+    expected = [(version, name) for version, name, _ in migrate.load_migrations("sqlite")]
+
+    assert migrate.current_version(path) == 0
+    assert migrate.migrate(path) == expected
+    assert recorded(path) == expected
+    assert migrate.current_version(path) == migrate.latest_version("sqlite")
+
+def test_rerunning_on_an_up_to_date_database_changes_nothing(tmp_path):
+    path = str(tmp_path / "db.sqlite3")
+    migrate.migrate(path)
+    before = (schema(path), recorded(path))
+
+    assert migrate.migrate(path) == []
+    assert (schema(path), recorded(path)) == before
+
+def test_migrate_applies_only_the_pending_migrations(tmp_path, monkeypatch):
+    path = str(tmp_path / "db.sqlite3")
+    only_up_to(monkeypatch, 3)
+    migrate.migrate(path)
+    assert migrate.current_version(path) == 3
+
+    monkeypatch.undo()
+    applied = migrate.migrate(path)
+
+    assert applied[0][0] == 4
+    assert applied[-1][0] == migrate.latest_version("sqlite")
+    assert [v for v, _ in recorded(path)] == list(range(1, applied[-1][0] + 1))
+
+def test_failed_migration_is_rolled_back_and_not_recorded(tmp_path, monkeypatch):
+    path = str(tmp_path / "db.sqlite3")
+    only_up_to(monkeypatch, 3)
+    migrate.migrate(path)
+    before = schema(path)
+
+    migrations = migrate.load_migrations("sqlite")
+    broken = migrations + [(99, "broken", "CREATE TABLE half_done (id INTEGER);\nNOT SQL;")]
+    monkeypatch.setattr(migrate, "load_migrations", lambda dialect: broken)
+    with pytest.raises(sqlite3.OperationalError):
+        migrate.migrate(path)
+
+    assert migrate.current_version(path) == 3
+    assert schema(path) == before
+
+def test_ensure_schema_does_not_migrate_a_current_database(tmp_path, monkeypatch):
+    path = str(tmp_path / "db.sqlite3")
+    migrate.migrate(path)
+    monkeypatch.setattr(migrate, "migrate", lambda *args: pytest.fail("migrated an up-to-date database"))
+
+    assert migrate.ensure_schema(path) == []
+
+def test_ensure_schema_catches_up_a_database_that_is_behind(tmp_path, monkeypatch):
+    path = str(tmp_path / "db.sqlite3")
+    only_up_to(monkeypatch, 3)
+    migrate.migrate(path)
+    monkeypatch.undo()
+
+    applied = migrate.ensure_schema(path)
+
+    assert applied[0][0] == 4
+    assert migrate.current_version(path) == migrate.latest_version("sqlite")
+
+def test_duplicate_versions_are_rejected(tmp_path, monkeypatch):
+    folder = tmp_path / "sqlite"
+    folder.mkdir()
+    (folder / "0001_a.sql").write_text("SELECT 1;")
+    (folder / "0001_b.sql").write_text("SELECT 1;")
+    monkeypatch.setattr(migrate, "MIGRATIONS_DIR", str(tmp_path))
+
+    with pytest.raises(migrate.MigrationError):
+        migrate.load_migrations("sqlite")
@@ -0,0 +1,169 @@
+"""Route parity on PostgreSQL. Runs only when TEST_DATABASE_URL points at a
+scratch database (its public schema is dropped and re-migrated)."""
+
+import os
+
+import pytest
+
+import database
+import migrate
+import review_stats
+import user_stats
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+@pytest.fixture
+def pg_app(app):
+    import psycopg2
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    conn.close()
+    migrate.migrate(database_url=TEST_DATABASE_URL)
+    app.config["DATABASE_URL"] = TEST_DATABASE_URL
+    yield app
+    app.config["DATABASE_URL"] = None
+    database.postgres_pool(TEST_DATABASE_URL).close()
+
+def pg_query(sql, params=()):
+    import psycopg2
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall() if cursor.description else None
+    finally:
+        conn.close()
+
+def test_every_route_works_on_postgres(pg_app):
+    client = pg_app.test_client()
+
+    assert client.post("/register", data={"email": "pg@example.com", "password": "Passw0rdX"}).status_code == 302
+    assert client.post("/register", data={"email": "pg@example.com", "password": "Passw0rdX"}).status_code == 200
+    assert client.post("/login", data={"email": "pg@example.com", "password": "Passw0rdX"}).status_code == 302
+
+    for slug in ("two-sum", "3sum", "two-pointers"):
+        client.post("/add", data={"link": f"https://leetcode.com/problems/{slug}/", "note": "hash map"})
+    duplicate = client.post("/add", data={"link": "https://leetcode.com/problems/two-sum/"})
+    assert "highlight=" in duplicate.headers["Location"]
+
+    pg_query("UPDATE cards SET next_review = CURRENT_DATE")
+    html = client.get("/dashboard").get_data(as_text=True)
+    assert "Two Sum" in html and "<strong>3</strong> problem(s) due" in html
+
+    data = client.get("/api/cards", query_string={"q": "two"}).get_json()
+    assert sorted(c["title_match"] for c in data["cards"]) == ["<mark>Two</mark> Pointers", "<mark>Two</mark> Sum"]
+    assert "<mark>Two</mark> Sum" in client.get("/dashboard", query_string={"q": "two"}).get_data(as_text=True)
+
+    ids, cursor = [], ""
+    while True:
+        data = client.get("/api/cards", query_string={"limit": 1, "cursor": cursor}).get_json()
+        ids += [c["id"] for c in data["cards"]]
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+    assert len(ids) == 3 == len(set(ids))
+
+    data = client.get("/api/review-queue", query_string={"limit": 2}).get_json()
+    assert len(data["cards"]) == 2 and data["next_cursor"]
+    assert client.get("/review").status_code == 200
+
+    first, second, third = sorted(ids)
+    client.post(f"/mark/{first}/pass")
+    data = client.post("/api/review/batch", json={"reviews": [
+        {"card_id": second, "result": "pass"},
+        {"card_id": second, "result": "pass"},
+    ]}).get_json()
+    assert data["cards"][0]["leitner_box"] == 3
+    assert pg_query("SELECT COUNT(*) FROM review_events") == [(3,)]
+    assert pg_query("SELECT reviews, passes, promoted FROM review_daily") == [(3, 3, 3)]
+    assert client.get("/api/stats/reviews").get_json()["streak"] == 1
+    assert client.get("/api/forecast?days=400").get_json()["total"] == 3
+
+    assert client.get(f"/edit/{third}").status_code == 200
+    client.post(f"/edit/{third}", data={"link": "https://leetcode.com/problems/two-pointers/", "note": "sorted input"})
+    assert pg_query("SELECT idea FROM cards WHERE id=%s", (third,)) == [("sorted input",)]
+
+    client.post(f"/delete/{third}")
+    assert pg_query("SELECT total_cards, box_1, box_2, box_3 FROM user_stats") == [(2, 0, 1, 1)]
+
+    data = client.post("/api/cards/import", json=[
+        "https://leetcode.com/problems/two-sum/", "https://leetcode.com/problems/valid-anagram/",
+    ]).get_json()
+    assert (data["imported"], data["duplicate"]) == (1, 1)
+
+    client.post("/schedule", data={"scheduler": "sm2"})
+    assert pg_query("SELECT leitner_box, interval_days, ease FROM cards ORDER BY id") == [
+        (2, 6, 2.5), (3, 15, 2.5), (1, 1, 2.5),
+    ]
+    client.post("/schedule", data={"scheduler": "custom", "intervals": "2,4,8,16,32"})
+    assert pg_query("SELECT DISTINCT ease FROM cards") == [(None,)]
+    assert pg_query("SELECT next_review - COALESCE(last_reviewed, solved_date) FROM cards ORDER BY id") == [
+        (4,), (8,), (2,),
+    ]
+    client.post("/schedule", data={"scheduler": "leitner", "smooth_load": "1", "daily_cap": "5"})
+    pg_query("UPDATE cards SET next_review = CURRENT_DATE")
+    first = client.get("/api/review-queue", query_string={"limit": 1}).get_json()
+    rest = client.get("/api/review-queue", query_string={"limit": 5, "cursor": first["next_cursor"]}).get_json()
+    assert (len(first["cards"]), len(rest["cards"]), rest["next_cursor"]) == (1, 1, None)
+    data = client.get("/api/review-queue", query_string={"limit": 5}).get_json()
+    assert (len(data["cards"]), data["next_cursor"]) == (2, None)  # 5 a day, 3 reviewed already
+
+    client.get("/dashboard")  # shows the flashed schedule message
+    etag = client.get("/dashboard").headers["ETag"]
+    assert client.get("/dashboard", headers={"If-None-Match": etag}).status_code == 304
+    (version,), = pg_query("SELECT version FROM data_versions")
+    pg_query("UPDATE cards SET next_review = CURRENT_DATE + 1")
+    assert pg_query("SELECT version FROM data_versions") == [(version + 1,)]  # once per statement
+    assert client.get("/dashboard", headers={"If-None-Match": etag}).status_code == 200
+
+def test_consistency_checkers_run_on_postgres(pg_app):
+    client = pg_app.test_client()
+    client.post("/register", data={"email": "pg@example.com", "password": "Passw0rdX"})
+    client.post("/login", data={"email": "pg@example.com", "password": "Passw0rdX"})
+    client.post("/add", data={"link": "https://leetcode.com/problems/two-sum/"})
+    (card_id,), = pg_query("SELECT id FROM cards")
+    client.post(f"/mark/{card_id}/pass")
+
+    pool = database.get_pool(None, TEST_DATABASE_URL)
+    conn = pool.acquire()
+    try:
+        assert user_stats.find_mismatches(conn) == []
+        assert review_stats.find_mismatches(conn) == []
+        assert (user_stats.rebuild(conn), review_stats.rebuild(conn)) == (1, 1)
+    finally:
+        pool.release(conn)
+
+def test_hot_queries_run_as_prepared_statements(pg_app):
+    client = pg_app.test_client()
+    client.post("/register", data={"email": "pg@example.com", "password": "Passw0rdX"})
+    client.post("/login", data={"email": "pg@example.com", "password": "Passw0rdX"})
+    client.post("/add", data={"link": "https://leetcode.com/problems/two-sum/"})
+    client.post("/add", data={"link": "https://leetcode.com/problems/two-sum/description/"})
+    client.get("/review")
+    client.get("/review")  # the first render shows the duplicate warning, so only this one is conditional
+
+    pool = database.postgres_pool(TEST_DATABASE_URL)
+    conn = pool.acquire()
+    try:
+        names = {row["name"] for row in conn.execute("SELECT name FROM pg_prepared_statements")}
+    finally:
+        pool.release(conn)
+    assert {"due_cards", "card_by_slug", "add_card", "data_version"} <= names
+
+def test_pool_is_bounded_and_replaces_dead_connections(pg_app):
+    pool = database.PostgresPool(TEST_DATABASE_URL, size=1, timeout=0.1)
+    conn = pool.acquire()
+    with pytest.raises(database.PoolTimeout):
+        pool.acquire()
+
+    conn.raw.close()
+    pool.release(conn)
+    replacement = pool.acquire()
+    assert replacement is not conn
+    assert replacement.execute("SELECT 1 AS ok").fetchone()["ok"] == 1
+    pool.release(replacement)
+    pool.close()
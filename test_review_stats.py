@@ -0,0 +1,114 @@
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+import database
+import review_stats
+import user_stats
+from conftest import create_card, create_user, login
+
+def add_event(db, user_id, day, result="pass", box_before=1, box_after=2, card_id=1):
+    db.execute(
+        """INSERT INTO review_events (user_id, card_id, reviewed_at, result, box_before, box_after)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (user_id, card_id, day, result, box_before, box_after),
+    )
+
+def test_every_review_is_logged_and_rolled_up(client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+    first = create_card(db, user_id, "Two Sum", box=4)
+    second = create_card(db, user_id, "3Sum", box=2)
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+
+    client.post(f"/mark/{first}/pass")
+    client.post("/api/review/batch", json={"reviews": [
+        {"card_id": second, "result": "pass", "reviewed_at": yesterday.isoformat()},
+        {"card_id": second, "result": "fail"},
+        {"card_id": 999, "result": "pass"},
+    ]})
+
+    events = [tuple(r) for r in db.execute(
+        "SELECT card_id, reviewed_at, result, box_before, box_after FROM review_events ORDER BY id"
+    )]
+    assert events == [
+        (first, today, "pass", 4, 5),
+        (second, yesterday, "pass", 2, 3),
+        (second, today, "fail", 3, 1),
+    ]
+    daily = [tuple(r) for r in db.execute(
+        "SELECT day, reviews, passes, promoted, demoted, mastered FROM review_daily ORDER BY day"
+    )]
+    assert daily == [(yesterday, 1, 1, 1, 0, 0), (today, 2, 1, 1, 1, 1)]
+    assert review_stats.find_mismatches(db) == []
+
+def test_mark_rejects_unknown_results(client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+    card_id = create_card(db, user_id, box=3)
+
+    assert client.post(f"/mark/{card_id}/bogus").status_code == 404
+
+    assert db.execute("SELECT COUNT(*) FROM review_events").fetchone()[0] == 0
+    assert db.execute("SELECT leitner_box FROM cards").fetchone()[0] == 3
+
+def test_review_events_are_append_only(db):
+    user_id = create_user(db)
+    add_event(db, user_id, date.today())
+    with pytest.raises(sqlite3.DatabaseError, match="append-only"):
+        db.execute("UPDATE review_events SET result='fail'")
+    with pytest.raises(sqlite3.DatabaseError, match="append-only"):
+        db.execute("DELETE FROM review_events")
+
+def test_stats_api_reads_only_the_rollups(client, db, queries):
+    user_id = create_user(db)
+    login(client, user_id)
+    today = date.today()
+    for days_ago, result in [(0, "pass"), (0, "fail"), (1, "pass"), (2, "pass"), (4, "pass"), (40, "fail")]:
+        add_event(db, user_id, today - timedelta(days=days_ago), result)
+    add_event(db, create_user(db, "other@example.com"), today, "fail")
+    db.commit()
+
+    data = client.get("/api/stats/reviews?days=7").get_json()
+
+    assert [d["day"] for d in data["days"]] == [(today - timedelta(days=n)).isoformat() for n in (4, 2, 1, 0)]
+    assert (data["totals"]["reviews"], data["totals"]["pass_rate"]) == (5, 0.8)
+    assert data["streak"] == 3
+    assert not any("review_events" in q for q in queries)
+    assert "3 days" in client.get("/dashboard").get_data(as_text=True)
+
+@pytest.mark.parametrize("days_ago,expected", [([], 0), ([1, 2], 2), ([0, 1, 3], 2), ([2, 3], 0), ([0], 1)])
+def test_streak_counts_consecutive_days_up_to_today_or_yesterday(db, days_ago, expected):
+    user_id = create_user(db)
+    today = date.today()
+    for n in days_ago:
+        add_event(db, user_id, today - timedelta(days=n))
+    assert review_stats.streak(db, user_id, today) == expected
+
+def test_rebuild_fixes_stale_rollups(db):
+    user_id = create_user(db)
+    add_event(db, user_id, date(2024, 5, 1), "pass", 4, 5)
+    add_event(db, user_id, date(2024, 5, 1), "fail", 2, 1)
+    db.execute("UPDATE review_daily SET reviews = 7")
+    db.execute("INSERT INTO review_daily (user_id, day, reviews) VALUES (?, '2024-05-02', 1)", (user_id,))
+    db.commit()
+    assert len(review_stats.find_mismatches(db)) == 2
+
+    review_stats.rebuild(db)
+
+    assert review_stats.find_mismatches(db) == []
+    assert tuple(db.execute("SELECT reviews, passes, promoted, demoted, mastered FROM review_daily").fetchone()) == (2, 1, 1, 1, 1)
+
+@pytest.mark.parametrize("script", [review_stats, user_stats])
+def test_failed_rebuild_returns_its_connection(script, monkeypatch):
+    released = []
+    pool = type("Pool", (), {"acquire": lambda self: "conn", "release": lambda self, conn: released.append(conn)})()
+    monkeypatch.setattr(database, "get_pool", lambda *args: pool)
+    monkeypatch.setattr(script, "rebuild", lambda conn: 1 / 0)
+    monkeypatch.setattr(script.sys, "argv", [script.__name__, "rebuild"])
+
+    with pytest.raises(ZeroDivisionError):
+        script.main()
+    assert released == ["conn"]
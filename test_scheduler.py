@@ -0,0 +1,209 @@
+import time
+from datetime import date, timedelta
+
+import pytest
+
+import app as leitner
+import scheduler
+from conftest import create_card, create_user, login
+
+def review_days(policy, results, box=1):
+    """interval_days after each grade in results, starting from a new card in box"""
+    ease, interval_days, days = None, None, []
+    for result in results:
+        box, ease, interval_days = policy.review(box, ease, interval_days, result)
+        days.append(interval_days)
+    return days
+
+def test_leitner_and_custom_intervals():
+    assert review_days(scheduler.get_policy("leitner"), ["pass"] * 5 + ["fail"]) == [3, 7, 14, 30, 30, 1]
+    custom = scheduler.get_policy("custom", "1,2,4,8,16")
+    assert review_days(custom, ["pass", "pass", "fail"]) == [2, 4, 1]
+    assert custom.interval(5) == 16
+
+def test_sm2_grows_by_ease_and_fails_cost_ease():
+    sm2 = scheduler.get_policy("sm2")
+    assert review_days(sm2, ["pass", "pass", "pass"]) == [6, 15, 38]
+    box, ease, days = sm2.review(4, 2.5, 38, "fail")
+    assert (box, days) == (1, 1) and ease == pytest.approx(2.18)
+    assert sm2.review(1, scheduler.MIN_EASE, 1, "fail")[1] == scheduler.MIN_EASE
+
+@pytest.mark.parametrize("value", ["1,2,3", "1,2,3,4,x", "0,1,2,3,4", "7,3,1,1,1", "1,2,3,4,400"])
+def test_parse_intervals_rejects_bad_input(value):
+    with pytest.raises(ValueError):
+        scheduler.parse_intervals(value)
+
+def test_bulk_reschedule_matches_the_policy(db):
+    user_id = create_user(db)
+    other_id = create_user(db, "other@example.com")
+    solved = date(2024, 3, 1)
+    for box in range(1, 6):
+        create_card(db, user_id, f"p{box}", box=box)
+    create_card(db, other_id, "untouched", box=3, next_review=date(2030, 1, 1))
+    db.execute("UPDATE cards SET solved_date=?", (solved,))
+    db.execute("UPDATE cards SET last_reviewed=? WHERE title='p5'", (date(2024, 4, 1),))
+    db.commit()
+
+    for policy in (scheduler.get_policy("sm2"), scheduler.get_policy("custom", "2,4,8,16,32"), scheduler.get_policy("leitner")):
+        assert scheduler.reschedule(db, user_id, policy, leitner.change_stamp()) == 5
+        db.commit()
+        rows = db.execute("SELECT leitner_box, last_reviewed, next_review, interval_days FROM cards WHERE user_id=?", (user_id,))
+        for box, last_reviewed, next_review, interval_days in rows:
+            assert interval_days == policy.interval(box)
+            assert next_review == (last_reviewed or solved) + timedelta(days=interval_days)
+    assert db.execute("SELECT next_review, interval_days FROM cards WHERE user_id=?", (other_id,)).fetchone()[0] == date(2030, 1, 1)
+
+def test_bulk_reschedule_is_one_select_and_batched_updates(db, monkeypatch):
+    user_id = create_user(db)
+    db.executemany(
+        "INSERT INTO cards (user_id, title, link, slug, solved_date, leitner_box, next_review) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(user_id, f"p{i}", f"l{i}", f"l{i}", date(2024, 1, 1), i % 5 + 1, date(2024, 1, 2)) for i in range(20_000)],
+    )
+    db.commit()
+    monkeypatch.setattr(scheduler, "RESCHEDULE_BATCH", 8_000)
+    statements = []
+    version = db.execute("SELECT version FROM data_versions").fetchone()[0]
+
+    class Recorder:
+        # The trace callback would also fire for every row's trigger check
+        def execute(self, sql, params=()):
+            statements.append(sql.split()[0])
+            return db.execute(sql, params)
+
+    start = time.monotonic()
+    scheduler.reschedule(Recorder(), user_id, scheduler.get_policy("sm2"), leitner.change_stamp())
+    db.commit()
+    elapsed = time.monotonic() - start
+
+    # begin_bulk() and end_bulk() around the batches bump the data version once
+    assert statements == ["SELECT", "INSERT", "UPDATE", "UPDATE", "UPDATE", "UPDATE"]
+    assert tuple(db.execute("SELECT version, bulk FROM data_versions").fetchone()) == (version + 1, 0)
+    assert elapsed < 5
+    counts = dict(db.execute("SELECT interval_days, COUNT(*) FROM cards GROUP BY interval_days").fetchall())
+    assert counts == {1: 4000, 6: 4000, 15: 4000, 38: 4000, 94: 4000}
+
+def test_changing_schedule_reschedules_and_later_reviews_follow_it(app, client, db, queries):
+    app.config["SESSION_USER_CACHE"] = True
+    user_id = create_user(db)
+    card_id = create_card(db, user_id, box=2)
+    login(client, user_id)
+    client.post("/schedule", data={"scheduler": "custom", "intervals": "1, 2, 4, 8, 16"})
+    assert 'value="custom" selected' in client.get("/dashboard").get_data(as_text=True)
+
+    today = date.today()
+    assert tuple(db.execute("SELECT next_review, interval_days FROM cards").fetchone()) == (today + timedelta(days=2), 2)
+    assert tuple(db.execute("SELECT scheduler, intervals FROM users").fetchone()) == ("custom", "1,2,4,8,16")
+
+    queries.clear()
+    client.post(f"/mark/{card_id}/pass")
+    assert db.execute("SELECT next_review FROM cards").fetchone()[0] == today + timedelta(days=4)
+    assert len([q for q in queries if "FROM users" in q]) == 1  # the settings, not the session's identity
+
+def test_invalid_schedule_changes_nothing(client, db):
+    user_id = create_user(db)
+    create_card(db, user_id, box=3, next_review=date(2030, 1, 1))
+    login(client, user_id)
+
+    html = client.post("/schedule", data={"scheduler": "custom", "intervals": "1,2"}, follow_redirects=True).get_data(as_text=True)
+
+    assert "one interval for each of the 5 boxes" in html
+    assert tuple(db.execute("SELECT scheduler, intervals FROM users").fetchone()) == ("leitner", None)
+    assert db.execute("SELECT next_review FROM cards").fetchone()[0] == date(2030, 1, 1)
+
+def test_least_loaded_picks_the_quietest_day_in_the_fuzz_window():
+    load = [0, 5, 5, 5, 5, 5, 4, 9, 6, 2, 0]
+    assert scheduler.fuzz_days(2) == 0 and scheduler.least_loaded(2, load) == 2
+    assert scheduler.least_loaded(7, load) == 6                      # 7 +- 1
+    assert scheduler.least_loaded(7, load, start=2) == 8             # days 8-10 from today
+    assert scheduler.least_loaded(3, [0, 1, 1, 1, 1]) == 3           # ties stay on the interval
+    assert scheduler.least_loaded(30, [0] * 10) == 30                # past the end of load: empty
+
+def test_smoothing_spreads_a_burst_import(client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+    today = date.today()
+    db.execute("UPDATE users SET smooth_load=1")
+    db.commit()
+    rows = [{"link": f"https://leetcode.com/problems/p{i}/", "leitner_box": 3, "solved_date": today.isoformat()}
+            for i in range(30)]
+
+    client.post("/api/cards/import", json=rows)
+
+    spread = dict(db.execute("SELECT next_review, COUNT(*) FROM cards GROUP BY next_review").fetchall())
+    assert spread == {today + timedelta(days=n): 10 for n in (6, 7, 8)}
+
+def test_smoothing_moves_a_review_off_a_busy_day(client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+    today = date.today()
+    db.execute("UPDATE users SET smooth_load=1")
+    for i in range(3):
+        create_card(db, user_id, f"busy{i}", next_review=today + timedelta(days=7))
+    create_card(db, user_id, "quiet", next_review=today + timedelta(days=8))
+    card_id = create_card(db, user_id, "Two Sum", box=2)
+
+    client.post(f"/mark/{card_id}/pass")
+
+    assert tuple(db.execute("SELECT next_review, interval_days FROM cards WHERE id=?", (card_id,)).fetchone()) == (
+        today + timedelta(days=6), 6,
+    )
+
+def test_mastered_message_gives_the_smoothed_due_date(client, db):
+    user_id = create_user(db)
+    login(client, user_id)
+    today = date.today()
+    db.execute("UPDATE users SET smooth_load=1")
+    create_card(db, user_id, "busy", next_review=today + timedelta(days=30))
+    card_id = create_card(db, user_id, "Two Sum", box=4)
+
+    html = client.post(f"/mark/{card_id}/pass", follow_redirects=True).get_data(as_text=True)
+
+    days = (db.execute("SELECT next_review FROM cards WHERE id=?", (card_id,)).fetchone()[0] - today).days
+    assert days != 30
+    assert f"review it in {days} days" in html
+
+def test_bulk_reschedule_can_spread_cards_over_the_fuzz_window(db):
+    user_id = create_user(db)
+    for i in range(300):
+        create_card(db, user_id, f"p{i}", box=5)
+
+    scheduler.reschedule(db, user_id, scheduler.get_policy("leitner"), leitner.change_stamp(), smooth=True)
+    db.commit()
+
+    counts = dict(db.execute("SELECT interval_days, COUNT(*) FROM cards GROUP BY interval_days").fetchall())
+    assert sorted(counts) == list(range(26, 35))  # 30 days +- 4
+    assert max(counts.values()) - min(counts.values()) <= 1
+
+def test_daily_cap_limits_the_review_queue(app, client, db, queries):
+    user_id = create_user(db)
+    login(client, user_id)
+    today = date.today()
+    for i in range(10):
+        create_card(db, user_id, f"p{i}", next_review=today - timedelta(days=i))
+    done = create_card(db, user_id, "done", next_review=today)
+    db.execute("UPDATE users SET daily_cap=4")
+    db.commit()
+    client.post(f"/mark/{done}/pass")  # one of today's four
+
+    queries.clear()
+    html = client.get("/review").get_data(as_text=True)
+    assert "<strong>3</strong> problem(s) due" in html
+    assert not any(q.startswith("SELECT COUNT(*) c FROM cards") for q in queries)
+
+    titles, cursor = [], ""
+    while True:
+        data = client.get("/api/review-queue", query_string={"limit": 2, "cursor": cursor}).get_json()
+        titles += [c["title"] for c in data["cards"]]
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+    assert titles == ["p9", "p8", "p7"]
+
+def test_schedule_form_saves_load_settings(client, db):
+    login(client, create_user(db))
+    client.post("/schedule", data={"scheduler": "sm2", "smooth_load": "1", "daily_cap": "25"})
+    assert tuple(db.execute("SELECT scheduler, smooth_load, daily_cap FROM users").fetchone()) == ("sm2", 1, 25)
+
+    html = client.post("/schedule", data={"scheduler": "sm2", "daily_cap": "0"}, follow_redirects=True).get_data(as_text=True)
+    assert "between 1 and" in html
+    assert tuple(db.execute("SELECT smooth_load, daily_cap FROM users").fetchone()) == (1, 25)
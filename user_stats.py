@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Consistency checker for the user_stats counters
+The counters are maintained by triggers on cards; this compares them with a
+full recount and can rebuild them from scratch.
+
+    python user_stats.py            # report mismatches
+    python user_stats.py rebuild    # recompute every user's counters
+"""
+
+import sys
+
+import database
+import migrate
+
+COLUMNS = ["total_cards", "box_1", "box_2", "box_3", "box_4", "box_5"]
+
+RECOUNT_SQL = """
+    SELECT user_id, COUNT(*) AS total_cards,
+           SUM(CASE WHEN leitner_box = 1 THEN 1 ELSE 0 END) AS box_1,
+           SUM(CASE WHEN leitner_box = 2 THEN 1 ELSE 0 END) AS box_2,
+           SUM(CASE WHEN leitner_box = 3 THEN 1 ELSE 0 END) AS box_3,
+           SUM(CASE WHEN leitner_box = 4 THEN 1 ELSE 0 END) AS box_4,
+           SUM(CASE WHEN leitner_box = 5 THEN 1 ELSE 0 END) AS box_5
+    FROM cards GROUP BY user_id
+"""
+
+def find_mismatches(conn):
+    """Return [(user_id, stored, actual), ...] where counters disagree with cards"""
+    actual = {row["user_id"]: tuple(row[c] for c in COLUMNS) for row in conn.execute(RECOUNT_SQL)}
+    stored = {
+        row["user_id"]: tuple(row[c] for c in COLUMNS)
+        for row in conn.execute("SELECT * FROM user_stats")
+    }
+    empty = (0,) * len(COLUMNS)
+    mismatches = []
+    for user_id in sorted(set(actual) | set(stored)):
+        have = stored.get(user_id, empty)
+        want = actual.get(user_id, empty)
+        if have != want:
+            mismatches.append((user_id, have, want))
+    return mismatches
+
+def rebuild(conn):
+    """Recompute all counters from cards in one transaction; returns users rebuilt"""
+    try:
+        conn.execute("DELETE FROM user_stats")
+        cursor = conn.execute(
+            f"INSERT INTO user_stats (user_id, {', '.join(COLUMNS)}) {RECOUNT_SQL}"
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return cursor.rowcount
+
+def main():
+    pool = database.get_pool(migrate.DATABASE, migrate.DATABASE_URL)
+    conn = pool.acquire()
+    try:
+        if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+            count = rebuild(conn)
+            print(f"✅ Rebuilt counters for {count} user(s)")
+            return
+        mismatches = find_mismatches(conn)
+    finally:
+        pool.release(conn)
+
+    if not mismatches:
+        print("✅ user_stats matches cards for every user")
+        return
+
+    print(f"⚠️  {len(mismatches)} user(s) with stale counters:")
+    for user_id, have, want in mismatches:
+        print(f"  - user {user_id}: stored {have}, actual {want}")
+    print("\n💡 Run 'python user_stats.py rebuild' to fix them")
+    sys.exit(1)
+
+if __name__ == "__main__":
+    main()